@@ -7,7 +7,7 @@ from account.models import User
 
 GENDER_CHOICES = (('male', 'Male'), ('female', 'Female'))
 
-class EmployeeRegistrationForm(forms.Form):
+class EmployeeRegistrationForm(UserCreationForm):
     first_name = forms.CharField(required=True)
     last_name = forms.CharField(required=True)
     
@@ -26,7 +26,7 @@ class EmployeeRegistrationForm(forms.Form):
         
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'gender', 'password1', 'password2']
+        fields = ['first_name', 'last_name', 'email', 'gender', 'password1', 'password2']
         error_messages = {
             "first_name" : {"required":"First Name is Required", "max_length":"Name is too long"},
             "last_name" : {"required":"Last Name is Required", "max_length":"Last Name is too long"},
@@ -46,7 +46,7 @@ class EmployeeRegistrationForm(forms.Form):
             user.save()
         return user
     
-class EmployerRegistrationForm(forms.Form):
+class EmployerRegistrationForm(UserCreationForm):
     first_name = forms.CharField(required=True)
     last_name = forms.CharField(required=True)
     
@@ -93,20 +93,20 @@ class UserLoginForm(forms.Form):
         password = self.cleaned_data.get("password")
         
         if email and password:
+            # authenticate() runs the only password hash of the attempt: it
+            # checks the password (rehashing it if the hasher's parameters
+            # changed), and for an unknown email hashes it anyway so both
+            # cost the same. Inactive users fail the same way.
             self.user = authenticate(email=email, password=password)
             
             if self.user is None:
-                raise forms.ValidationError("Users does not exist")
-            if not self.user.check_password(password):
-                raise forms.ValidationError("Incorrect Password")
-            if not self.user.is_active:
-                raise forms.ValidationError("User is not active")
+                raise forms.ValidationError("Incorrect email or password")
             
         return super(UserLoginForm, self).clean(*args, **kwargs)
     def get_user(self):
         return self.user
     
-class EmployeeUpdateProfileForm(forms.Form):
+class EmployeeUpdateProfileForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(EmployeeUpdateProfileForm, self).__init__(*args, **kwargs)
         self.fields["first_name"].widget.attrs.update({'class': 'form-control', 'placeholder': 'Enter First Name'})
@@ -116,7 +116,7 @@ class EmployeeUpdateProfileForm(forms.Form):
         model = User
         fields = ['first_name', 'last_name', 'gender']
         
-class EmployerUpdateProfileForm(forms.Form):
+class EmployerUpdateProfileForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(EmployerUpdateProfileForm, self).__init__(*args, **kwargs)
         self.fields["first_name"].widget.attrs.update({'class': 'form-control', 'placeholder': 'Enter Company Name', 'label': 'Company Name'})
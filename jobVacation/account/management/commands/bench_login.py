@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.forms import UserLoginForm
+from account.models import User
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "Abcdefgh.1"
+
+
+def double_hash_login(email, password):
+    # The login check before the single-hash rework: authenticate() and
+    # then check_password() again
+    user = authenticate(email=email, password=password)
+    return user is not None and user.check_password(password)
+
+
+def form_login(email, password):
+    return UserLoginForm(data={"email": email, "password": password}).is_valid()
+
+
+class Command(BaseCommand):
+    help = "Measure logins per second on one core, single-hash login form against the former double-hash check"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=20, help="Attempts per measurement")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            User.objects.create_user(email=EMAIL, password=PASSWORD, role="employee")
+            self.run(options["logins"])
+            transaction.set_rollback(True)
+
+    def run(self, logins):
+        for label, login, email in (
+            ("Double hash, valid login", double_hash_login, EMAIL),
+            ("Single hash, valid login", form_login, EMAIL),
+            ("Single hash, unknown email", form_login, "nobody@example.com"),
+        ):
+            login(email, PASSWORD)
+            started = time.perf_counter()
+            for _ in range(logins):
+                login(email, PASSWORD)
+            elapsed = time.perf_counter() - started
+            self.stdout.write("%s: %.1f logins/s per core, %.1fms each" % (
+                label, logins / elapsed, 1000 * elapsed / logins))
@@ -0,0 +1,18 @@
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from account.user_cache import user_cache
+
+
+def get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = user_cache.get(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    # AuthenticationMiddleware reading request.user through
+    # account.user_cache instead of a query per request
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
@@ -1,9 +1,12 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import translation
 
-from account.forms import EmployeeRegistrationForm, EmployerRegistrationForm
+from account.forms import EmployeeRegistrationForm, EmployerRegistrationForm, UserLoginForm
 from account.models import User
+from account.user_cache import UserCache
 
 
 class TestEmployeeRegistrationForm(TestCase):
@@ -188,4 +191,77 @@ class TestLogoutView(BaseTest):
 
     def test_redirect_after_logout(self):
         response = self.client.get(reverse("accounts:logout"))
-        self.assertEqual(response.status_code, 302)
\ No newline at end of file
+        self.assertEqual(response.status_code, 302)
+
+
+class CountingHasher(PBKDF2PasswordHasher):
+    # Cheap PBKDF2 that counts the hashes it computes
+    iterations = 1000
+    calls = 0
+
+    def encode(self, password, salt, iterations=None):
+        CountingHasher.calls += 1
+        return super().encode(password, salt, iterations)
+
+
+@override_settings(PASSWORD_HASHERS=["account.tests.CountingHasher"])
+class TestLoginHashing(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(email="test@test.com", password="Abcdefgh.1", role="employee")
+
+    def hashes(self, email, password):
+        CountingHasher.calls = 0
+        form = UserLoginForm(data={"email": email, "password": password})
+        return form.is_valid(), CountingHasher.calls
+
+    def test_every_attempt_costs_one_hash(self):
+        self.assertEqual(self.hashes("test@test.com", "Abcdefgh.1"), (True, 1))
+        self.assertEqual(self.hashes("test@test.com", "wrong password"), (False, 1))
+        # Unknown emails and inactive users cannot be told apart by timing
+        self.assertEqual(self.hashes("nobody@test.com", "Abcdefgh.1"), (False, 1))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.hashes("test@test.com", "Abcdefgh.1"), (False, 1))
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=CountingHasher().encode("Abcdefgh.1", CountingHasher().salt(), iterations=500))
+        # Check, then rehash with the current parameters
+        self.assertEqual(self.hashes("test@test.com", "Abcdefgh.1"), (True, 2))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertEqual(self.hashes("test@test.com", "Abcdefgh.1"), (True, 1))
+
+
+class TestUserCache(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(email="test@test.com", password="Abcdefgh.1", role="employee")
+        self.client.login(email="test@test.com", password="Abcdefgh.1")
+        self.url = reverse("job:employee-favorites")
+        self.client.get(self.url)
+
+    def test_password_change_ends_other_sessions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("Changed.Password1")
+            self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_changes_reach_other_workers_once_committed(self):
+        # Another worker, sharing the cache but not the entries
+        worker = UserCache()
+        request = RequestFactory().get(self.url)
+        request.session = self.client.session
+        self.assertEqual(worker.get(request).role, "employee")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "employer"
+            self.user.save()
+            # Not committed yet, the cached user is still the current one
+            with self.assertNumQueries(0):
+                self.assertEqual(worker.get(request).role, "employee")
+        self.assertEqual(worker.get(request).role, "employer")
+
+    def test_logout_drops_the_cached_user(self):
+        self.client.get(reverse("account:logout"))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
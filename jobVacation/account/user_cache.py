@@ -0,0 +1,81 @@
+import threading
+import time
+import uuid
+
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+
+# Per-process cache of authenticated users, keyed by session. The session
+# itself comes from the cache (SESSION_ENGINE cached_db or signed cookies),
+# so a warm authenticated request runs no session or user query: the user
+# is taken from here as long as its entry is younger than TTL and the
+# user's token in the shared cache has not changed.
+#
+# Saving a user (password, role or any other change) and logging out
+# replace the token once the change commits. Every process compares it on
+# its next request for that user, as the token lives in the shared cache
+# (see job.checks); this process's entries are dropped at the same time.
+# Changes made without signals, e.g. QuerySet.update(), show after at most
+# TTL seconds.
+
+TTL = 30
+
+
+def token_key(user_id):
+    return "user-token:%s" % user_id
+
+
+class UserCache:
+    def __init__(self, ttl=TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # (session key, user id, session auth hash, backend) -> (expires, token, user)
+        self.entries = {}
+
+    def get(self, request):
+        session = request.session
+        user_id = session.get(SESSION_KEY)
+        if user_id is None:
+            return auth.get_user(request)
+        key = (session.session_key, user_id, session.get(HASH_SESSION_KEY), session.get(BACKEND_SESSION_KEY))
+        token = cache.get(token_key(user_id))
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > now and entry[1] == token:
+            # A copy, so a request changing its user leaves the entry alone
+            return copy_user(entry[2])
+        # Checks the session auth hash, and flushes the session on mismatch
+        user = auth.get_user(request)
+        with self.lock:
+            if user.is_authenticated:
+                self.entries[key] = (now + self.ttl, token, copy_user(user))
+            else:
+                self.entries.pop(key, None)
+            if len(self.entries) > 10000:
+                self.entries = {key: entry for key, entry in self.entries.items() if entry[0] > now}
+        return user
+
+    def invalidate(self, user_id):
+        # Until the change commits the cached user is still the current one,
+        # and an earlier rotation would let it be cached again meanwhile
+        transaction.on_commit(lambda: self.rotate(user_id))
+
+    def rotate(self, user_id):
+        cache.set(token_key(user_id), uuid.uuid4().hex, None)
+        with self.lock:
+            self.entries = {key: entry for key, entry in self.entries.items() if str(key[1]) != str(user_id)}
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+
+def copy_user(user):
+    return user.__class__.from_db(user._state.db, None, [
+        getattr(user, field.attname) for field in user._meta.concrete_fields
+    ])
+
+
+user_cache = UserCache()
@@ -13,6 +13,7 @@ class RegisterEmployeeView(CreateView):
     template_name = "account/register_employee.html"
     success_url = "/"
     extra_content = {"title": "Register Employee"}
+    max_queries = 2
     
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated:
@@ -37,6 +38,7 @@ class RegisterEmployerView(CreateView):
     template_name = "account/register_employer.html"
     success_url = '/'
     extra_content = {"title": "Register Employer"}
+    max_queries = 2
     
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated:
@@ -60,6 +62,7 @@ class LoginView(FormView):
     template_name = "account/login.html"
     success_url = "/"
     extra_content = {"title": "Login"}
+    max_queries = 9
     
     def dispatch(self, request, *args, **kwargs):
         if self.request.user.is_authenticated:
@@ -84,6 +87,7 @@ class LoginView(FormView):
     
 class LogoutView(RedirectView):
     url = '/login'
+    max_queries = 4
     
     def get(self, request, *args, **kwargs):
         auth.logout(request)
@@ -0,0 +1,157 @@
+import json
+
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from job import facets, search, tag_index
+from job.decorators import query_budget
+from job.models import Job
+from job.pagination import decode_cursor, encode_cursor
+
+# Read-only JSON API for jobs. Lists are filtered like SearchView, ordered by
+# id and paginated by cursor; the body is streamed while rows are read with
+# QuerySet.iterator(), so memory stays flat whatever ?limit= asks for. Tags
+# are fetched once per chunk of rows, never per job.
+
+FIELDS = (
+    "id", "title", "description", "location", "type", "category", "last_date", "name_company",
+    "salary", "filled", "expired", "created_at", "updated_at", "tags", "url",
+)
+# Output fields that are not columns of Job
+COMPUTED_FIELDS = ("tags", "url")
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+CHUNK_SIZE = 500
+
+encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+
+class ApiError(Exception):
+    pass
+
+
+def parse_fields(params):
+    requested = [field.strip() for field in params.get("fields", "").split(",") if field.strip()]
+    unknown = [field for field in requested if field not in FIELDS]
+    if unknown:
+        raise ApiError("Unknown fields: %s" % ", ".join(unknown))
+    # Output keeps the order of FIELDS whatever order was asked for
+    return [field for field in FIELDS if field in requested] if requested else list(FIELDS)
+
+
+def parse_limit(params):
+    try:
+        limit = int(params.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_cursor(params):
+    # Id after which the page starts, or None for the first page
+    cursor = params.get("cursor")
+    if not cursor:
+        return None
+    try:
+        (last_id,), _ = decode_cursor(cursor, Job, ("id",))
+    except Http404:
+        raise ApiError("Invalid cursor")
+    return last_id
+
+
+def _columns(fields):
+    # id is always read, cursors and tags need it
+    return ["id"] + [field for field in fields if field not in COMPUTED_FIELDS and field != "id"]
+
+
+def _tags_for(job_ids):
+    tags = {}
+    rows = Job.tags.through.objects.filter(job_id__in=job_ids).order_by("tag__name").values_list("job_id", "tag__name")
+    for job_id, name in rows:
+        tags.setdefault(job_id, []).append(name)
+    return tags
+
+
+def _serialize(rows, fields):
+    tags = _tags_for([row["id"] for row in rows]) if "tags" in fields else {}
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == "tags":
+                item["tags"] = tags.get(row["id"], [])
+            elif field == "url":
+                item["url"] = reverse("job:api-job-detail", args=[row["id"]])
+            else:
+                item[field] = row[field]
+        yield item
+
+
+def filtered_jobs(params):
+    queryset = facets.apply_filters(Job.objects.listed(), params, ("type", "category", "tag", "salary"))
+    try:
+        queryset = tag_index.apply_filter(queryset, params)
+    except BadRequest as error:
+        # A malformed ?tags= query
+        raise ApiError(str(error))
+    return search.apply_search(queryset, params, ranked=False)
+
+
+def _stream(queryset, fields, limit):
+    # Rows are read limit + 1 at most; the extra one only tells if there is a
+    # next page. Output is flushed once per chunk of rows.
+    def encode(chunk, first):
+        body = ",".join(encoder.encode(item) for item in _serialize(chunk, fields))
+        return body if first else "," + body
+
+    yield '{"results":['
+    rows = queryset.values(*_columns(fields))[:limit + 1].iterator(chunk_size=CHUNK_SIZE)
+    chunk = []
+    sent = 0
+    last_id = None
+    has_next = False
+    for row in rows:
+        if sent + len(chunk) == limit:
+            has_next = True
+            break
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield encode(chunk, sent == 0)
+            sent += len(chunk)
+            last_id = chunk[-1]["id"]
+            chunk = []
+    if chunk:
+        yield encode(chunk, sent == 0)
+        last_id = chunk[-1]["id"]
+    yield '],"next":%s}' % json.dumps(encode_cursor([last_id]) if has_next else None)
+
+
+@require_GET
+@query_budget(2)
+def job_list_api(request):
+    try:
+        fields = parse_fields(request.GET)
+        limit = parse_limit(request.GET)
+        last_id = parse_cursor(request.GET)
+        queryset = filtered_jobs(request.GET).order_by("id")
+    except ApiError as error:
+        return JsonResponse(data={"error": str(error)}, status=400)
+
+    if last_id is not None:
+        queryset = queryset.filter(id__gt=last_id)
+    return StreamingHttpResponse(_stream(queryset, fields, limit), content_type="application/json")
+
+
+@require_GET
+@query_budget(2)
+def job_detail_api(request, id):
+    try:
+        fields = parse_fields(request.GET)
+    except ApiError as error:
+        return JsonResponse(data={"error": str(error)}, status=400)
+    row = Job.objects.filter(id=id).values(*_columns(fields)).first()
+    if row is None:
+        return JsonResponse(data={"error": "Job not found"}, status=404)
+    return JsonResponse(data=next(_serialize([row], fields)), encoder=DjangoJSONEncoder)
@@ -0,0 +1,179 @@
+import heapq
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+
+from job import facets, routers
+
+# In-process typeahead for the search box. Each kind of suggestion (job
+# titles, locations, categories and tag names) lives in a PrefixIndex: two
+# parallel sorted lists (normalized key, display label) plus an array of
+# weights, the number of jobs using the term. A lookup is two bisects for the
+# prefix range and a top-k by weight over it, so keystrokes never touch the
+# database once the index is built.
+#
+# Memory budget: an entry costs two list slots (16 bytes), one array slot
+# (8 bytes) and the key and label strings (49 bytes + length each, shared when
+# they are equal). With 20 character terms that is ~130-160 bytes, a budget of
+# 16 MB per 100k entries; bench_autocomplete measures ~13 MB.
+#
+# The signals in job.signals apply this process's changes once their
+# transaction commits. Changes from other processes, and bulk writes that
+# send no signals, are picked up by a rebuild when the facet generation has
+# moved since the last build, checked at most every REFRESH_SECONDS.
+
+KINDS = ("title", "location", "category", "tag")
+MAX_LIMIT = 20
+# Top-k answers over prefix ranges at least this large are memoized until the
+# next change; there are few such prefixes and they are the popular ones
+MEMO_MIN_RANGE = 256
+REFRESH_SECONDS = 60
+
+
+def normalize(term):
+    return " ".join((term or "").split()).lower()
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._labels = []
+        self._weights = array("q")
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def clear(self):
+        self.__init__()
+
+    def add(self, term, weight=1):
+        key = normalize(term)
+        if not key:
+            return
+        self._memo.clear()
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            self._weights[i] += weight
+            if self._weights[i] <= 0:
+                del self._keys[i]
+                del self._labels[i]
+                del self._weights[i]
+        elif weight > 0:
+            label = " ".join(term.split())
+            self._keys.insert(i, sys.intern(key))
+            self._labels.insert(i, sys.intern(label) if label != key else self._keys[i])
+            self._weights.insert(i, weight)
+
+    def discard(self, term, weight=1):
+        self.add(term, -weight)
+
+    def load(self, weighted_terms):
+        # Bulk build from (term, weight) pairs, sorting once instead of inserting
+        merged = {}
+        for term, weight in weighted_terms:
+            key = normalize(term)
+            if key and weight > 0:
+                label, total = merged.get(key, (" ".join(term.split()), 0))
+                merged[key] = (label, total + weight)
+        keys = sorted(merged)
+        self._keys = [sys.intern(key) for key in keys]
+        self._labels = [sys.intern(merged[key][0]) if merged[key][0] != key else key for key in self._keys]
+        self._weights = array("q", (merged[key][1] for key in keys))
+        self._memo = {}
+
+    def top(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        memo_key = (prefix, limit)
+        if memo_key in self._memo:
+            return self._memo[memo_key]
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\U0010ffff", lo)
+        weights = self._weights
+        positions = heapq.nlargest(limit, range(lo, hi), key=weights.__getitem__)
+        results = [(self._labels[i], weights[i]) for i in positions]
+        if hi - lo >= MEMO_MIN_RANGE:
+            self._memo[memo_key] = results
+        return results
+
+
+class Autocomplete:
+    def __init__(self):
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        self.lock = threading.RLock()
+        self.ready = False
+        self.generation = None
+        self.checked_at = 0.0
+
+    def build(self):
+        from job.models import Job
+        from tags.models import Tag
+
+        with self.lock, routers.primary():
+            self.generation = facets.generation()
+            self.checked_at = time.monotonic()
+            for kind in ("title", "location", "category"):
+                rows = Job.objects.order_by().values_list(kind).annotate(count=Count("id"))
+                self.indexes[kind].load(rows)
+            # A tag counts once for itself, plus once per job using it
+            rows = Tag.objects.order_by().annotate(count=Count("job")).values_list("name", "count")
+            self.indexes["tag"].load((name, count + 1) for name, count in rows)
+            self.ready = True
+
+    def reset(self):
+        with self.lock:
+            for index in self.indexes.values():
+                index.clear()
+            self.ready = False
+
+    def sync(self):
+        # Rebuild if the facet generation moved on since the last build
+        with self.lock:
+            if self.ready and time.monotonic() - self.checked_at < REFRESH_SECONDS:
+                return
+            if not self.ready or self.generation != facets.generation():
+                self.build()
+            else:
+                self.checked_at = time.monotonic()
+
+    def update(self, kind, removed=None, added=None, weight=1):
+        # Incremental change from a model signal, applied when the transaction
+        # commits so a rollback leaves the index alone
+        transaction.on_commit(lambda: self.apply(kind, removed, added, weight))
+
+    def apply(self, kind, removed=None, added=None, weight=1):
+        # Ignored until the first build, which reads the current state anyway
+        with self.lock:
+            if not self.ready:
+                return
+            if removed:
+                self.indexes[kind].discard(removed, weight)
+            if added:
+                self.indexes[kind].add(added, weight)
+
+    def suggest(self, prefix, kinds=KINDS, limit=10):
+        self.sync()
+        with self.lock:
+            return {
+                kind: [{"value": label, "count": weight} for label, weight in self.indexes[kind].top(prefix, limit)]
+                for kind in kinds
+            }
+
+
+suggester = Autocomplete()
+
+
+def warm():
+    # Build the index at process startup (see wsgi.py/asgi.py) so the first
+    # keystroke does not pay for it; a missing table just defers the build
+    try:
+        suggester.build()
+    except DatabaseError:
+        suggester.reset()
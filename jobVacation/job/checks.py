@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends that live in one process. The facet generation (job.facets) and
+# the caches built on it are only invalidated across workers and management
+# commands through a cache they all share.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# Shared backends whose incr() is atomic. Every other one reads and then
+# writes, so two processes bumping the facet generation at once lose a bump
+# and each takes the surviving one for its own (see TagIndex.followed).
+ATOMIC_INCR_CACHES = (
+    "job.filecache.FileBasedCache",
+    "django.core.cache.backends.memcached.MemcachedCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django_redis.cache.RedisCache",
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            "The default cache (%s) is not shared between processes." % backend,
+            hint="Configure a shared CACHES backend, see jobVacation/settings/prod.py.",
+            id="job.E001",
+        )]
+    if backend not in ATOMIC_INCR_CACHES:
+        return [Error(
+            "The default cache (%s) has no atomic incr()." % backend,
+            hint="Use one of %s." % ", ".join(ATOMIC_INCR_CACHES),
+            id="job.E002",
+        )]
+    return []
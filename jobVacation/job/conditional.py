@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from job import facets, favorites
+from job.models import Job
+
+
+# Conditional GET (ETag) for pages whose content is fully determined by a
+# cheap version lookup. The version is fetched first; when the client
+# already has it, a 304 is returned without running the view's queries or
+# rendering its template.
+#
+# There is no Last-Modified: a page also changes on login, with the user's
+# favorites and when a job is deleted, none of which moves a date, so an
+# If-Modified-Since alone would get a wrong 304.
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode("utf-8")).hexdigest())
+
+
+def latest_job_change():
+    # (newest Job.updated_at, facet generation) for pages listing jobs. The
+    # first is one step down the updated_at index, whatever the filters; the
+    # generation moves on every job and tag change, deletes included, in any
+    # process.
+    last_modified = Job.objects.order_by("-updated_at").values_list("updated_at", flat=True).first()
+    return last_modified, facets.generation()
+
+
+class ConditionalGetMixin:
+    def get_version(self):
+        # Tuple of the parts identifying the content
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        parts = self.get_version()
+        # Pages show the navbar and favorites of the current user
+        etag = make_etag(request.user.pk, sorted(favorites.ids_for(request.user)), *parts)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if not response.has_header("ETag"):
+            response["ETag"] = etag
+        patch_vary_headers(response, ("Cookie",))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
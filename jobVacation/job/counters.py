@@ -0,0 +1,94 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from job.models import Applicant, Favorite, Job
+
+# Applicant.status -> Job counter field; anything else counts as rejected,
+# like Applicant.get_status
+STATUS_FIELDS = {
+    Applicant.PENDING: "applicant_pending_count",
+    Applicant.ACCEPTED: "applicant_accepted_count",
+}
+REJECTED_FIELD = "applicant_rejected_count"
+
+
+def status_field(status):
+    return STATUS_FIELDS.get(int(status), REJECTED_FIELD)
+
+
+def _shift(job_id, **deltas):
+    # One UPDATE with F() expressions, safe against concurrent requests;
+    # returns the number of jobs updated (0 if the job does not exist)
+    return Job.objects.filter(pk=job_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items() if delta})
+
+
+def applicant_added(job_id, status=Applicant.PENDING):
+    return _shift(job_id, **{status_field(status): 1})
+
+
+def applicant_status_changed(job_id, old_status, new_status):
+    old, new = status_field(old_status), status_field(new_status)
+    if old == new:
+        return 0
+    return _shift(job_id, **{old: -1, new: 1})
+
+
+def favorite_added(job_id):
+    return _shift(job_id, favorite_count=1)
+
+
+def favorite_removed(job_id):
+    return _shift(job_id, favorite_count=-1)
+
+
+def _count(queryset):
+    return Coalesce(Subquery(
+        queryset.filter(job_id=OuterRef("pk")).order_by().values("job_id").annotate(n=Count("id")).values("n")
+    ), 0)
+
+
+def true_counts():
+    # Correlated subqueries recomputing every counter from the source rows
+    return {
+        "applicant_pending_count": _count(Applicant.objects.filter(status=Applicant.PENDING)),
+        "applicant_accepted_count": _count(Applicant.objects.filter(status=Applicant.ACCEPTED)),
+        REJECTED_FIELD: _count(Applicant.objects.exclude(status__in=list(STATUS_FIELDS))),
+        "favorite_count": _count(Favorite.objects.all()),
+    }
+
+
+def recount_applicants(job_ids):
+    # One UPDATE setting the applicant counters of job_ids from their rows,
+    # for changes too mixed to express as deltas (see job.responses)
+    expressions = true_counts()
+    return Job.objects.filter(id__in=job_ids).update(
+        **{field: expression for field, expression in expressions.items() if field != "favorite_count"})
+
+
+def reconcile(batch_size=1000, dry_run=False, stdout=None):
+    # Find jobs whose counters drifted from the source rows, one id range at
+    # a time, and repair them with a single UPDATE ... SET = (SELECT COUNT)
+    # per batch so concurrent F() increments are never overwritten with a
+    # count read earlier.
+    expressions = true_counts()
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        ids = list(Job.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        checked += len(ids)
+        drifted = list(
+            Job.objects.filter(id__in=ids)
+            .annotate(**{"true_" + field: expression for field, expression in expressions.items()})
+            .exclude(**{field: F("true_" + field) for field in expressions})
+            .values_list("id", flat=True)
+        )
+        if drifted and not dry_run:
+            Job.objects.filter(id__in=drifted).update(**expressions)
+        repaired += len(drifted)
+        if stdout is not None and drifted:
+            stdout.write("Jobs %d-%d: %d drifted" % (ids[0], ids[-1], len(drifted)))
+    return checked, repaired
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from job import routers
+from job.models import Applicant, Job
+
+# Employer dashboard summary: totals over all of an employer's jobs, summed
+# from the denormalized counters on Job (see job.counters), and the number
+# of applications received in the last RECENT_DAYS days. Cached per
+# employer and dropped once an application is made, answered or withdrawn
+# or a job is saved and the change commits: dropped any earlier, a
+# concurrent request could cache the old totals again. Favorites and views
+# only catch up after CACHE_TIMEOUT.
+
+CACHE_TIMEOUT = 5 * 60
+RECENT_DAYS = 7
+
+TOTALS = {
+    "jobs": Count("id"),
+    "open_jobs": Count("id", filter=Q(filled=False, expired=False)),
+    "expired_jobs": Count("id", filter=Q(expired=True)),
+    "pending": Coalesce(Sum("applicant_pending_count"), 0),
+    "accepted": Coalesce(Sum("applicant_accepted_count"), 0),
+    "rejected": Coalesce(Sum("applicant_rejected_count"), 0),
+    "favorites": Coalesce(Sum("favorite_count"), 0),
+    "views": Coalesce(Sum("view_count"), 0),
+}
+
+
+def cache_key(employer_id):
+    return "employer-summary:%d" % employer_id
+
+
+def summary(employer_id):
+    # Two queries when not cached, none otherwise
+    key = cache_key(employer_id)
+    result = cache.get(key)
+    if result is None:
+        with routers.primary():
+            result = Job.objects.filter(user_id=employer_id).aggregate(**TOTALS)
+            result["applicants"] = result["pending"] + result["accepted"] + result["rejected"]
+            result["recent_applicants"] = Applicant.objects.filter(
+                job__user_id=employer_id, created_at__gte=timezone.now() - timedelta(days=RECENT_DAYS)).count()
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def invalidate(employer_id):
+    transaction.on_commit(lambda: cache.delete(cache_key(employer_id)))
+
+
+def invalidate_for_job(job_id):
+    employer_id = Job.objects.filter(pk=job_id).values_list("user_id", flat=True).first()
+    if employer_id is not None:
+        invalidate(employer_id)
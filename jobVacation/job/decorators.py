@@ -1,20 +1,33 @@
+from functools import wraps
+
 from django.core.exceptions import PermissionDenied
 
-def user_is_employee(function):
-    def wrap(request, *args, **kwargs):
-        user = request.user
-        if user == 'employee':
-            return function(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-        
-    return wrap
-
-def user_is_employer(function):
-    def wrap(request, *args, **kwargs):
-        user = request.user
-        if user == 'employer':
-            return function(request, *args, **kwargs)
-        else:
+
+def user_has_role(role):
+    # Allow authenticated users whose role field is role. request.user comes
+    # from account.middleware, so on a warm process this needs no query.
+    def decorator(function):
+        @wraps(function)
+        def wrap(request, *args, **kwargs):
+            user = request.user
+            if user.is_authenticated and user.role == role:
+                return function(request, *args, **kwargs)
             raise PermissionDenied
-    return wrap
\ No newline at end of file
+
+        return wrap
+
+    return decorator
+
+
+user_is_employee = user_has_role("employee")
+user_is_employer = user_has_role("employer")
+
+
+def query_budget(max_queries):
+    # The max_queries of a function view (class-based views set the
+    # attribute), see job.middleware.QueryBudgetMiddleware
+    def decorator(function):
+        function.max_queries = max_queries
+        return function
+
+    return decorator
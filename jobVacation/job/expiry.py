@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.utils import timezone
+
+from job import facets
+from job.models import Job
+
+# Expiry sweep: jobs whose last_date has passed are closed (expired=True)
+# by a periodic run of expire_jobs, so listings select open jobs by flag
+# through job_open_idx instead of comparing dates on every request. Each
+# batch is one UPDATE ... WHERE id IN (SELECT ... LIMIT n), keeping write
+# transactions short whatever the backlog.
+#
+# UPDATE sends no signals, so the sweep bumps updated_at itself (conditional
+# GETs, incremental similar jobs) and the facet generation (facet counts,
+# the tag index).
+
+BATCH_SIZE = 500
+
+
+def due(today=None):
+    return Job.objects.unfilled(last_date__lt=today or timezone.localdate())
+
+
+def sweep(today=None, batch_size=BATCH_SIZE, stdout=None):
+    # Returns the number of jobs expired
+    today = today or timezone.localdate()
+    expired = 0
+    while True:
+        batch = due(today).order_by("last_date", "id").values("id")[:batch_size]
+        with transaction.atomic():
+            count = Job.objects.filter(id__in=batch).update(expired=True, updated_at=timezone.now())
+        if not count:
+            break
+        expired += count
+        if stdout is not None:
+            stdout.write("Expired %d jobs" % expired)
+    if expired:
+        facets.invalidate()
+    return expired
@@ -0,0 +1,98 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
+
+from job.models import Applicant
+
+# Streamed applicant exports for employers. Rows are read with
+# QuerySet.iterator() and written out a chunk at a time, so an export holds
+# one chunk of rows in memory however many applicants there are.
+
+COLUMNS = ("id", "job_id", "job_title", "email", "first_name", "last_name", "status", "applied_at")
+# Same JOIN of user and job as select_related("user", "job"), without
+# building three model instances per row
+VALUES = ("id", "job_id", "job__title", "user__email", "user__first_name", "user__last_name", "status",
+          "created_at")
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+STATUS_LABELS = {Applicant.PENDING: "pending", Applicant.ACCEPTED: "accepted", Applicant.REJECTED: "rejected"}
+CHUNK_SIZE = 2000
+# Columns holding text typed in by users: job title, email and names
+TEXT_COLUMNS = (2, 3, 4, 5)
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+
+def filter_by_status(queryset, params):
+    # ?status=0|1|2 as on the applicant lists; empty means all
+    status = params.get("status", "")
+    if not status:
+        return queryset
+    if not status.isdigit() or int(status) not in STATUS_LABELS:
+        raise Http404("Invalid status")
+    return queryset.filter(status=int(status))
+
+
+def rows(queryset):
+    for row in queryset.order_by("id").values_list(*VALUES).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        row[6] = STATUS_LABELS.get(row[6], row[6])
+        row[7] = row[7].isoformat()
+        yield row
+
+
+def spreadsheet_safe(value):
+    # Prefix user text that a spreadsheet would evaluate with a quote, so it
+    # opens as the literal text
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    # File-like object for csv.writer that hands back each line
+    def write(self, value):
+        return value
+
+
+def _csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    chunk = []
+    for row in rows(queryset):
+        for index in TEXT_COLUMNS:
+            row[index] = spreadsheet_safe(row[index])
+        chunk.append(writer.writerow(row))
+        if len(chunk) == CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def _ndjson(queryset):
+    chunk = []
+    for row in rows(queryset):
+        chunk.append(encoder.encode(dict(zip(COLUMNS, row))) + "\n")
+        if len(chunk) == CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+STREAMS = {"csv": _csv, "ndjson": _ndjson}
+
+
+def stream(queryset, format="csv"):
+    return STREAMS[format](queryset)
+
+
+def export_response(queryset, format, filename):
+    if format not in FORMATS:
+        raise Http404("Unknown export format")
+    response = StreamingHttpResponse(stream(queryset, format), content_type=FORMATS[format])
+    response["Content-Disposition"] = 'attachment; filename="%s.%s"' % (filename, format)
+    return response
@@ -0,0 +1,152 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from job import routers
+
+# Facet counts for a filtered Job queryset. Everything except tags comes from
+# a single GROUP BY over (type, category, location, salary bucket) whose rows
+# are folded into per-facet totals in Python; tags need a second grouped query
+# over the Job.tags through table. Results are cached per normalized filter
+# key and a generation number that is bumped whenever a Job changes. The
+# generation lives in the shared cache (see job.checks), so a bump by any
+# worker or management command reaches every process.
+
+SALARY_BUCKETS = (
+    ("lt5m", "Below 5M", None, 5000000),
+    ("5m-10m", "5M - 10M", 5000000, 10000000),
+    ("10m-20m", "10M - 20M", 10000000, 20000000),
+    ("gte20m", "20M and above", 20000000, None),
+)
+FACET_FILTERS = ("type", "category", "location", "tag", "salary")
+
+CACHE_TIMEOUT = 300
+GENERATION_KEY = "job-facets:generation"
+
+
+def salary_q(bucket):
+    for key, label, low, high in SALARY_BUCKETS:
+        if key == bucket:
+            q = Q(salary__isnull=False)
+            if low is not None:
+                q &= Q(salary__gte=low)
+            if high is not None:
+                q &= Q(salary__lt=high)
+            return q
+    return None
+
+
+def apply_filters(queryset, params, names=FACET_FILTERS):
+    # Narrow a Job queryset by the facet values selected in request params
+    for name in ("type", "category", "location"):
+        value = params.get(name, "").strip()
+        if name in names and value:
+            queryset = queryset.filter(**{"%s__iexact" % name: value})
+    tag = params.get("tag", "").strip()
+    if "tag" in names and tag.isdigit():
+        queryset = queryset.filter(tags__id=int(tag))
+    q = salary_q(params.get("salary", "").strip())
+    if "salary" in names and q is not None:
+        queryset = queryset.filter(q)
+    return queryset
+
+
+def normalize_filters(params, names):
+    # Stable representation of the filters that shape a queryset, so that
+    # "Jakarta " and "jakarta" share one cache entry
+    normalized = []
+    for name in sorted(names):
+        value = " ".join(params.get(name, "").split()).lower()
+        if value:
+            normalized.append((name, value))
+    return tuple(normalized)
+
+
+def _salary_bucket():
+    whens = []
+    for key, label, low, high in SALARY_BUCKETS:
+        whens.append(When(salary_q(key), then=Value(key)))
+    return Case(*whens, default=Value(""), output_field=CharField())
+
+
+def compute_facets(queryset):
+    model = queryset.model
+    type_labels = dict(model._meta.get_field("type").choices)
+    salary_labels = {key: label for key, label, low, high in SALARY_BUCKETS}
+
+    totals = {"type": {}, "category": {}, "location": {}, "salary": {}}
+    rows = (
+        queryset.order_by()
+        .values("type", "category", "location", salary_bucket=_salary_bucket())
+        .annotate(count=Count("id"))
+    )
+    for row in rows:
+        for name, value in (
+            ("type", row["type"]),
+            ("category", row["category"]),
+            ("location", row["location"]),
+            ("salary", row["salary_bucket"]),
+        ):
+            if value:
+                totals[name][value] = totals[name].get(value, 0) + row["count"]
+
+    through = model.tags.through
+    tag_rows = (
+        through.objects.filter(job_id__in=queryset.order_by().values("id"))
+        .values("tag_id", "tag__name")
+        .annotate(count=Count("job_id"))
+    )
+
+    def ordered(items):
+        return sorted(items, key=lambda item: (-item["count"], item["label"]))
+
+    return {
+        "type": ordered(
+            {"value": value, "label": type_labels.get(value, value), "count": count}
+            for value, count in totals["type"].items()),
+        "category": ordered(
+            {"value": value, "label": value, "count": count} for value, count in totals["category"].items()),
+        "location": ordered(
+            {"value": value, "label": value, "count": count} for value, count in totals["location"].items()),
+        "salary": [
+            {"value": key, "label": salary_labels[key], "count": totals["salary"][key]}
+            for key, label, low, high in SALARY_BUCKETS if key in totals["salary"]
+        ],
+        "tags": ordered(
+            {"value": str(row["tag_id"]), "label": row["tag__name"], "count": row["count"]} for row in tag_rows),
+    }
+
+
+def generation():
+    # Seeded from the clock so that an evicted counter never restarts at a
+    # value whose entries may still be cached
+    value = cache.get(GENERATION_KEY)
+    if value is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        value = cache.get(GENERATION_KEY)
+    return value
+
+
+def invalidate():
+    # Returns the new generation. incr() is atomic in the production cache
+    # (see job.checks), so concurrent bumps each get their own value.
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        return cache.incr(GENERATION_KEY)
+
+
+def get_facets(queryset, key=None):
+    if key is None:
+        return compute_facets(queryset)
+    digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+    cache_key = "job-facets:%s:%s" % (generation(), digest)
+    facets = cache.get(cache_key)
+    if facets is None:
+        with routers.primary():
+            facets = compute_facets(queryset)
+        cache.set(cache_key, facets, CACHE_TIMEOUT)
+    return facets
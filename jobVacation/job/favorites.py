@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from job import counters, feed, routers
+from job.models import Favorite
+from job.sqlite import write_transaction
+
+# Favorites of an employee. Adding is a single INSERT ... ON CONFLICT DO
+# NOTHING against the unique (user, job) constraint and removing a single
+# DELETE, so a double click or two tabs can never create a second row or
+# count a favorite twice: whichever request loses the race writes nothing.
+#
+# Listing pages mark hearts from ids_for(), the user's favorite job ids as
+# one set in the shared cache, dropped once a change of the user's favorites
+# commits (here, or through the Favorite signals in job.signals). Dropping it
+# earlier would let a concurrent request cache the old set again.
+
+CACHE_TIMEOUT = 60 * 60
+
+ADDED = "added"
+REMOVED = "removed"
+
+
+def cache_key(user_id):
+    return "job-favorites:%d" % user_id
+
+
+def ids_for(user):
+    # frozenset of the job ids user has favorited; no query when cached
+    if not user.is_authenticated:
+        return frozenset()
+    key = cache_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        with routers.primary():
+            ids = frozenset(Favorite.objects.filter(user_id=user.pk).values_list("job_id", flat=True))
+        cache.set(key, ids, CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate(user_id):
+    transaction.on_commit(lambda: cache.delete(cache_key(user_id)))
+
+
+def _insert(user_id, job_id):
+    # 1 if the row was written, 0 if it already existed
+    opts = Favorite._meta
+    sql = "INSERT INTO %s (%s, %s, %s, %s) VALUES (%%s, %%s, %%s, %%s) ON CONFLICT (%s, %s) DO NOTHING" % (
+        (connection.ops.quote_name(opts.db_table),) + tuple(
+            connection.ops.quote_name(opts.get_field(name).column)
+            for name in ("user", "job", "created_at", "status", "user", "job")))
+    # Adapted like the ORM does, so raw and ORM rows store the same format
+    created_at = opts.get_field("created_at").get_db_prep_value(timezone.now(), connection)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, job_id, created_at, False])
+        return cursor.rowcount
+
+
+def add(user_id, job_id):
+    # True if favorited afterwards, False if the job does not exist
+    with write_transaction():
+        if _insert(user_id, job_id):
+            if not counters.favorite_added(job_id):
+                transaction.set_rollback(True)
+                return False
+            # The raw INSERT sends no post_save
+            feed.mark_stale(user_id)
+    invalidate(user_id)
+    return True
+
+
+def remove(user_id, job_id):
+    with write_transaction():
+        deleted, _ = Favorite.objects.filter(user_id=user_id, job_id=job_id).delete()
+        if deleted:
+            counters.favorite_removed(job_id)
+    return deleted
+
+
+def toggle(user_id, job_id, state=None):
+    # Sets the favorite to state (True/False), or flips it when state is
+    # None. Returns ADDED, REMOVED, or None if the job does not exist.
+    if state is None:
+        with write_transaction():
+            if remove(user_id, job_id):
+                return REMOVED
+            return ADDED if add(user_id, job_id) else None
+    if state:
+        return ADDED if add(user_id, job_id) else None
+    remove(user_id, job_id)
+    return REMOVED
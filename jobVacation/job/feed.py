@@ -0,0 +1,168 @@
+import heapq
+from operator import itemgetter
+
+from django.db import connection
+from django.utils import timezone
+
+from job.models import Applicant, Favorite, Job, JobFeed
+from job.similar import Corpus, terms
+from job.sqlite import write_transaction
+
+# "Recommended for you" feeds of employees. A job is a TF-IDF vector of its
+# title words, category, location and tags (job.similar's vectors without
+# the description, which says little about fit). An employee's profile is
+# the weighted sum of the vectors of the jobs they applied to or favorited,
+# and the feed is the FEED_SIZE unfilled jobs scoring highest against it,
+# minus those jobs. Scores are a sparse profile x jobs product through the
+# corpus postings, so a user costs PROFILE_TERMS postings walks.
+#
+# compute_feeds (run periodically) rewrites the JobFeed rows of every
+# employee with a history, a batch of users per two queries; serving a feed
+# is then one primary key lookup in any process. Requests never build the
+# corpus. Instead, applying to or favoriting a job marks the user's row
+# stale in the same transaction (an empty one for a new user), and
+# compute_feeds(stale_only=True), run often, rescores just those users.
+# Until then jobs applied to or favorited are filtered out when the feed's
+# jobs are read. A row marked again while its user is being rescored keeps
+# its mark: its version has moved on.
+
+FEED_SIZE = 20
+EVENT_WEIGHTS = {"application": 2.0, "favorite": 1.0}
+PROFILE_TERMS = 8
+POSTINGS_LIMIT = 100
+BATCH_SIZE = 500
+
+
+def _documents(queryset):
+    rows = list(queryset.order_by().values_list("id", "title", "category", "location"))
+    tags = {}
+    through = Job.tags.through.objects.filter(job_id__in=queryset.order_by().values("id"))
+    for job_id, name in through.values_list("job_id", "tag__name"):
+        tags.setdefault(job_id, []).append(name)
+    documents = {}
+    for job_id, title, category, location in rows:
+        counts = terms(title, "", category, tags.get(job_id, ()))
+        if location:
+            counts["~" + location.strip().lower()] = 1
+        documents[job_id] = counts
+    return documents
+
+
+class FeedModel:
+    def __init__(self):
+        self.corpus = Corpus(_documents(Job.objects.unfilled()), postings_limit=POSTINGS_LIMIT)
+        # Vectors of filled jobs met in histories
+        self.extra = {}
+
+    def vectors(self, job_ids):
+        missing = [job_id for job_id in job_ids if job_id not in self.corpus.vectors and job_id not in self.extra]
+        for start in range(0, len(missing), BATCH_SIZE):
+            documents = _documents(Job.objects.filter(id__in=missing[start:start + BATCH_SIZE]))
+            for job_id, counts in documents.items():
+                self.extra[job_id] = self.corpus.vectorize(counts)
+        return {job_id: self.corpus.vectors.get(job_id) or self.extra.get(job_id) for job_id in job_ids}
+
+    def profile(self, events, vectors):
+        # events: [(kind, job_id)]
+        profile = {}
+        for kind, job_id in events:
+            vector = vectors.get(job_id)
+            if vector:
+                weight = EVENT_WEIGHTS[kind]
+                for term, value in vector.items():
+                    profile[term] = profile.get(term, 0.0) + weight * value
+        return profile
+
+    def rank(self, profile, exclude, count=FEED_SIZE):
+        scores = {}
+        get = scores.get
+        postings = self.corpus.postings
+        for term, weight in heapq.nlargest(PROFILE_TERMS, profile.items(), key=itemgetter(1)):
+            for job_id, job_weight in postings.get(term, ()):
+                scores[job_id] = get(job_id, 0.0) + weight * job_weight
+        for job_id in exclude:
+            scores.pop(job_id, None)
+        return [job_id for job_id, score in heapq.nlargest(count, scores.items(), key=itemgetter(1))]
+
+    def feeds(self, user_ids):
+        # {user_id: [job_id, ...]} for one batch of users, in two queries
+        # plus one per batch of filled jobs not seen before
+        history = {user_id: [] for user_id in user_ids}
+        for user_id, job_id in Applicant.objects.filter(user_id__in=user_ids).values_list("user_id", "job_id"):
+            history[user_id].append(("application", job_id))
+        for user_id, job_id in Favorite.objects.filter(user_id__in=user_ids).values_list("user_id", "job_id"):
+            history[user_id].append(("favorite", job_id))
+        vectors = self.vectors({job_id for events in history.values() for kind, job_id in events})
+        return {
+            user_id: self.rank(self.profile(events, vectors), {job_id for kind, job_id in events})
+            for user_id, events in history.items() if events
+        }
+
+
+def mark_stale(user_id):
+    # Called in the transaction that changes user_id's history, as one upsert
+    opts = JobFeed._meta
+    table, user, job_ids, stale, version = (connection.ops.quote_name(name) for name in (
+        opts.db_table, opts.get_field("user").column, "job_ids", "stale", "version"))
+    sql = ("INSERT INTO {table} ({user}, {job_ids}, {stale}, {version}) VALUES (%s, %s, %s, 1) "
+           "ON CONFLICT ({user}) DO UPDATE SET {stale} = %s, {version} = {table}.{version} + 1").format(
+        table=table, user=user, job_ids=job_ids, stale=stale, version=version)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, opts.get_field("job_ids").get_db_prep_value([], connection), True, True])
+
+
+def stale_users():
+    # Users whose feed is marked stale, or who have a history but no feed
+    user_ids = set(JobFeed.objects.filter(stale=True).values_list("user_id", flat=True))
+    for model in (Applicant, Favorite):
+        user_ids.update(model.objects.filter(user__job_feed__isnull=True).values_list("user_id", flat=True).distinct())
+    return user_ids
+
+
+def compute_feeds(user_ids=None, batch_size=BATCH_SIZE, stdout=None, stale_only=False):
+    # Precompute and store the feeds of user_ids (default: everyone with a
+    # history, or only stale_users()); returns the number of feeds written
+    if user_ids is None and stale_only:
+        user_ids = stale_users()
+    elif user_ids is None:
+        user_ids = set(Applicant.objects.values_list("user_id", flat=True).distinct())
+        user_ids.update(Favorite.objects.values_list("user_id", flat=True).distinct())
+    user_ids = sorted(user_ids)
+    written = 0
+    if not user_ids:
+        return written
+    model = FeedModel()
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        # Read before the histories: a change committed after this read
+        # moves the version and is kept for the next run
+        versions = dict(JobFeed.objects.filter(user_id__in=batch).values_list("user_id", "version"))
+        feeds = model.feeds(batch)
+        computed_at = timezone.now()
+        with write_transaction():
+            changed = {
+                user_id for user_id, version in JobFeed.objects.filter(user_id__in=batch).values_list(
+                    "user_id", "version") if versions.get(user_id) != version}
+            JobFeed.objects.filter(user_id__in=batch).exclude(user_id__in=changed).delete()
+            JobFeed.objects.bulk_create([
+                JobFeed(user_id=user_id, job_ids=ids, computed_at=computed_at, version=versions.get(user_id, 0))
+                for user_id, ids in feeds.items() if user_id not in changed])
+        written += len(feeds.keys() - changed)
+        if stdout is not None:
+            stdout.write("Computed %d feeds" % written)
+    return written
+
+
+def feed_for(user_id):
+    # Job ids recommended to user_id, best first; [] until compute_feeds has
+    # seen a history
+    return JobFeed.objects.filter(user_id=user_id).values_list("job_ids", flat=True).first() or []
+
+
+def recommended_jobs(user_id):
+    # Open jobs of user_id's feed, in feed order, without those the user
+    # applied to or favorited since it was computed (while it is stale)
+    ids = feed_for(user_id)
+    jobs = (Job.objects.unfilled().exclude(applicants__user_id=user_id).exclude(favorites__user_id=user_id)
+            .in_bulk(ids))
+    return [jobs[job_id] for job_id in ids if job_id in jobs]
@@ -0,0 +1,49 @@
+import os
+import pickle
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache as BaseFileBasedCache
+from django.core.files import locks
+
+# Django's FileBasedCache with an atomic incr() and add(), for the facet
+# generation (job.facets). The stock ones read the file and then write it,
+# so two processes bumping the generation at once could both write the same
+# value and one bump was lost. Here they run under an exclusive lock on a
+# file of the cache directory, which every process of this host shares. The
+# lock file has no cache suffix, so culling and clear() leave it alone.
+
+LOCK_NAME = "incr.lock"
+
+
+class FileBasedCache(BaseFileBasedCache):
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_NAME), "ab") as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(file)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Keeps the key's expiry, as the memcached backends do
+        with self._locked():
+            try:
+                with open(self._key_to_file(key, version), "rb") as file:
+                    expiry = pickle.load(file)
+                    value = pickle.loads(zlib.decompress(file.read()))
+            except FileNotFoundError:
+                raise ValueError("Key '%s' not found" % key)
+            if expiry is not None and expiry < time.time():
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            self.set(key, value, None if expiry is None else expiry - time.time(), version)
+            return value
@@ -1,10 +1,12 @@
-from datetime import datetime
 from django import forms
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 from job.models import Job, Applicant
 
-class CreateJobForm(forms.Form):
+MAX_TAGS = 7
+
+class CreateJobForm(forms.ModelForm):
     class Meta:
         model = Job
         exclude = ('user', 'created_at')
@@ -23,21 +25,14 @@ class CreateJobForm(forms.Form):
     
     def clean_last_date(self):
         date = self.cleaned_data['last_date']
-        if date.date() < datetime.now().date():
+        if date < timezone.now().date():
             raise ValidationError("Last date can't be before from today")
         return date
     def clean_tags(self):
         tags = self.cleaned_data['tags']
-        if tags > 7:
-            raise ValidationError("You can't add tags more than 7 tags")
+        if len(tags) > MAX_TAGS:
+            raise ValidationError("You can't add tags more than %d tags" % MAX_TAGS)
         return tags
-    def save(self, commit=False):
-        job = super(CreateJobForm, self).save(commit=False)
-        if commit:
-            job.save()
-            for tag in self.clean_tags["tags"]:
-                job.tags.add(tag)
-        return job
     
 class ApplyJobForm(forms.Form):
     class Meta:
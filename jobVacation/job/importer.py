@@ -0,0 +1,164 @@
+import csv
+import json
+import time
+
+from django import forms
+from django.db import connection, transaction
+from django.db.models import Max
+
+from job import facets, search
+from job.forms import CreateJobForm
+from job.models import Job
+from job.sqlite import write_transaction
+from tags.models import Tag
+
+# Bulk import of job postings from CSV or NDJSON. Rows are validated with the
+# rules of CreateJobForm, then each batch is written in its own transaction
+# as one bulk INSERT of jobs, one lookup and one bulk INSERT of missing tags,
+# and one bulk INSERT of job-tag rows, however many rows and tags it has.
+# bulk_create sends no signals, so the search index is updated per batch and
+# each batch bumps the facet generation as it commits: that drops the facet
+# cache and makes the tag index and autocomplete of every web process
+# rebuild (see job.tag_index and job.autocomplete).
+
+FORMATS = ("csv", "ndjson")
+TAG_MAX_LENGTH = Tag._meta.get_field("name").max_length
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class TagNamesField(forms.Field):
+    # A list of tag names (NDJSON) or a comma-separated string (CSV)
+    def to_python(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = value.split(",")
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError("Tags must be a list or a comma-separated string")
+        names = []
+        for name in value:
+            name = " ".join(str(name).split())
+            if len(name) > TAG_MAX_LENGTH:
+                raise forms.ValidationError("Tag names can't be longer than %d characters" % TAG_MAX_LENGTH)
+            if name and name not in names:
+                names.append(name)
+        return names
+
+
+class JobImportForm(CreateJobForm):
+    # CreateJobForm with tags given by name; clean_tags still caps their number
+    tags = TagNamesField(required=False)
+
+    def bind(self, data):
+        # Validate the next row with this form, rather than building a new
+        # one per row and deep-copying all its fields again
+        self.data = data
+        self.is_bound = True
+        self.instance = Job()
+        self._errors = None
+        self._bound_fields_cache = {}
+        return self
+
+
+def detect_format(path):
+    for format in FORMATS:
+        if path.lower().endswith("." + format):
+            return format
+    raise ImportFileError("Can't tell the format of %s, pass --format" % path)
+
+
+def read_rows(file, format):
+    if format == "csv":
+        yield from csv.DictReader(file)
+        return
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise ImportFileError("Line %d is not valid JSON: %s" % (number, error))
+        if not isinstance(row, dict):
+            raise ImportFileError("Line %d is not a JSON object" % number)
+        yield row
+
+
+def tag_ids(names, cache):
+    # Fill cache {name: id} for names, creating missing tags in one INSERT.
+    # Names are not unique in Tag; the oldest tag of a name is used.
+    missing = [name for name in names if name not in cache]
+    if missing:
+        for tag_id, name in Tag.objects.filter(name__in=missing).order_by("-id").values_list("id", "name"):
+            cache[name] = tag_id
+        new = [name for name in missing if name not in cache]
+        if new:
+            Tag.objects.bulk_create([Tag(name=name) for name in new])
+            cache.update(Tag.objects.filter(name__in=new).values_list("name", "id"))
+    return cache
+
+
+def write_batch(batch, tag_cache):
+    # batch is a list of (job, tag names)
+    with write_transaction():
+        last_id = None
+        if not connection.features.can_return_rows_from_bulk_insert:
+            last_id = Job.objects.aggregate(last=Max("id"))["last"] or 0
+        jobs = Job.objects.bulk_create([job for job, names in batch])
+        if last_id is not None:
+            # The transaction holds the write lock since it began (BEGIN
+            # IMMEDIATE, see job.sqlite), so no other writer can insert
+            # between the read above and the insert: the new rows are the
+            # ones after the previous last id, in insert order
+            ids = list(Job.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True))
+            for job, pk in zip(jobs, ids):
+                job.pk = pk
+
+        tag_ids({name for job, names in batch for name in names}, tag_cache)
+        through = Job.tags.through
+        through.objects.bulk_create([
+            through(job_id=job.pk, tag_id=tag_cache[name])
+            for job, names in batch
+            for name in names
+        ])
+        if search.is_supported():
+            search.index_jobs(jobs, {job.pk: names for job, names in batch})
+        transaction.on_commit(facets.invalidate)
+    return len(jobs)
+
+
+def import_jobs(rows, user, batch_size=500, dry_run=False, stdout=None, stderr=None):
+    # Returns (imported, skipped, seconds)
+    started = time.monotonic()
+    imported = skipped = 0
+    tag_cache = {}
+    batch = []
+
+    def flush():
+        nonlocal imported, batch
+        if batch and not dry_run:
+            imported += write_batch(batch, tag_cache)
+            if stdout is not None:
+                elapsed = time.monotonic() - started
+                stdout.write("Imported %d jobs (%.0f jobs/s)" % (imported, imported / elapsed if elapsed else 0))
+        elif batch:
+            imported += len(batch)
+        batch = []
+
+    form = JobImportForm()
+    for number, row in enumerate(rows, start=1):
+        if not form.bind(row).is_valid():
+            skipped += 1
+            if stderr is not None:
+                errors = "; ".join("%s: %s" % (field, " ".join(messages)) for field, messages in form.errors.items())
+                stderr.write("Row %d skipped: %s" % (number, errors))
+            continue
+        job = form.save(commit=False)
+        job.user = user
+        batch.append((job, form.cleaned_data["tags"]))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return imported, skipped, time.monotonic() - started
@@ -0,0 +1,12 @@
+import json
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+
+def ids_lookup(ids):
+    # Value for an id__in lookup. On SQLite the ids travel as one JSON
+    # parameter, since a large IN list would exceed its variable limit.
+    if connection.vendor == "sqlite":
+        return RawSQL("SELECT value FROM json_each(%s)", [json.dumps(ids)])
+    return ids
@@ -0,0 +1,69 @@
+# Synthetic data used by the bench_* commands. Benchmarks run inside a
+# transaction that is rolled back, so nothing is left in the database.
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+
+from account.models import User
+from job.models import JOB_TYPE, Job
+from tags.models import Tag
+
+WORDS = (
+    "python django backend frontend engineer developer data analyst manager senior junior "
+    "remote cloud devops mobile android ios designer product marketing sales finance "
+    "accountant support teacher nurse driver writer security network database"
+).split()
+LOCATIONS = ("Jakarta", "Bandung", "Surabaya", "Yogyakarta", "Medan", "Semarang", "Bali", "Makassar")
+CATEGORIES = ("Engineering", "Design", "Marketing", "Finance", "Education", "Health", "Logistics")
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_users(count, role, prefix="bench"):
+    users = [
+        User(email="%s-%s-%d@example.com" % (prefix, role, i), role=role, password="!")
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=500)
+    return list(User.objects.filter(email__startswith="%s-%s-" % (prefix, role)).order_by("id"))
+
+
+def create_tags(names=WORDS):
+    Tag.objects.bulk_create([Tag(name=name) for name in names])
+    return list(Tag.objects.filter(name__in=names))
+
+
+def create_jobs(count, employers, tags=(), seed=0, batch_size=1000):
+    rnd = random.Random(seed)
+    last_date = timezone.now().date() + timedelta(days=30)
+    tags = list(tags)
+    through = Job.tags.through
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        jobs = Job.objects.bulk_create([
+            Job(
+                user=rnd.choice(employers),
+                title=" ".join(rnd.sample(WORDS, 3)).title(),
+                description=" ".join(rnd.choice(WORDS) for _ in range(40)),
+                location=rnd.choice(LOCATIONS),
+                type=rnd.choice(JOB_TYPE)[0],
+                category=rnd.choice(CATEGORIES),
+                last_date=last_date,
+                name_company="Company %d" % rnd.randrange(1000),
+                salary=rnd.randrange(3, 40) * 1000000,
+            )
+            for _ in range(size)
+        ])
+        if tags:
+            ids = list(Job.objects.order_by("-id").values_list("id", flat=True)[:size])
+            through.objects.bulk_create([
+                through(job_id=job_id, tag_id=tag.pk)
+                for job_id in ids
+                for tag in rnd.sample(tags, rnd.randint(1, 3))
+            ])
+        created += len(jobs)
+    return created
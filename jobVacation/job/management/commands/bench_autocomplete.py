@@ -0,0 +1,57 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from job.autocomplete import PrefixIndex
+from job.management.commands._synthetic import LOCATIONS, WORDS
+
+
+class Command(BaseCommand):
+    help = "Measure autocomplete lookup latency and memory of the prefix index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entries", type=int, default=100000)
+        parser.add_argument("--lookups", type=int, default=20000)
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(3)
+        vocabulary = WORDS + [location.lower() for location in LOCATIONS]
+        terms = set()
+        while len(terms) < options["entries"]:
+            terms.add(" ".join(rnd.sample(vocabulary, rnd.randint(1, 3))) + " %d" % rnd.randrange(100))
+        weighted = [(term, rnd.randint(1, 500)) for term in terms]
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = PrefixIndex()
+        index.load(weighted)
+        build_time = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write("Built %d entries in %.2fs, %.1f MB (%.1f MB per 100k entries)" % (
+            len(index), build_time, memory / 2 ** 20, memory / 2 ** 20 * 100000 / len(index)))
+
+        prefixes = []
+        for _ in range(options["lookups"]):
+            term = rnd.choice(weighted)[0]
+            prefixes.append(term[:rnd.randint(1, min(len(term), 8))])
+
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.top(prefix, options["limit"])
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.stdout.write("Lookup latency: p50 %.1fus p99 %.1fus max %.1fus" % (
+            1e6 * timings[len(timings) // 2],
+            1e6 * timings[int(len(timings) * 0.99)],
+            1e6 * timings[-1],
+        ))
+
+        started = time.perf_counter()
+        for term, weight in weighted[:1000]:
+            index.add(term + " new", 1)
+        self.stdout.write("Incremental insert: %.1fus per entry" % (1e6 * (time.perf_counter() - started) / 1000))
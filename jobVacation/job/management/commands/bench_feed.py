@@ -0,0 +1,55 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from job import feed
+from job.management.commands._synthetic import Rollback, create_jobs, create_tags, create_users
+from job.models import Applicant, Favorite, Job
+
+
+class Command(BaseCommand):
+    help = "Measure batch computation of recommended job feeds over synthetic employee histories"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--jobs", type=int, default=20000)
+        parser.add_argument("--applications", type=int, default=4, help="Per user")
+        parser.add_argument("--favorites", type=int, default=2, help="Per user")
+        parser.add_argument("--batch-size", type=int, default=feed.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rnd = random.Random(14)
+        create_jobs(options["jobs"], create_users(20, "employer"), create_tags())
+        users = [user.id for user in create_users(options["users"], "employee")]
+        jobs = list(Job.objects.values_list("id", flat=True))
+        for model, count in ((Applicant, options["applications"]), (Favorite, options["favorites"])):
+            model.objects.bulk_create(
+                [model(user_id=user, job_id=job) for user in users for job in rnd.sample(jobs, count)],
+                batch_size=5000)
+
+        started = time.perf_counter()
+        model = feed.FeedModel()
+        self.stdout.write("Built the job corpus of %d jobs in %.2fs" % (len(model.corpus), time.perf_counter() - started))
+
+        size = options["batch_size"]
+        started = time.perf_counter()
+        for start in range(0, len(users), size):
+            model.feeds(users[start:start + size])
+        elapsed = time.perf_counter() - started
+        self.stdout.write("Scored %d users in %.2fs: %.2fs per 10k users, %.1fs projected for 100k" % (
+            len(users), elapsed, elapsed * 10000 / len(users), elapsed * 100000 / len(users)))
+
+        started = time.perf_counter()
+        written = feed.compute_feeds(users, batch_size=size)
+        self.stdout.write("compute_feeds with table writes: %d feeds in %.2fs" % (
+            written, time.perf_counter() - started))
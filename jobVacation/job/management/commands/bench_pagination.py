@@ -0,0 +1,51 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from job.management.commands._synthetic import Rollback, create_jobs, create_users
+from job.models import Job
+from job.pagination import encode_cursor
+from job.views import JobListView
+
+
+class Command(BaseCommand):
+    help = "Compare OFFSET and keyset pagination latency of JobListView at a deep page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        page_size = JobListView.paginate_by
+        page = options["page"]
+        create_jobs(page_size * (page + 10), create_users(20, "employer"))
+        view = JobListView.as_view()
+        factory = RequestFactory()
+
+        # The cursor a client would hold after following "next" page - 1 times
+        last_id = Job.objects.order_by("id").values_list("id", flat=True)[(page - 1) * page_size - 1]
+        cursor = encode_cursor([last_id])
+
+        for label, params in (("OFFSET ?page=%d" % page, {"page": page}), ("keyset ?cursor=", {"cursor": cursor})):
+            timings = []
+            for _ in range(options["repeat"]):
+                request = factory.get("/jobs/", params)
+                # What AuthenticationMiddleware sets for a visitor
+                request.user = AnonymousUser()
+                started = time.perf_counter()
+                response = view(request)
+                ids = [job.id for job in response.context_data["page_obj"]]
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write("%s: p50 %.2fms first id %d" % (label, 1000 * timings[len(timings) // 2], ids[0]))
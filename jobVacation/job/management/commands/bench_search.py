@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from job import search
+from job.management.commands._synthetic import (
+    LOCATIONS, WORDS, Rollback, create_jobs, create_tags, create_users)
+from job.models import Job
+
+
+class Command(BaseCommand):
+    help = "Compare full-text search against the LIKE search path on synthetic jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--page-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search needs the SQLite FTS5 extension")
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rnd = random.Random(1)
+        page_size = options["page_size"]
+        employers = create_users(20, "employer")
+        create_jobs(options["jobs"], employers, create_tags())
+
+        started = time.perf_counter()
+        search.rebuild_index(batch_size=2000)
+        self.stdout.write("Indexed %d jobs in %.2fs" % (options["jobs"], time.perf_counter() - started))
+
+        queries = [(rnd.choice(WORDS), rnd.choice(LOCATIONS)) for _ in range(options["queries"])]
+
+        def like(word, location):
+            queryset = Job.objects.filter(
+                Q(title__icontains=word) | Q(description__icontains=word), location__icontains=location)
+            return queryset.count(), list(queryset[:page_size])
+
+        def fts(word, location):
+            results = search.RankedJobSearch(search.build_match_query(word, location=location))
+            return results.count(), results[:page_size]
+
+        for label, func in (("LIKE", like), ("FTS5", fts)):
+            timings = []
+            for word, location in queries:
+                started = time.perf_counter()
+                func(word, location)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write("%s: mean %.2fms p50 %.2fms p99 %.2fms" % (
+                label,
+                1000 * sum(timings) / len(timings),
+                1000 * timings[len(timings) // 2],
+                1000 * timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+            ))
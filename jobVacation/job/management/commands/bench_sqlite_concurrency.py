@@ -0,0 +1,149 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from job.sqlite import WriteQueue, apply_pragmas
+
+# Favorite toggles against job listing reads, on a throwaway database file
+# shaped like job_job/job_favorite, so threads can commit freely. Each
+# toggle reads before it writes, like the ORM code paths. The last profile
+# is what ships: job.sqlite.write_transaction opens with BEGIN IMMEDIATE and
+# queues the writers of a process; the deferred BEGIN rows are for
+# comparison.
+
+# The pragmas of settings.prod, for runs under other settings
+WAL_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+SCHEMA = """
+CREATE TABLE job (id INTEGER PRIMARY KEY, title TEXT, created_at REAL, favorite_count INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX job_created_idx ON job (created_at);
+CREATE TABLE favorite (user_id INTEGER, job_id INTEGER, UNIQUE (user_id, job_id));
+"""
+PAGE = """
+SELECT job.id, job.title, job.favorite_count, favorite.user_id IS NOT NULL
+FROM job LEFT JOIN favorite ON favorite.job_id = job.id AND favorite.user_id = ?
+ORDER BY job.created_at DESC LIMIT 20 OFFSET ?
+"""
+
+
+def connect(path, pragmas):
+    # Python's default 5s timeout is what Django connections get too
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def toggle(cursor, user_id, job_id, begin="BEGIN IMMEDIATE"):
+    cursor.execute(begin)
+    try:
+        cursor.execute("SELECT 1 FROM favorite WHERE user_id = ? AND job_id = ?", [user_id, job_id])
+        if cursor.fetchone():
+            cursor.execute("DELETE FROM favorite WHERE user_id = ? AND job_id = ?", [user_id, job_id])
+            delta = -1
+        else:
+            cursor.execute("INSERT INTO favorite VALUES (?, ?)", [user_id, job_id])
+            delta = 1
+        cursor.execute("UPDATE job SET favorite_count = favorite_count + ? WHERE id = ?", [delta, job_id])
+        cursor.execute("COMMIT")
+    except sqlite3.Error:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+class Command(BaseCommand):
+    help = "Measure SQLite writes and reads per second under contention, per journaling profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each profile")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of operations that write")
+        parser.add_argument("--jobs", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pragmas = getattr(settings, "SQLITE_PRAGMAS", None) or WAL_PRAGMAS
+        for label, profile_pragmas, queue, begin in (
+            ("Rollback journal, BEGIN", {}, None, "BEGIN"),
+            ("WAL pragmas, BEGIN", pragmas, None, "BEGIN"),
+            ("WAL pragmas, BEGIN IMMEDIATE", pragmas, None, "BEGIN IMMEDIATE"),
+            ("WAL pragmas, BEGIN IMMEDIATE + write queue", pragmas, WriteQueue(), "BEGIN IMMEDIATE"),
+        ):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.sqlite3")
+                self.populate(path, options)
+                result = self.run(path, profile_pragmas, queue, begin, options)
+            self.stdout.write(
+                "%s: %.0f writes/s, %.0f reads/s, %d lock errors, write p95 %.1fms, read p95 %.1fms" % (
+                    label, result["writes"] / options["seconds"], result["reads"] / options["seconds"],
+                    result["errors"], result["write_p95"], result["read_p95"]))
+
+    def populate(self, path, options):
+        connection = sqlite3.connect(path)
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO job (id, title, created_at) VALUES (?, ?, ?)", [
+            (job_id, "Job %d" % job_id, job_id) for job_id in range(1, options["jobs"] + 1)])
+        connection.commit()
+        connection.close()
+
+    def run(self, path, pragmas, queue, begin, options):
+        # Connected up front, so a thread can not die before the barrier
+        connections = [connect(path, pragmas) for _ in range(options["threads"])]
+        start = threading.Barrier(options["threads"])
+        deadline = time.perf_counter() + options["seconds"]
+        results = []
+
+        def worker(seed, connection):
+            rnd = random.Random(seed)
+            cursor = connection.cursor()
+            writes, reads, errors = [], [], 0
+            start.wait()
+            while time.perf_counter() < deadline:
+                user_id = rnd.randrange(options["users"])
+                started = time.perf_counter()
+                try:
+                    if rnd.random() < options["write_ratio"]:
+                        job_id = rnd.randrange(1, options["jobs"] + 1)
+                        if queue is None:
+                            toggle(cursor, user_id, job_id, begin)
+                        else:
+                            with queue:
+                                toggle(cursor, user_id, job_id, begin)
+                        writes.append(time.perf_counter() - started)
+                    else:
+                        cursor.execute(PAGE, [user_id, 20 * rnd.randrange(10)]).fetchall()
+                        reads.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    # "database is locked"
+                    errors += 1
+            connection.close()
+            results.append((writes, reads, errors))
+
+        threads = [
+            threading.Thread(target=worker, args=(seed, connection)) for seed, connection in enumerate(connections)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        writes = sorted(timing for result in results for timing in result[0])
+        reads = sorted(timing for result in results for timing in result[1])
+        return {
+            "writes": len(writes),
+            "reads": len(reads),
+            "errors": sum(result[2] for result in results),
+            "write_p95": 1000 * writes[int(len(writes) * 0.95)] if writes else 0,
+            "read_p95": 1000 * reads[int(len(reads) * 0.95)] if reads else 0,
+        }
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from job import tag_index as tags
+from job.management.commands._synthetic import Rollback, create_jobs, create_tags, create_users
+from job.models import Job
+
+
+class Command(BaseCommand):
+    help = "Compare boolean tag filters on the bitmap tag index against chained ORM joins"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            tags.tag_index.reset()
+
+    def run(self, options):
+        rnd = random.Random(1)
+        page_size = options["page_size"]
+        employers = create_users(20, "employer")
+        tag_list = create_tags()
+        names = [tag.name for tag in tag_list]
+        create_jobs(options["jobs"], employers, tag_list)
+
+        started = time.perf_counter()
+        tags.tag_index.build()
+        self.stdout.write("Indexed %d jobs in %.2fs" % (options["jobs"], time.perf_counter() - started))
+
+        # (query, ORM equivalent) for "a AND b AND NOT c", "a OR b" and "(a OR b) AND c"
+        def and_not(a, b, c):
+            return "%s AND %s AND NOT %s" % (a, b, c), (
+                Job.objects.filter(tags__name=a).filter(tags__name=b).exclude(tags__name=c))
+
+        def either(a, b, c):
+            return "%s OR %s" % (a, b), Job.objects.filter(Q(tags__name=a) | Q(tags__name=b)).distinct()
+
+        def grouped(a, b, c):
+            return "(%s OR %s) AND %s" % (a, b, c), (
+                Job.objects.filter(Q(tags__name=a) | Q(tags__name=b)).filter(tags__name=c).distinct())
+
+        queries = [rnd.choice((and_not, either, grouped))(*rnd.sample(names, 3)) for _ in range(options["queries"])]
+
+        def orm(query, queryset):
+            queryset = queryset.order_by("id")
+            return queryset.count(), list(queryset[:page_size])
+
+        def bitmap(query, queryset):
+            queryset = tags.apply_filter(Job.objects.all(), {"tags": query}).order_by("id")
+            return queryset.count(), list(queryset[:page_size])
+
+        def evaluate(query, queryset):
+            return len(tags.tag_index.query(query))
+
+        results = {}
+        for label, func in (("ORM joins", orm), ("Bitmap + SQL", bitmap), ("Bitmap only", evaluate)):
+            timings = []
+            counts = []
+            for query, queryset in queries:
+                started = time.perf_counter()
+                result = func(query, queryset)
+                timings.append(time.perf_counter() - started)
+                counts.append(result if isinstance(result, int) else result[0])
+            results[label] = counts
+            timings.sort()
+            self.stdout.write("%s: mean %.2fms p50 %.2fms p99 %.2fms" % (
+                label,
+                1000 * sum(timings) / len(timings),
+                1000 * timings[len(timings) // 2],
+                1000 * timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+            ))
+        if len(set(map(tuple, results.values()))) != 1:
+            self.stderr.write("Result counts differ between approaches")
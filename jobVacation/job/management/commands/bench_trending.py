@@ -0,0 +1,74 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from job import trending
+from job.management.commands._synthetic import Rollback, create_jobs, create_users
+from job.models import Applicant, Favorite, Job, JobViewDay
+
+
+class Command(BaseCommand):
+    help = "Measure trending score recomputation over synthetic application, favorite and view events"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=1000000)
+        parser.add_argument("--jobs", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rnd = random.Random(6)
+        events = options["events"]
+        create_jobs(options["jobs"], create_users(20, "employer"))
+        users = [user.id for user in create_users(options["users"], "employee")]
+        jobs = list(Job.objects.values_list("id", flat=True))
+        now = timezone.now()
+
+        def pairs(count):
+            # (user, job) is unique for applications and favorites
+            seen = set()
+            while len(seen) < count:
+                seen.add((rnd.choice(users), rnd.choice(jobs)))
+            return seen
+
+        def age():
+            return timedelta(hours=rnd.expovariate(1 / 48.0))
+
+        started = time.perf_counter()
+        applications, favorites = int(events * 0.4), int(events * 0.2)
+        for model, count in ((Applicant, applications), (Favorite, favorites)):
+            model.objects.bulk_create(
+                [model(user_id=user, job_id=job, created_at=now - age()) for user, job in pairs(count)],
+                batch_size=5000)
+        views = {}
+        for _ in range(events - applications - favorites):
+            key = (rnd.choice(jobs), (now - age()).date())
+            views[key] = views.get(key, 0) + 1
+        JobViewDay.objects.bulk_create(
+            [JobViewDay(job_id=job, day=day, views=count) for (job, day), count in views.items()], batch_size=5000)
+        self.stdout.write("Generated %d events (%d view buckets) in %.1fs" % (
+            events, len(views), time.perf_counter() - started))
+
+        timings = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            trending.recompute()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write("Recompute: best %.2fs, mean %.2fs" % (min(timings), sum(timings) / len(timings)))
+
+        started = time.perf_counter()
+        for _ in range(100):
+            trending.top(3)
+        self.stdout.write("Homepage top 3: %.3fms per read" % (10 * (time.perf_counter() - started)))
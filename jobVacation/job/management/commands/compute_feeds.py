@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from job import feed
+
+
+class Command(BaseCommand):
+    help = "Precompute the recommended job feeds of employees into JobFeed (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=feed.BATCH_SIZE)
+        parser.add_argument("--stale", action="store_true",
+                            help="Only users whose history changed since their feed, or who have none")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = feed.compute_feeds(batch_size=options["batch_size"], stdout=self.stdout, stale_only=options["stale"])
+        self.stdout.write(self.style.SUCCESS("Computed %d feeds in %.2fs" % (written, time.perf_counter() - started)))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from job import similar
+
+
+class Command(BaseCommand):
+    help = "Recompute the similar jobs of new and edited jobs (run periodically; --full rebuilds all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute every unfilled job")
+        parser.add_argument("--neighbors", type=int, default=similar.NEIGHBORS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        updated = similar.recompute(full=options["full"], count=options["neighbors"])
+        self.stdout.write(self.style.SUCCESS("Updated similar jobs of %d jobs in %.2fs" % (
+            updated, time.perf_counter() - started)))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from job import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute time-decayed trending scores and store the top ranked jobs (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=trending.TOP_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ranked = trending.recompute(size=options["size"])
+        self.stdout.write(self.style.SUCCESS("Ranked %d trending jobs in %.2fs" % (
+            ranked, time.perf_counter() - started)))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from job import expiry
+
+
+class Command(BaseCommand):
+    help = "Close unfilled jobs whose last_date has passed (run daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=expiry.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        expired = expiry.sweep(batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Expired %d jobs in %.2fs" % (expired, time.perf_counter() - started)))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.models import User
+from job import importer
+
+
+class Command(BaseCommand):
+    help = "Import job postings of one employer from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--employer", required=True, help="Email of the employer posting the jobs")
+        parser.add_argument("--format", choices=importer.FORMATS, help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=500, help="Jobs written per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only validate the rows")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options["employer"], role="employer")
+        except User.DoesNotExist:
+            raise CommandError("No employer with email %s" % options["employer"])
+
+        try:
+            format = options["format"] or importer.detect_format(options["path"])
+            with open(options["path"], newline="", encoding="utf-8") as file:
+                imported, skipped, seconds = importer.import_jobs(
+                    importer.read_rows(file, format), user, batch_size=options["batch_size"],
+                    dry_run=options["dry_run"], stdout=self.stdout, stderr=self.stderr)
+        except (OSError, importer.ImportFileError) as error:
+            raise CommandError(str(error))
+
+        action = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS("%s %d jobs, skipped %d invalid rows in %.2fs (%.0f jobs/s)" % (
+            action, imported, skipped, seconds, imported / seconds if seconds else 0)))
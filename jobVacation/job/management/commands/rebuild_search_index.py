@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from job import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of jobs in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search needs the SQLite FTS5 extension")
+        total = search.rebuild_index(batch_size=options["batch_size"], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt with %d jobs" % total))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from job import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized applicant and favorite counters of jobs and repair drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted jobs")
+
+    def handle(self, *args, **options):
+        checked, drifted = counters.reconcile(
+            batch_size=options["batch_size"], dry_run=options["dry_run"], stdout=self.stdout)
+        action = "found" if options["dry_run"] else "repaired"
+        self.stdout.write(self.style.SUCCESS("Checked %d jobs, %s %d with drifted counters" % (
+            checked, action, drifted)))
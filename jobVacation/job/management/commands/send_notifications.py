@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from job import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications by email and inbox (runs until stopped; --once drains and exits)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once no message is due")
+        parser.add_argument("--workers", type=int, default=outbox.WORKERS, help="Threads sending emails")
+        parser.add_argument("--batch-size", type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls when idle")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            sent, failed = outbox.drain(batch_size=options["batch_size"], workers=options["workers"])
+            if sent or failed or options["once"]:
+                self.stdout.write(self.style.SUCCESS("Sent %d notifications, %d failed, in %.2fs" % (
+                    sent, failed, time.perf_counter() - started)))
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
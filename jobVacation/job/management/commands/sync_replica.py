@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+from job import routers
+
+
+def database_path(settings_dict):
+    # Replica files are opened read-only through a "file:<path>?mode=ro" URI
+    name = str(settings_dict["NAME"])
+    if name.startswith("file:"):
+        name = name[len("file:"):].partition("?")[0]
+    return name
+
+
+def copy_database(source, path):
+    # Online backup: readers of the replica wait for the copy instead of
+    # seeing a half-written file
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database over the replica files, standing in for replication "
+            "(runs until stopped; --once copies and exits)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Copy once and exit")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Seconds between copies, the replica lag to expect")
+
+    def handle(self, *args, **options):
+        aliases = routers.replicas()
+        if not aliases:
+            raise CommandError("No DATABASE_REPLICAS configured")
+        for alias in (DEFAULT_DB_ALIAS, *aliases):
+            if connections[alias].vendor != "sqlite":
+                raise CommandError("%s is not a SQLite database" % alias)
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            primary.ensure_connection()
+            for alias in aliases:
+                copy_database(primary.connection, database_path(connections[alias].settings_dict))
+            self.stdout.write(self.style.SUCCESS("Copied %s to %s in %.2fs" % (
+                DEFAULT_DB_ALIAS, ", ".join(aliases), time.perf_counter() - started)))
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
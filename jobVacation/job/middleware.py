@@ -0,0 +1,137 @@
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from job import routers
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = "primary_until"
+
+
+class ReplicaMiddleware:
+    # Lets safe requests read from the replicas (see job.routers), unless
+    # the client wrote within the last STICKY_SECONDS. A request that writes
+    # sets a cookie sending the client's reads to the primary until then.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.use_replicas(self.allows_replicas(request)):
+            response = self.get_response(request)
+            wrote = routers.wrote()
+        if wrote:
+            until = int(time.time()) + routers.STICKY_SECONDS
+            response.set_cookie(COOKIE_NAME, str(until), max_age=routers.STICKY_SECONDS, httponly=True,
+                                samesite="Lax")
+        return response
+
+    def allows_replicas(self, request):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return False
+        try:
+            until = int(request.COOKIES.get(COOKIE_NAME, 0))
+        except ValueError:
+            return True
+        return until <= time.time()
+
+
+# Query budgets. QueryBudgetMiddleware records the queries of every request
+# (count, total time, the SLOWEST slowest statements) on all connections and
+# reports them per resolved URL name: as X-Query-* response headers with
+# DEBUG, else as one JSON log line, at WARNING when the view's budget is
+# exceeded. A view declares its budget as a max_queries attribute (or with
+# job.decorators.query_budget); job.tests checks every URL of job.urls and
+# account.urls against it. Queries run while a streaming response is
+# consumed happen after the middleware and are not counted here.
+
+SLOWEST = 3
+# Characters of SQL kept per statement in headers and logs
+SQL_CHARS = 300
+
+
+class QueryRecorder:
+    # An execute_wrapper, see connection.execute_wrapper()
+    def __init__(self, slowest=SLOWEST):
+        self.count = 0
+        self.duration = 0.0
+        self.size = slowest
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            # Min-heap of the slowest statements so far
+            entry = (elapsed, self.count, sql)
+            if len(self._slowest) < self.size:
+                heapq.heappush(self._slowest, entry)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        # [(seconds, sql)], slowest first
+        return [(elapsed, sql) for elapsed, _, sql in sorted(self._slowest, reverse=True)]
+
+
+@contextmanager
+def record_queries():
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def budget_for(resolver_match):
+    view = resolver_match.func
+    return getattr(getattr(view, "view_class", view), "max_queries", None)
+
+
+def one_line(sql):
+    return " ".join(str(sql).split())[:SQL_CHARS]
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+
+        budget = budget_for(match)
+        report = {
+            "view": match.view_name,
+            "method": request.method,
+            "status": response.status_code,
+            "queries": recorder.count,
+            "db_ms": round(1000 * recorder.duration, 2),
+            "max_queries": budget,
+            "slowest": [{"ms": round(1000 * elapsed, 2), "sql": one_line(sql)} for elapsed, sql in recorder.slowest],
+        }
+        over = budget is not None and recorder.count > budget
+        if settings.DEBUG:
+            response["X-Query-View"] = report["view"]
+            response["X-Query-Count"] = str(report["queries"])
+            response["X-Query-Time-Ms"] = "%.2f" % report["db_ms"]
+            if budget is not None:
+                response["X-Query-Budget"] = str(budget)
+            for i, statement in enumerate(report["slowest"], 1):
+                response["X-Query-Slowest-%d" % i] = "%.2fms %s" % (statement["ms"], statement["sql"])
+        else:
+            logger.log(logging.WARNING if over else logging.INFO, json.dumps(report, sort_keys=True))
+        return response
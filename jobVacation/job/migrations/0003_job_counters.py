@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Job = apps.get_model('job', 'Job')
+    Applicant = apps.get_model('job', 'Applicant')
+    Favorite = apps.get_model('job', 'Favorite')
+
+    def count(queryset):
+        return Coalesce(Subquery(
+            queryset.filter(job_id=OuterRef('pk')).order_by().values('job_id').annotate(n=Count('id')).values('n')
+        ), 0)
+
+    Job.objects.update(
+        applicant_pending_count=count(Applicant.objects.filter(status=0)),
+        applicant_accepted_count=count(Applicant.objects.filter(status=1)),
+        applicant_rejected_count=count(Applicant.objects.exclude(status__in=[0, 1])),
+        favorite_count=count(Favorite.objects.all()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0002_job_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='applicant_accepted_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='applicant_pending_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='applicant_rejected_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
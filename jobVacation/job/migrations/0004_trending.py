@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0003_job_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingJob',
+            fields=[
+                ('job', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='job.job')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveIntegerField(db_index=True)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='job.job')),
+            ],
+            options={
+                'unique_together': {('job', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:05
+
+from django.db import migrations
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def drop_duplicate_favorites(apps, schema_editor):
+    # Keep the oldest row of every (user, job) pair and recount the jobs
+    # that had duplicates
+    Job = apps.get_model('job', 'Job')
+    Favorite = apps.get_model('job', 'Favorite')
+
+    duplicates = (
+        Favorite.objects.order_by().values('user_id', 'job_id')
+        .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1)
+    )
+    job_ids = set()
+    for row in duplicates:
+        Favorite.objects.filter(user_id=row['user_id'], job_id=row['job_id']).exclude(id=row['keep']).delete()
+        job_ids.add(row['job_id'])
+    if job_ids:
+        Job.objects.filter(id__in=job_ids).update(favorite_count=Coalesce(Subquery(
+            Favorite.objects.filter(job_id=OuterRef('pk')).order_by().values('job_id')
+            .annotate(n=Count('id')).values('n')
+        ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0007_similar_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_favorites, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='favorite',
+            unique_together={('user', 'job')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0008_favorite_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='applicant',
+            name='comment',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
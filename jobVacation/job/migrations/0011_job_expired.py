@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0010_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='expired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('expired', False), ('filled', False)), fields=['last_date'], name='job_open_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0013_job_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobfeed',
+            name='stale',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name='jobfeed',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='jobfeed',
+            name='computed_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
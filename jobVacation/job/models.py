@@ -1,18 +1,39 @@
 from django.urls import reverse
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 from account.models import User
+from job import facets
 from tags.models import Tag
 
 JOB_TYPE = (("1", "Full Time"), ("2", "Part Time"), ("3", "Contract"), ("4", "Internship"))
 
+# Denormalized counters, only ever written with F() expressions through
+# job.counters and job.view_counter (or recomputed by reconcile_job_counters)
+COUNTER_FIELDS = (
+    "applicant_pending_count", "applicant_accepted_count", "applicant_rejected_count", "favorite_count", "view_count",
+)
+
 class JobManager(models.Manager):
+    # Expired jobs (past last_date, closed by expire_jobs) are not listed;
+    # unfilled() is the open jobs, the rows of job_open_idx
     def filled(self, *args, **kwargs):
         return self.filter(filled=True, *args, **kwargs)
     
     def unfilled(self, *args, **kwargs):
-        return self.filter(filled=False, *args, **kwargs)
+        return self.filter(filled=False, expired=False, *args, **kwargs)
+
+    def expired(self, *args, **kwargs):
+        return self.filter(expired=True, *args, **kwargs)
+
+    def listed(self, *args, **kwargs):
+        # Filled jobs stay listed, marked as such
+        return self.filter(expired=False, *args, **kwargs)
+
+    def facets(self, queryset=None, key=None):
+        # Facet counts of queryset (all jobs by default), cached under key
+        return facets.get_facets(self.all() if queryset is None else queryset, key)
 
 
 class Job(models.Model):
@@ -25,14 +46,54 @@ class Job(models.Model):
     last_date = models.DateField(help_text='Enter the last date of the job')
     name_company = models.CharField(max_length=100, help_text='Enter the name of the company')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Version of the job for conditional GETs, see job.conditional
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     filled = models.BooleanField(default=False)
+    # Closed by job.expiry once last_date has passed, unlike filled which
+    # the employer sets
+    expired = models.BooleanField(default=False)
     salary = models.IntegerField(help_text='Enter the salary of the job', null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
+    applicant_pending_count = models.PositiveIntegerField(default=0, editable=False)
+    applicant_accepted_count = models.PositiveIntegerField(default=0, editable=False)
+    applicant_rejected_count = models.PositiveIntegerField(default=0, editable=False)
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
+    # Detail page views, written in batches by job.view_counter
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     
     objects = JobManager()
     
     class Meta:
         ordering = ["id"]
+        indexes = [
+            # Open jobs by deadline, for unfilled() listings and the expiry
+            # sweep's last_date range. Partial, since SQLite cannot use an
+            # index on the booleans for the NOT "filled" Django generates.
+            models.Index(fields=["last_date"], condition=Q(filled=False, expired=False), name="job_open_idx"),
+            # Newest open jobs (trending's fallback)
+            models.Index(fields=["created_at"], condition=Q(filled=False, expired=False), name="job_open_recent_idx"),
+            # Listings in id order, which would otherwise step over every
+            # expired job before the first listed one
+            models.Index(fields=["id"], condition=Q(expired=False), name="job_listed_idx"),
+            # The employer dashboard, newest first
+            models.Index(fields=["user", "created_at"], name="job_employer_recent_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Moving the deadline forward reopens an expired job
+        if self.expired and self.last_date >= timezone.localdate():
+            self.expired = False
+        # Never write counters back from a possibly stale instance
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def applicant_count(self):
+        return self.applicant_pending_count + self.applicant_accepted_count + self.applicant_rejected_count
         
     def get_absolute_url(self):
         return reverse('job-detail', args=[str(self.id)])
@@ -42,17 +103,28 @@ class Job(models.Model):
     
     
 class Applicant(models.Model):
+    PENDING, ACCEPTED, REJECTED = 0, 1, 2
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='applicants')
     created_at = models.DateTimeField(default=timezone.now)
     status = models.SmallIntegerField(default=0)
+    # Employer's note sent with the response
+    comment = models.TextField(blank=True, default="")
     
     def __str__(self):
-        return self.user.username
+        # The user model has no username, str() is the email
+        return str(self.user)
     
     class Meta:
         ordering = ["id"]
         unique_together = ["user", "job"]
+        indexes = [
+            # An employee's applications, newest first
+            models.Index(fields=["user", "created_at"], name="applicant_user_recent_idx"),
+            # A job's applicants by status
+            models.Index(fields=["job", "status"], name="applicant_job_status_idx"),
+        ]
         
     @property
     def get_status(self):
@@ -68,7 +140,93 @@ class Favorite(models.Model):
     job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='favorites')
     created_at = models.DateTimeField(default=timezone.now)
     status = models.BooleanField(default=False)
-    
+
+    class Meta:
+        # job.favorites upserts against this
+        unique_together = ["user", "job"]
+
     def __str__ (self):
         return self.job.title
-    
\ No newline at end of file
+    
+
+class JobViewDay(models.Model):
+    # Detail page views of a job per day, written by job.view_counter and read
+    # by job.trending
+    job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='view_days')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ["job", "day"]
+
+
+class TrendingJob(models.Model):
+    # Top trending jobs, rewritten by compute_trending; rank 1 is the hottest
+    job = models.OneToOneField('Job', on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField()
+    rank = models.PositiveIntegerField(db_index=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["rank"]
+
+
+class SimilarJob(models.Model):
+    # Nearest unfilled jobs of an unfilled job by TF-IDF cosine, written by
+    # compute_similar_jobs (see job.similar) and read by the detail page
+    job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='similar')
+    neighbor = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["job", "-score"]
+        unique_together = ["job", "neighbor"]
+
+
+class JobFeed(models.Model):
+    # Recommended jobs of an employee, best first, rewritten by compute_feeds
+    # (see job.feed) and read by the recommended page
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='job_feed')
+    job_ids = models.JSONField(default=list)
+    computed_at = models.DateTimeField(null=True)
+    # Set, and version bumped, by every change of the user's history
+    stale = models.BooleanField(default=False, db_index=True)
+    version = models.PositiveIntegerField(default=0)
+
+
+class OutboxMessage(models.Model):
+    # A notification to deliver, written in the transaction of the change it
+    # reports and sent by the send_notifications worker (see job.outbox)
+    EMAIL, INBOX = "email", "inbox"
+    CHANNEL_CHOICES = [(EMAIL, "Email"), (INBOX, "Inbox")]
+
+    # Idempotency key: one message per event and channel
+    key = models.CharField(max_length=200, unique=True)
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    claim = models.CharField(max_length=32, blank=True, default="")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["sent_at", "available_at"], name="job_outbox_due_idx")]
+
+
+class InboxMessage(models.Model):
+    # Internal inbox of a user, delivered from OutboxMessage
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inbox')
+    key = models.CharField(max_length=200, unique=True)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
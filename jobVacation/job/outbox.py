@@ -0,0 +1,154 @@
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from job.exports import STATUS_LABELS
+from job.models import InboxMessage, OutboxMessage
+from job.sqlite import write_transaction
+
+# Transactional outbox for notifications. Views call the notify_* functions
+# inside the transaction of the change they report, so a message exists if
+# and only if the change committed, and no request waits on SMTP. The
+# send_notifications worker drains the table:
+#
+# - claim() leases up to BATCH_SIZE due messages with one conditional
+#   UPDATE, so concurrent workers never take the same message;
+# - inbox messages are written in bulk, emails are sent from a thread pool;
+# - failures are retried after an exponential backoff, up to MAX_ATTEMPTS.
+#
+# Every message has an idempotency key (event + channel): enqueueing an
+# event twice is a no-op, inbox delivery is keyed the same way, and emails
+# carry it as their Message-ID. Delivery is at least once: an email whose
+# worker dies before marking it sent goes out again when the lease expires.
+
+CHANNELS = (OutboxMessage.EMAIL, OutboxMessage.INBOX)
+BATCH_SIZE = 100
+WORKERS = 4
+MAX_ATTEMPTS = 8
+# Seconds: first retry after BACKOFF_BASE, doubling up to BACKOFF_MAX
+BACKOFF_BASE = 30
+BACKOFF_MAX = 6 * 60 * 60
+LEASE = 5 * 60
+
+
+def enqueue(messages):
+    # messages: [(event key, recipient id, subject, body)], one row per
+    # channel each; events already enqueued are skipped
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(key="%s:%s" % (key, channel), channel=channel, recipient_id=recipient_id,
+                      subject=subject[:200], body=body)
+        for key, recipient_id, subject, body in messages
+        for channel in CHANNELS
+    ], batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def notify_application(applicant_id, employer_id, job_title, applicant_email):
+    enqueue([(
+        "application:%d" % applicant_id, employer_id,
+        "New application for %s" % job_title,
+        "%s applied for %s." % (applicant_email, job_title),
+    )])
+
+
+def notify_responses(rows, status, comment="", responded_at=None):
+    # rows: [(applicant id, applicant user id, job title)]. The key names the
+    # response event by its time, so every committed change of a response
+    # is notified, the last one included when it flips back to an earlier
+    # status.
+    label = STATUS_LABELS[status]
+    event = int((responded_at or timezone.now()).timestamp() * 1000000)
+    enqueue([
+        ("response:%d:%d:%d" % (applicant_id, status, event), user_id,
+         "Your application for %s was %s" % (title, label),
+         "Your application for %s was %s.%s" % (title, label, "\n\n" + comment if comment else ""))
+        for applicant_id, user_id, title in rows
+    ])
+
+
+def backoff(attempts):
+    # Seconds before retry number attempts, with jitter so failed batches
+    # do not come back in lockstep
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(1, 1.25)
+
+
+def claim(batch_size=BATCH_SIZE, lease=LEASE):
+    now = timezone.now()
+    free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    due = OutboxMessage.objects.filter(free, sent_at__isnull=True, attempts__lt=MAX_ATTEMPTS, available_at__lte=now)
+    ids = list(due.order_by("available_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Conditional on the lease still being free and the message unsent: a
+    # competing worker that picked the same ids only gets the ones it
+    # updated first, and one that sent a message since is not sent again
+    OutboxMessage.objects.filter(free, id__in=ids, sent_at__isnull=True).update(
+        claim=token, claimed_until=now + timedelta(seconds=lease))
+    return list(OutboxMessage.objects.filter(claim=token).select_related("recipient"))
+
+
+def message_id(key):
+    return "<%s@%s>" % (key.replace(":", "."), settings.DEFAULT_FROM_EMAIL.rpartition("@")[2])
+
+
+def _send_email(message):
+    # Runs in a pool thread, without touching the database
+    EmailMessage(
+        message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient.email],
+        headers={"Message-ID": message_id(message.key)},
+    ).send()
+
+
+def _send_all(emails, pool):
+    # {message id: error text} of the emails that failed
+    futures = {message.id: pool.submit(_send_email, message) for message in emails}
+    errors = {}
+    for message_id, future in futures.items():
+        error = future.exception()
+        if error is not None:
+            errors[message_id] = "%s: %s" % (type(error).__name__, error)
+    return errors
+
+
+def deliver(messages, pool):
+    # Returns (sent, failed)
+    inbox = [message for message in messages if message.channel == OutboxMessage.INBOX]
+    emails = [message for message in messages if message.channel == OutboxMessage.EMAIL]
+    InboxMessage.objects.bulk_create([
+        InboxMessage(user_id=message.recipient_id, key=message.key, subject=message.subject, body=message.body)
+        for message in inbox
+    ], ignore_conflicts=True)
+    errors = _send_all(emails, pool)
+
+    now = timezone.now()
+    with write_transaction():
+        sent = [message.id for message in messages if message.id not in errors]
+        OutboxMessage.objects.filter(id__in=sent).update(sent_at=now, claim="", claimed_until=None)
+        for message in messages:
+            if message.id in errors:
+                OutboxMessage.objects.filter(id=message.id).update(
+                    attempts=F("attempts") + 1, last_error=errors[message.id][:1000], claim="", claimed_until=None,
+                    available_at=now + timedelta(seconds=backoff(message.attempts + 1)))
+    return len(sent), len(errors)
+
+
+def drain(batch_size=BATCH_SIZE, workers=WORKERS, stdout=None):
+    # Deliver every due message; returns (sent, failed)
+    sent = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            messages = claim(batch_size)
+            if not messages:
+                break
+            batch_sent, batch_failed = deliver(messages, pool)
+            sent += batch_sent
+            failed += batch_failed
+            if stdout is not None:
+                stdout.write("Sent %d, failed %d" % (sent, failed))
+    return sent, failed
@@ -0,0 +1,113 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+# Keyset ("seek") pagination: instead of OFFSET n, a page continues after the
+# ordering values of the last row it showed, so every page costs the same
+# index range scan and no COUNT(*) is needed. Cursors are opaque base64 JSON
+# of those values plus a direction.
+
+def encode_cursor(values, direction="n"):
+    payload = json.dumps({"v": values, "d": direction}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, model, fields):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8"))
+        values, direction = payload["v"], payload["d"]
+        if direction not in ("n", "p") or len(values) != len(fields):
+            raise ValueError
+        values = [model._meta.get_field(field.lstrip("-")).to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, KeyError, ValidationError):
+        raise Http404("Invalid cursor")
+    return values, direction
+
+
+def reverse_ordering(fields):
+    return [field[1:] if field.startswith("-") else "-" + field for field in fields]
+
+
+def seek(fields, values):
+    # Rows strictly after values in the given ordering, e.g. for
+    # ("-created_at", "-id"): created_at < v0 OR (created_at = v0 AND id < v1)
+    clauses = []
+    for i, field in enumerate(fields):
+        name = field.lstrip("-")
+        lookup = "%s__lt" % name if field.startswith("-") else "%s__gt" % name
+        equal = {prev.lstrip("-"): value for prev, value in zip(fields[:i], values[:i])}
+        clauses.append(Q(**equal) & Q(**{lookup: values[i]}))
+    return reduce(lambda a, b: a | b, clauses)
+
+
+class KeysetPage:
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.fields = fields
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _values(self, obj):
+        return [getattr(obj, field.lstrip("-")) for field in self.fields]
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self._values(self.object_list[-1]), "n")
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self._values(self.object_list[0]), "p")
+        return None
+
+
+def keyset_page(queryset, fields, page_size, cursor=None):
+    fields = list(fields)
+    if not cursor:
+        rows = list(queryset.order_by(*fields)[:page_size + 1])
+        return KeysetPage(rows[:page_size], fields, len(rows) > page_size, False)
+
+    values, direction = decode_cursor(cursor, queryset.model, fields)
+    if direction == "n":
+        rows = list(queryset.filter(seek(fields, values)).order_by(*fields)[:page_size + 1])
+        return KeysetPage(rows[:page_size], fields, len(rows) > page_size, True)
+
+    backwards = reverse_ordering(fields)
+    rows = list(queryset.filter(seek(backwards, values)).order_by(*backwards)[:page_size + 1])
+    return KeysetPage(list(reversed(rows[:page_size])), fields, True, len(rows) > page_size)
+
+
+class KeysetPaginationMixin:
+    # For ListViews: paginate by ?cursor= over keyset_fields (which must end
+    # in a unique column) without counting rows. ?page=N opts back into
+    # Django's page-number pagination, with its COUNT(*) and OFFSET.
+    keyset_fields = ("id",)
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            return super().paginate_queryset(queryset.order_by(*self.keyset_fields), page_size)
+        page = keyset_page(queryset, self.keyset_fields, page_size, self.request.GET.get(self.cursor_kwarg))
+        return (None, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,54 @@
+from job import counters, dashboard, outbox
+from job.lookups import ids_lookup
+from job.models import Applicant
+from job.sqlite import write_transaction
+
+# Bulk accept/reject of applicants. The job__user_id filter that selects the
+# rows is also the ownership check, so ids of other employers' applicants
+# are simply not found. The selected applicants are read once, a row each,
+# as every notification needs its user and job title. The status (and
+# comment) is then set with one UPDATE and the applicant counters of every
+# job involved are recounted from their rows in one more, which keeps them
+# exact however the applicants were spread over jobs and statuses. The
+# applicants whose status changed are notified through job.outbox, in the
+# same transaction.
+
+MAX_IDS = 5000
+STATUS_NAMES = {Applicant.PENDING: "pending", Applicant.ACCEPTED: "accepted", Applicant.REJECTED: "rejected"}
+
+
+def respond(employer_id, applicant_ids, status, comment=None):
+    # Returns {"status", "updated", "unchanged", "not_found", "previous":
+    # {status name: applicants moved from it}}
+    ids = sorted(set(applicant_ids))
+    with write_transaction():
+        owned = Applicant.objects.filter(id__in=ids_lookup(ids), job__user_id=employer_id)
+        rows = list(owned.order_by().values_list("id", "job_id", "status", "user_id", "job__title"))
+        changed = [row for row in rows if row[2] != status]
+        previous = {}
+        for applicant_id, job_id, old_status, user_id, title in changed:
+            name = STATUS_NAMES.get(old_status, STATUS_NAMES[Applicant.REJECTED])
+            previous[name] = previous.get(name, 0) + 1
+
+        # With a comment every selected applicant is written, else only
+        # those whose status changes
+        changes = {"status": status}
+        if comment is None:
+            owned = owned.exclude(status=status)
+        else:
+            changes["comment"] = comment
+        if rows:
+            owned.update(**changes)
+        if changed:
+            counters.recount_applicants({row[1] for row in changed})
+            outbox.notify_responses([(row[0], row[3], row[4]) for row in changed], status, comment or "")
+    if changed:
+        dashboard.invalidate(employer_id)
+
+    return {
+        "status": STATUS_NAMES[status],
+        "updated": len(changed),
+        "unchanged": len(rows) - len(changed),
+        "not_found": len(ids) - len(rows),
+        "previous": previous,
+    }
@@ -0,0 +1,85 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Primary/replica routing. Writes always go to the primary (default). Reads
+# go to one of settings.DATABASE_REPLICAS only while a request has allowed
+# it (see job.middleware.ReplicaMiddleware). Management commands, workers and
+# code inside a transaction on the primary therefore keep reading the primary,
+# where they see their own writes.
+#
+# Read-your-writes: once a request writes, the rest of that request reads the
+# primary. The middleware then keeps the same client on the primary for
+# STICKY_SECONDS, which must be longer than the replica lag.
+#
+# Reads that fill a shared cache run under primary(): the caches are
+# invalidated when a write commits on the primary (see job.facets), and an
+# entry rebuilt from a lagging replica would keep the old rows under the
+# new generation, for every client, until the next invalidation.
+
+STICKY_SECONDS = getattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 10)
+
+_state = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def reading_replicas():
+    return getattr(_state, "replicas", False)
+
+
+def wrote():
+    return getattr(_state, "wrote", False)
+
+
+@contextmanager
+def use_replicas(allowed=True):
+    # Route reads in the block to the replicas (or to the primary when
+    # allowed is False) and record whether the block wrote anything
+    previous = reading_replicas(), wrote()
+    _state.replicas, _state.wrote = allowed, False
+    try:
+        yield
+    finally:
+        _state.replicas, _state.wrote = previous
+
+
+@contextmanager
+def primary():
+    # Route reads in the block to the primary, leaving writes recorded
+    previous = reading_replicas()
+    _state.replicas = False
+    try:
+        yield
+    finally:
+        _state.replicas = previous and not wrote()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not reading_replicas() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        _state.replicas = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated themselves
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,185 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Shadow full-text index of Job, kept in a SQLite FTS5 virtual table whose
+# rowid is the job id. See migration 0002_job_search_index.
+FTS_TABLE = "job_search_index"
+FTS_COLUMNS = ("title", "description", "location", "category", "name_company", "tags")
+# bm25() weights, in FTS_COLUMNS order
+FTS_WEIGHTS = (10.0, 1.0, 4.0, 4.0, 3.0, 5.0)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_supported(using=None):
+    # FTS5 is only available on SQLite, other backends use the LIKE path
+    return (using or connection).vendor == "sqlite"
+
+
+def build_match_query(text="", **columns):
+    # Turn free text into a safe FTS5 expression: every word is quoted and
+    # prefix matched, words are ANDed. Keyword arguments restrict words to a
+    # column, e.g. build_match_query("python", location="jakarta").
+    parts = ['"%s"*' % token for token in TOKEN_RE.findall(text or "")]
+    for column, value in columns.items():
+        if column not in FTS_COLUMNS:
+            raise ValueError("Unknown search column: %s" % column)
+        tokens = TOKEN_RE.findall(value or "")
+        if tokens:
+            parts.append("%s : (%s)" % (column, " AND ".join('"%s"*' % token for token in tokens)))
+    return " AND ".join(parts)
+
+
+def apply_search(queryset, params, ranked=True):
+    # The q/title/location search of SearchView. Full-text mode returns a
+    # bm25 RankedJobSearch (or, with ranked=False, an unordered queryset of
+    # the matches); ?mode=like keeps the substring scan.
+    text = params.get("q", "")
+    title = params.get("title", "")
+    location = params.get("location", "")
+
+    if params.get("mode") != "like" and is_supported():
+        match = build_match_query(text, title=title, location=location)
+        if match:
+            results = RankedJobSearch(match, queryset if queryset.query.has_filters() else None)
+            return results if ranked else results.as_queryset()
+
+    queryset = queryset.filter(
+        location__icontains=location,
+        title__icontains=title,
+    )
+    if text:
+        queryset = queryset.filter(Q(title__icontains=text) | Q(description__icontains=text))
+    return queryset
+
+
+def _document(job, tag_names=None):
+    if tag_names is None:
+        tag_names = [tag.name for tag in job.tags.all()]
+    return (
+        job.pk,
+        job.title,
+        job.description,
+        job.location,
+        job.category,
+        job.name_company,
+        " ".join(tag_names),
+    )
+
+
+def index_jobs(jobs, tag_names=None):
+    # tag_names, {job id: [name, ...]}, spares reading job.tags when known
+    tag_names = tag_names or {}
+    rows = [_document(job, tag_names.get(job.pk)) for job in jobs]
+    if not rows:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany("DELETE FROM %s WHERE rowid = %%s" % FTS_TABLE, [(row[0],) for row in rows])
+        cursor.executemany(
+            "INSERT INTO %s (rowid, %s) VALUES (%s)" % (
+                FTS_TABLE, ", ".join(FTS_COLUMNS), ", ".join(["%s"] * (len(FTS_COLUMNS) + 1))),
+            rows,
+        )
+    return len(rows)
+
+
+def remove_jobs(job_ids):
+    job_ids = list(job_ids)
+    if job_ids:
+        with connection.cursor() as cursor:
+            cursor.executemany("DELETE FROM %s WHERE rowid = %%s" % FTS_TABLE, [(pk,) for pk in job_ids])
+
+
+def rebuild_index(batch_size=1000, stdout=None):
+    from job.models import Job
+
+    total = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % FTS_TABLE)
+        queryset = Job.objects.prefetch_related("tags").order_by("id")
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            total += index_jobs(batch)
+            last_id = batch[-1].pk
+            if stdout is not None:
+                stdout.write("Indexed %d jobs" % total)
+    return total
+
+
+class RankedJobSearch:
+    # Lazy, sliceable result set ordered by bm25 rank, so it can be handed to
+    # Django's Paginator like a queryset: count() runs one FTS count and each
+    # page runs one ranked LIMIT/OFFSET query plus one in_bulk() lookup. When
+    # a queryset is given, matches are restricted to its rows in SQL.
+
+    def __init__(self, match, queryset=None):
+        from job.models import Job
+
+        self.match = match
+        self.restricted = queryset is not None
+        self.queryset = queryset if queryset is not None else Job.objects.all()
+        self.model = self.queryset.model
+        self._count = None
+
+    def _where(self):
+        sql = "%s MATCH %%s" % FTS_TABLE
+        params = [self.match]
+        if self.restricted:
+            subquery, subparams = self.queryset.order_by().values("id").query.sql_with_params()
+            sql += " AND rowid IN (" + subquery + ")"
+            params.extend(subparams)
+        return sql, params
+
+    def as_queryset(self):
+        # Unranked queryset of the same matches, e.g. for aggregations
+        return self.queryset.filter(id__in=RawSQL(
+            "SELECT rowid FROM %s WHERE %s MATCH %%s" % (FTS_TABLE, FTS_TABLE), [self.match]))
+
+    def count(self):
+        if self._count is None:
+            if not self.match:
+                self._count = 0
+            else:
+                where, params = self._where()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM " + FTS_TABLE + " WHERE " + where, params)
+                    self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def ranked_ids(self, offset=0, limit=None):
+        if not self.match:
+            return []
+        where, params = self._where()
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        sql = "SELECT rowid FROM %s WHERE " % FTS_TABLE + where + (
+            " ORDER BY bm25(%s, %s) LIMIT %%s OFFSET %%s" % (FTS_TABLE, weights))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [-1 if limit is None else limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("Stepped slices are not supported")
+            offset = key.start or 0
+            limit = None if key.stop is None else max(key.stop - offset, 0)
+            ids = self.ranked_ids(offset, limit)
+            jobs = self.queryset.in_bulk(ids)
+            return [jobs[pk] for pk in ids if pk in jobs]
+        results = self[key:key + 1]
+        if not results:
+            raise IndexError("Search result index out of range")
+        return results[0]
+
+    def __iter__(self):
+        return iter(self[:])
@@ -0,0 +1,280 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from job import dashboard, facets, favorites, feed, search, sqlite
+from job.autocomplete import suggester
+from job.tag_index import tag_index
+from job.models import Applicant, Favorite, Job
+from tags.models import Tag
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        sqlite.apply_pragmas(connection.connection)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(m2m_changed, sender=Job.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_facets(sender, **kwargs):
+    # Once committed: a process that sees the new generation must also see
+    # the change, or it would cache the old rows under it. The receivers
+    # below apply the change to the tag index, so it follows this bump
+    # rather than rebuilding.
+    transaction.on_commit(lambda: tag_index.followed(facets.invalidate()))
+
+
+@receiver(m2m_changed, sender=Job.tags.through)
+def remember_jobs_on_tags_clear(sender, instance, action, reverse, **kwargs):
+    # tag.job_set.clear() does not report the affected jobs afterwards
+    if action == "pre_clear" and reverse:
+        instance._cleared_job_ids = list(instance.job_set.values_list("id", flat=True))
+
+
+@receiver(m2m_changed, sender=Job.tags.through)
+def touch_jobs_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Tags are part of a job's pages, so changing them bumps Job.updated_at
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        job_ids = [instance.pk]
+    elif action == "post_clear":
+        job_ids = getattr(instance, "_cleared_job_ids", [])
+    else:
+        job_ids = pk_set or []
+    Job.objects.filter(pk__in=job_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+def touch_jobs_on_tag_rename(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.job_set.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_jobs_on_tag_delete(sender, instance, **kwargs):
+    # The through rows are removed by cascade, without an m2m_changed signal
+    instance._deleted_job_ids = list(instance.job_set.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def touch_jobs_on_tag_delete(sender, instance, **kwargs):
+    Job.objects.filter(pk__in=getattr(instance, "_deleted_job_ids", [])).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Job)
+def index_job_on_save(sender, instance, raw=False, **kwargs):
+    if raw or not search.is_supported():
+        return
+    search.index_jobs([instance])
+
+
+@receiver(post_delete, sender=Job)
+def unindex_job_on_delete(sender, instance, **kwargs):
+    if search.is_supported():
+        search.remove_jobs([instance.pk])
+
+
+@receiver(m2m_changed, sender=Job.tags.through)
+def index_job_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not search.is_supported():
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        search.index_jobs([instance])
+        return
+    if action == "post_clear":
+        job_ids = getattr(instance, "_cleared_job_ids", [])
+    else:
+        job_ids = pk_set or []
+    search.index_jobs(Job.objects.filter(id__in=job_ids).prefetch_related("tags"))
+
+
+@receiver(post_save, sender=Tag)
+def index_jobs_on_tag_rename(sender, instance, created, raw=False, **kwargs):
+    if created or raw or not search.is_supported():
+        return
+    search.index_jobs(instance.job_set.prefetch_related("tags"))
+
+
+@receiver(post_delete, sender=Tag)
+def index_jobs_on_tag_delete(sender, instance, **kwargs):
+    if search.is_supported():
+        job_ids = getattr(instance, "_deleted_job_ids", [])
+        search.index_jobs(Job.objects.filter(id__in=job_ids).prefetch_related("tags"))
+
+
+AUTOCOMPLETE_JOB_FIELDS = ("title", "location", "category")
+
+
+@receiver(pre_save, sender=Job)
+def remember_autocomplete_terms(sender, instance, raw=False, **kwargs):
+    instance._autocomplete_old = None
+    if raw or not suggester.ready or instance.pk is None:
+        return
+    instance._autocomplete_old = Job.objects.filter(pk=instance.pk).values(*AUTOCOMPLETE_JOB_FIELDS).first()
+
+
+@receiver(post_save, sender=Job)
+def update_autocomplete_on_job_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, "_autocomplete_old", None) or {}
+    for field in AUTOCOMPLETE_JOB_FIELDS:
+        value = getattr(instance, field)
+        if old.get(field) != value:
+            suggester.update(field, removed=old.get(field), added=value)
+
+
+@receiver(pre_delete, sender=Job)
+def remember_autocomplete_tags(sender, instance, **kwargs):
+    # The through rows are removed by cascade, without an m2m_changed signal
+    if suggester.ready:
+        instance._autocomplete_tags = list(instance.tags.values_list("name", flat=True))
+
+
+@receiver(post_delete, sender=Job)
+def update_autocomplete_on_job_delete(sender, instance, **kwargs):
+    for field in AUTOCOMPLETE_JOB_FIELDS:
+        suggester.update(field, removed=getattr(instance, field))
+    for name in getattr(instance, "_autocomplete_tags", []):
+        suggester.update("tag", removed=name)
+
+
+@receiver(m2m_changed, sender=Job.tags.through)
+def update_autocomplete_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not suggester.ready:
+        return
+    if action in ("pre_remove", "pre_clear"):
+        # Resolve names before the rows are gone
+        if reverse:
+            jobs = instance.job_set.all() if pk_set is None else instance.job_set.filter(pk__in=pk_set)
+            instance._autocomplete_tags = [instance.name] * jobs.count()
+        else:
+            tags = instance.tags.all() if pk_set is None else instance.tags.filter(pk__in=pk_set)
+            instance._autocomplete_tags = list(tags.values_list("name", flat=True))
+    elif action in ("post_remove", "post_clear"):
+        for name in getattr(instance, "_autocomplete_tags", []):
+            suggester.update("tag", removed=name)
+    elif action == "post_add":
+        if reverse:
+            names = [instance.name] * len(pk_set)
+        else:
+            names = Tag.objects.filter(pk__in=pk_set).values_list("name", flat=True)
+        for name in names:
+            suggester.update("tag", added=name)
+
+
+@receiver(pre_save, sender=Tag)
+def remember_autocomplete_tag_name(sender, instance, raw=False, **kwargs):
+    instance._autocomplete_old = None
+    if raw or not suggester.ready or instance.pk is None:
+        return
+    instance._autocomplete_old = Tag.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+
+@receiver(post_save, sender=Tag)
+def update_autocomplete_on_tag_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not suggester.ready:
+        return
+    if created:
+        suggester.update("tag", added=instance.name)
+        return
+    old = getattr(instance, "_autocomplete_old", None)
+    if old is not None and old != instance.name:
+        weight = instance.job_set.count() + 1
+        suggester.update("tag", removed=old, added=instance.name, weight=weight)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_autocomplete_tag_weight(sender, instance, **kwargs):
+    if suggester.ready:
+        instance._autocomplete_weight = instance.job_set.count() + 1
+
+
+@receiver(post_delete, sender=Tag)
+def update_autocomplete_on_tag_delete(sender, instance, **kwargs):
+    suggester.update("tag", removed=instance.name, weight=getattr(instance, "_autocomplete_weight", 1))
+
+
+# The tag index receivers apply their change once it is committed, so a
+# rolled back transaction leaves the index alone
+
+
+@receiver(post_save, sender=Job)
+def update_tag_index_on_job_save(sender, instance, created, **kwargs):
+    if created:
+        job_id = instance.pk
+        transaction.on_commit(lambda: tag_index.add_job(job_id))
+
+
+@receiver(post_delete, sender=Job)
+def update_tag_index_on_job_delete(sender, instance, **kwargs):
+    job_id = instance.pk
+    transaction.on_commit(lambda: tag_index.remove_job(job_id))
+
+
+@receiver(m2m_changed, sender=Job.tags.through)
+def update_tag_index_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "post_clear":
+        if reverse:
+            tag_id = instance.pk
+            transaction.on_commit(lambda: tag_index.clear_tag(tag_id))
+        else:
+            job_ids = [instance.pk]
+            transaction.on_commit(lambda: tag_index.remove(job_ids))
+    elif action in ("post_add", "post_remove"):
+        job_ids, tag_ids = (set(pk_set), [instance.pk]) if reverse else ([instance.pk], set(pk_set))
+        change = tag_index.add if action == "post_add" else tag_index.remove
+        transaction.on_commit(lambda: change(job_ids, tag_ids))
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_index_on_tag_save(sender, instance, **kwargs):
+    tag_id, name = instance.pk, instance.name
+    transaction.on_commit(lambda: tag_index.set_tag_name(tag_id, name))
+
+
+@receiver(post_delete, sender=Tag)
+def update_tag_index_on_tag_delete(sender, instance, **kwargs):
+    tag_id = instance.pk
+    transaction.on_commit(lambda: tag_index.set_tag_name(tag_id, None))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorite_ids(sender, instance, **kwargs):
+    favorites.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Applicant)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Applicant)
+@receiver(post_delete, sender=Favorite)
+def mark_feed_stale(sender, instance, created=True, raw=False, **kwargs):
+    # The jobs a user applied to or favorited shape their feed; an answer to
+    # an application does not
+    if created and not raw:
+        feed.mark_stale(instance.user_id)
+
+
+@receiver(post_save, sender=Applicant)
+def invalidate_employer_summary_on_application(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        if Applicant.job.is_cached(instance):
+            dashboard.invalidate(instance.job.user_id)
+        else:
+            dashboard.invalidate_for_job(instance.job_id)
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_employer_summary_on_job_change(sender, instance, **kwargs):
+    dashboard.invalidate(instance.user_id)
@@ -0,0 +1,190 @@
+import heapq
+import math
+import re
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from job.models import Job, SimilarJob
+
+# "Similar jobs" for the detail page. Unfilled jobs are turned into sparse
+# TF-IDF vectors over their title, description, category and tags (tags and
+# category as whole terms, so "Engineering" the category is not the word),
+# and each job keeps its NEIGHBORS nearest jobs by cosine similarity in
+# SimilarJob. Vectors are dicts of term -> weight, normalized to unit length,
+# so a cosine is a sparse dot product.
+#
+# Candidates come from an inverted index instead of comparing all pairs: a
+# job looks up its QUERY_TERMS heaviest terms in postings lists that keep the
+# POSTINGS_LIMIT heaviest jobs of each term, and the best of those candidates
+# are rescored exactly. Runs are incremental: only jobs changed since the
+# last run, the jobs whose lists point at them, and the jobs they now beat a
+# neighbor of are recomputed.
+
+NEIGHBORS = 10
+FIELD_WEIGHTS = {"title": 3, "category": 2, "tags": 3, "description": 1}
+MAX_TERMS = 40
+QUERY_TERMS = 8
+POSTINGS_LIMIT = 200
+RESCORE = 4
+MIN_SCORE = 0.05
+
+WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or our that the this to we will with you your "
+    "ada adalah akan atau dalam dan dari dengan di ini itu ke kami untuk yang".split()
+)
+
+
+def terms(title, description, category, tags):
+    # Weighted term frequencies of one job
+    counts = {}
+
+    def add(term, weight):
+        counts[term] = counts.get(term, 0) + weight
+
+    for field, text in (("title", title), ("description", description)):
+        for word in WORD.findall((text or "").lower()):
+            if len(word) > 1 and not word.isdigit() and word not in STOP_WORDS:
+                add(word, FIELD_WEIGHTS[field])
+    if category:
+        add("@" + category.strip().lower(), FIELD_WEIGHTS["category"])
+    for tag in tags:
+        add("#" + tag.strip().lower(), FIELD_WEIGHTS["tags"])
+    return counts
+
+
+def dot(a, b):
+    return sum([a[term] * b[term] for term in a.keys() & b.keys()])
+
+
+class Corpus:
+    def __init__(self, documents, postings_limit=POSTINGS_LIMIT):
+        # documents: {job_id: {term: weighted count}}
+        df = {}
+        for counts in documents.values():
+            for term in counts:
+                df[term] = df.get(term, 0) + 1
+        self.size = len(documents)
+        self.idf = {term: math.log((1 + self.size) / (1 + count)) + 1 for term, count in df.items()}
+
+        self.vectors = {}
+        self.query_terms = {}
+        postings = {}
+        for job_id, counts in documents.items():
+            vector = self.vectorize(counts)
+            self.vectors[job_id] = vector
+            self.query_terms[job_id] = heapq.nlargest(QUERY_TERMS, vector.items(), key=itemgetter(1))
+            for term, weight in vector.items():
+                postings.setdefault(term, []).append((weight, job_id))
+        # Ties go to the newest jobs
+        self.postings = {
+            term: [(job_id, weight) for weight, job_id in heapq.nlargest(postings_limit, entries)]
+            for term, entries in postings.items()
+        }
+
+    def vectorize(self, counts):
+        # Unit TF-IDF vector of the MAX_TERMS heaviest terms; terms the
+        # corpus has not seen get the highest idf
+        unseen = math.log(1 + self.size) + 1
+        weights = heapq.nlargest(
+            MAX_TERMS, ((term, (1 + math.log(count)) * self.idf.get(term, unseen)) for term, count in counts.items()),
+            key=itemgetter(1))
+        norm = math.sqrt(sum(weight * weight for term, weight in weights)) or 1.0
+        return {term: weight / norm for term, weight in weights}
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def candidates(self, job_id, count):
+        # Best count jobs by the partial dot product over the query terms
+        vector = self.vectors[job_id]
+        scores = {}
+        get = scores.get
+        for term, _ in self.query_terms[job_id]:
+            weight = vector[term]
+            for other, other_weight in self.postings.get(term, ()):
+                scores[other] = get(other, 0.0) + weight * other_weight
+        scores.pop(job_id, None)
+        return [other for other, score in heapq.nlargest(count, scores.items(), key=itemgetter(1))]
+
+    def neighbors(self, job_id, count=NEIGHBORS):
+        # [(neighbor id, cosine)] best first
+        vector = self.vectors[job_id]
+        scored = ((other, dot(vector, self.vectors[other])) for other in self.candidates(job_id, count * RESCORE))
+        return [item for item in heapq.nlargest(count, scored, key=itemgetter(1)) if item[1] >= MIN_SCORE]
+
+
+def _chunks(ids, size=500):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def load_corpus():
+    documents = {}
+    rows = Job.objects.unfilled().order_by().values_list("id", "title", "description", "category")
+    tags = {}
+    through = Job.tags.through.objects.filter(job__in=Job.objects.unfilled())
+    for job_id, name in through.values_list("job_id", "tag__name"):
+        tags.setdefault(job_id, []).append(name)
+    for job_id, title, description, category in rows.iterator(chunk_size=2000):
+        documents[job_id] = terms(title, description, category, tags.get(job_id, ()))
+    return Corpus(documents)
+
+
+def recompute(full=False, count=NEIGHBORS):
+    # Returns the number of jobs whose neighbor lists were rewritten
+    started = timezone.now()
+    last_run = None if full else SimilarJob.objects.order_by("-computed_at").values_list(
+        "computed_at", flat=True).first()
+    corpus = load_corpus()
+
+    if last_run is None:
+        affected = set(corpus.vectors)
+        stale = None
+    else:
+        changed = set(Job.objects.filter(updated_at__gte=last_run).values_list("id", flat=True))
+        affected = {job_id for job_id in changed if job_id in corpus.vectors}
+        # Lists showing a changed (maybe now filled or retitled) job
+        for ids in _chunks(changed):
+            affected.update(SimilarJob.objects.filter(neighbor_id__in=ids).values_list("job_id", flat=True))
+        # Lists a changed job may now get into
+        lists = {
+            row["job_id"]: (row["n"], row["low"])
+            for row in SimilarJob.objects.order_by().values("job_id").annotate(n=Count("id"), low=Min("score"))
+        }
+        for job_id in changed:
+            if job_id in corpus.vectors:
+                for other, score in corpus.neighbors(job_id, count * RESCORE):
+                    n, low = lists.get(other, (0, 0.0))
+                    if n < count or score > low:
+                        affected.add(other)
+        affected &= set(corpus.vectors)
+        # Jobs no longer open keep no list
+        stale = changed - set(corpus.vectors)
+
+    rows = [
+        SimilarJob(job_id=job_id, neighbor_id=other, score=score, computed_at=started)
+        for job_id in affected
+        for other, score in corpus.neighbors(job_id, count)
+    ]
+    with transaction.atomic():
+        if stale is None:
+            SimilarJob.objects.all().delete()
+        else:
+            for ids in _chunks(affected | stale):
+                SimilarJob.objects.filter(job_id__in=ids).delete()
+        SimilarJob.objects.bulk_create(rows, batch_size=1000)
+    return len(affected)
+
+
+def similar_jobs(job_id, count=5):
+    # One query: the nearest still open jobs
+    return [
+        row.neighbor for row in
+        SimilarJob.objects.filter(job_id=job_id, neighbor__filled=False, neighbor__expired=False)
+        .select_related("neighbor")[:count]
+    ]
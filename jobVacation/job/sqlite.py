@@ -0,0 +1,109 @@
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+# SQLite under concurrent requests.
+#
+# Pragmas: settings.SQLITE_PRAGMAS are applied to every new SQLite
+# connection (see job.signals). With journal_mode=wal readers no longer
+# block behind a writer, busy_timeout makes a blocked writer wait instead
+# of failing with "database is locked", and synchronous=normal syncs on
+# checkpoints rather than on every commit.
+#
+# Write transactions: SQLite takes one writer at a time, and a deferred
+# transaction that reads before writing cannot wait for the lock (its
+# snapshot would be stale), so it fails at once if another writer got in
+# first. write_transaction() therefore opens its outermost block with BEGIN
+# IMMEDIATE, which takes the write lock up front and waits on busy_timeout
+# like any other writer, across processes. With settings.SQLITE_WRITE_QUEUE
+# the writers of a process also queue in arrival order before that.
+
+
+def apply_pragmas(connection, pragmas=None):
+    # connection: a DB-API connection (Django's connection.connection)
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {}) if pragmas is None else pragmas
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA %s = %s" % (name, value))
+    finally:
+        cursor.close()
+
+
+class WriteQueue:
+    # A FIFO lock, reentrant for the thread holding it
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiting = deque()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._mutex:
+            if self._owner == me:
+                self._depth += 1
+                return
+            if self._owner is None:
+                self._owner, self._depth = me, 1
+                return
+            turn = threading.Lock()
+            turn.acquire()
+            self._waiting.append((me, turn))
+        # Released by the previous owner, who has made us the owner
+        turn.acquire()
+
+    def release(self):
+        with self._mutex:
+            self._depth -= 1
+            if self._depth:
+                return
+            if self._waiting:
+                self._owner, turn = self._waiting.popleft()
+                self._depth = 1
+                turn.release()
+            else:
+                self._owner = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __len__(self):
+        return len(self._waiting)
+
+
+write_queue = WriteQueue()
+
+
+def queue_enabled():
+    return getattr(settings, "SQLITE_WRITE_QUEUE", False)
+
+
+def _begin_immediate(connection):
+    connection.cursor().execute("BEGIN IMMEDIATE")
+
+
+@contextmanager
+def write_transaction(using=None):
+    # transaction.atomic(), taking its turn in the write queue when enabled
+    connection = transaction.get_connection(using)
+    immediate = connection.vendor == "sqlite" and not connection.in_atomic_block
+    with ExitStack() as stack:
+        if queue_enabled():
+            stack.enter_context(write_queue)
+        if immediate:
+            # Django opens the outermost block on SQLite with a plain BEGIN
+            connection._start_transaction_under_autocommit = lambda: _begin_immediate(connection)
+        try:
+            stack.enter_context(transaction.atomic(using=using))
+        finally:
+            if immediate:
+                del connection._start_transaction_under_autocommit
+        yield
@@ -0,0 +1,341 @@
+import re
+import threading
+
+from django.core.exceptions import BadRequest
+from django.db import DatabaseError
+
+from job import facets, routers
+from job.lookups import ids_lookup
+
+# In-process index of the jobs carrying each tag, for boolean tag filters
+# such as ?tags=python AND remote AND NOT internship. Each tag maps to a
+# Bitmap of job ids: a dict of fixed-size chunks, each a Python int used as
+# a bitset, so AND/OR/AND NOT run word-parallel in C and a tag only pays
+# for the chunks it has jobs in. A query is evaluated without touching the
+# database and the matching ids reach SQL as one parameter.
+#
+# The index is kept up to date by the signals in job.signals, as each change
+# commits. Changes made by other processes are noticed through the facet
+# generation, which lives in the shared cache (see job.checks) and is bumped
+# on commit by every Job and Tag signal, and by the bulk writers that send
+# none (import_jobs, expire_jobs). When it moves past the one the index last
+# saw, the next query rebuilds the index.
+
+CHUNK_SHIFT = 12
+CHUNK_BITS = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_BITS - 1
+
+
+class Bitmap:
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        bitmap = cls()
+        for pk in ids:
+            bitmap.add(pk)
+        return bitmap
+
+    def add(self, pk):
+        key = pk >> CHUNK_SHIFT
+        self.chunks[key] = self.chunks.get(key, 0) | (1 << (pk & CHUNK_MASK))
+
+    def discard(self, pk):
+        key = pk >> CHUNK_SHIFT
+        bits = self.chunks.get(key, 0) & ~(1 << (pk & CHUNK_MASK))
+        if bits:
+            self.chunks[key] = bits
+        else:
+            self.chunks.pop(key, None)
+
+    def __contains__(self, pk):
+        return bool(self.chunks.get(pk >> CHUNK_SHIFT, 0) >> (pk & CHUNK_MASK) & 1)
+
+    def __and__(self, other):
+        small, large = sorted((self.chunks, other.chunks), key=len)
+        chunks = {}
+        for key, bits in small.items():
+            bits &= large.get(key, 0)
+            if bits:
+                chunks[key] = bits
+        return Bitmap(chunks)
+
+    def __or__(self, other):
+        chunks = dict(self.chunks)
+        for key, bits in other.chunks.items():
+            chunks[key] = chunks.get(key, 0) | bits
+        return Bitmap(chunks)
+
+    def __sub__(self, other):
+        chunks = {}
+        for key, bits in self.chunks.items():
+            bits &= ~other.chunks.get(key, 0)
+            if bits:
+                chunks[key] = bits
+        return Bitmap(chunks)
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def __len__(self):
+        return sum(bin(bits).count("1") for bits in self.chunks.values())
+
+    def __iter__(self):
+        # Ascending ids; bits are scanned as text, lowest first
+        for key in sorted(self.chunks):
+            base = key << CHUNK_SHIFT
+            bits = bin(self.chunks[key])[:1:-1]
+            i = bits.find("1")
+            while i >= 0:
+                yield base + i
+                i = bits.find("1", i + 1)
+
+
+class TagQueryError(ValueError):
+    pass
+
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+OPERATORS = ("and", "or", "not")
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN.match(query, position)
+        if match is None:
+            raise TagQueryError("Unbalanced quotes")
+        opening, closing, quoted, word = match.groups()
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif quoted is not None:
+            tokens.append(("tag", quoted))
+        elif word.lower() in OPERATORS:
+            tokens.append(word.lower())
+        else:
+            tokens.append(("tag", word))
+        position = match.end()
+    return tokens
+
+
+def parse(query):
+    # expr := term (OR term)*; term := factor ([AND] factor)*;
+    # factor := NOT factor | "(" expr ")" | name
+    tokens = tokenize(query)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def expr():
+        terms = [term()]
+        while peek() == "or":
+            take()
+            terms.append(term())
+        return terms[0] if len(terms) == 1 else ("or", terms)
+
+    def term():
+        factors = [factor()]
+        while peek() not in (None, "or", ")"):
+            if peek() == "and":
+                take()
+            factors.append(factor())
+        return factors[0] if len(factors) == 1 else ("and", factors)
+
+    def factor():
+        token = peek()
+        if token is None:
+            raise TagQueryError("Unexpected end of tag query")
+        take()
+        if token == "not":
+            return ("not", factor())
+        if token == "(":
+            node = expr()
+            if peek() != ")":
+                raise TagQueryError("Missing closing parenthesis")
+            take()
+            return node
+        if isinstance(token, tuple):
+            return token
+        raise TagQueryError("Unexpected %r in tag query" % token)
+
+    if not tokens:
+        return None
+    node = expr()
+    if position != len(tokens):
+        raise TagQueryError("Unexpected %r in tag query" % (tokens[position],))
+    return node
+
+
+class TagIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.bitmaps = {}
+        self.names = {}
+        self.universe = Bitmap()
+        self.generation = None
+        self.ready = False
+
+    def build(self):
+        from job.models import Job
+        from tags.models import Tag
+
+        with self.lock, routers.primary():
+            generation = facets.generation()
+            bitmaps = {}
+            for job_id, tag_id in Job.tags.through.objects.order_by().values_list("job_id", "tag_id").iterator():
+                if tag_id not in bitmaps:
+                    bitmaps[tag_id] = Bitmap()
+                bitmaps[tag_id].add(job_id)
+            names = {}
+            for tag_id, name in Tag.objects.values_list("id", "name"):
+                names.setdefault(name.lower(), set()).add(tag_id)
+            self.bitmaps = bitmaps
+            self.names = names
+            self.universe = Bitmap.from_ids(Job.objects.order_by().values_list("id", flat=True).iterator())
+            self.generation = generation
+            self.ready = True
+
+    def reset(self):
+        with self.lock:
+            self.bitmaps = {}
+            self.names = {}
+            self.universe = Bitmap()
+            self.generation = None
+            self.ready = False
+
+    def sync(self):
+        # Rebuild if anything changed that this process has not applied
+        with self.lock:
+            if not self.ready or self.generation != facets.generation():
+                self.build()
+
+    def followed(self, generation):
+        # Called with the generation of every bump made in this process for
+        # a change that job.signals applies to the index. Any other bump is
+        # someone else's change and leads to a rebuild.
+        with self.lock:
+            if self.ready and generation == self.generation + 1:
+                self.generation = generation
+
+    def add(self, job_ids, tag_ids):
+        with self.lock:
+            if not self.ready:
+                return
+            for tag_id in tag_ids:
+                bitmap = self.bitmaps.setdefault(tag_id, Bitmap())
+                for job_id in job_ids:
+                    bitmap.add(job_id)
+
+    def remove(self, job_ids, tag_ids=None):
+        # tag_ids=None removes the jobs from every tag
+        with self.lock:
+            if not self.ready:
+                return
+            for tag_id in self.bitmaps if tag_ids is None else tag_ids:
+                bitmap = self.bitmaps.get(tag_id)
+                if bitmap is not None:
+                    for job_id in job_ids:
+                        bitmap.discard(job_id)
+
+    def add_job(self, job_id):
+        with self.lock:
+            if not self.ready:
+                return
+            self.universe.add(job_id)
+
+    def remove_job(self, job_id):
+        with self.lock:
+            if not self.ready:
+                return
+            self.universe.discard(job_id)
+            self.remove([job_id])
+
+    def clear_tag(self, tag_id):
+        with self.lock:
+            if not self.ready:
+                return
+            self.bitmaps.pop(tag_id, None)
+
+    def set_tag_name(self, tag_id, name):
+        # name=None forgets a deleted tag
+        with self.lock:
+            if not self.ready:
+                return
+            for ids in self.names.values():
+                ids.discard(tag_id)
+            if name is not None:
+                self.names.setdefault(name.lower(), set()).add(tag_id)
+            else:
+                self.bitmaps.pop(tag_id, None)
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == "tag":
+            result = Bitmap()
+            for tag_id in self.names.get(node[1].lower(), ()):
+                result = result | self.bitmaps.get(tag_id, Bitmap())
+            return result
+        if kind == "not":
+            return self.universe - self.evaluate(node[1])
+        operands = node[1]
+        if kind == "or":
+            result = Bitmap()
+            for operand in operands:
+                result = result | self.evaluate(operand)
+            return result
+        # AND: intersect the positive operands, then subtract the negated
+        # ones instead of building their complements
+        positive = [operand for operand in operands if operand[0] != "not"]
+        result = self.evaluate(positive[0]) if positive else self.universe
+        for operand in positive[1:]:
+            if not result:
+                break
+            result = result & self.evaluate(operand)
+        for operand in operands:
+            if operand[0] == "not" and result:
+                result = result - self.evaluate(operand[1])
+        return result
+
+    def query(self, query):
+        node = parse(query)
+        if node is None:
+            return None
+        self.sync()
+        with self.lock:
+            return self.evaluate(node)
+
+
+tag_index = TagIndex()
+
+
+def apply_filter(queryset, params, name="tags"):
+    # Narrow a Job queryset by the boolean tag query in params[name]
+    query = params.get(name, "")
+    try:
+        bitmap = tag_index.query(query)
+    except TagQueryError as error:
+        # Answered with a 400, like the API's ApiError
+        raise BadRequest(str(error))
+    if bitmap is None:
+        return queryset
+    return queryset.filter(id__in=ids_lookup(list(bitmap)))
+
+
+def warm():
+    # Build the index at process startup (see wsgi.py/asgi.py); a missing
+    # table just defers the build
+    try:
+        tag_index.build()
+    except DatabaseError:
+        tag_index.reset()
@@ -1,3 +1,1771 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import pickle
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from account import urls as account_urls
+from account.models import User
+from account.user_cache import user_cache
+from job import (
+    api, autocomplete, checks, counters, dashboard, expiry, exports, facets, favorites, feed, outbox, responses,
+    routers, search, similar, sqlite, trending,
+)
+from job.autocomplete import PrefixIndex, suggester
+from job.filecache import FileBasedCache
+from job.management.commands.sync_replica import copy_database, database_path
+from job import urls as job_urls
+from job.middleware import COOKIE_NAME, SLOWEST, ReplicaMiddleware, budget_for
+from job.models import (
+    Applicant, Favorite, InboxMessage, Job, JobFeed, JobViewDay, OutboxMessage, SimilarJob, TrendingJob,
+)
+from job.pagination import keyset_page
+from job.views import (
+    ApplicantListView, AppliciantPerJobView, DashboardView, EmployeeMyJobListView, FavoriteListView, HomeView,
+    JobDetailsView, JobListView,
+)
+from job.tag_index import Bitmap, TagIndex, TagQueryError, parse, tag_index
+from job.view_counter import ViewCounter, view_counter
+from tags.models import Tag
+
+
+class JobTestMixin:
+    def create_employer(self, email="employer@test.com"):
+        return User.objects.create_user(email=email, password="Abcdefgh.1", role="employer")
+
+    def create_employee(self, email="employee@test.com"):
+        return User.objects.create_user(email=email, password="Abcdefgh.1", role="employee")
+
+    def create_job(self, user, **kwargs):
+        tags = kwargs.pop("tags", [])
+        fields = {
+            "title": "Backend Engineer",
+            "description": "Build things",
+            "location": "Jakarta",
+            "type": "1",
+            "category": "Engineering",
+            "last_date": timezone.now().date() + timedelta(days=30),
+            "name_company": "Banyu",
+            "salary": 10000000,
+        }
+        fields.update(kwargs)
+        job = Job.objects.create(user=user, **fields)
+        if tags:
+            job.tags.add(*tags)
+        return job
+
+
+class TestFullTextSearch(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="python")
+        self.django_job = self.create_job(
+            self.employer, title="Django Developer", description="Write python web apps", tags=[self.python])
+        self.nurse_job = self.create_job(
+            self.employer, title="Nurse", description="Care for python keepers at the zoo",
+            location="Bandung", category="Health")
+        self.driver_job = self.create_job(self.employer, title="Driver", description="Drive a truck")
+
+    def search(self, text, **columns):
+        return list(search.RankedJobSearch(search.build_match_query(text, **columns)))
+
+    def test_match_query_is_quoted(self):
+        self.assertEqual(search.build_match_query('py" OR *'), '"py"* AND "OR"*')
+        self.assertEqual(search.build_match_query("web", location="Jakarta"), '"web"* AND location : ("Jakarta"*)')
+        self.assertEqual(search.build_match_query(""), "")
+
+    def test_ranked_by_bm25(self):
+        self.assertEqual(self.search("python"), [self.django_job, self.nurse_job])
+        self.assertEqual(self.search("python", location="bandung"), [self.nurse_job])
+
+    def test_index_follows_job_and_tag_changes(self):
+        remote = Tag.objects.create(name="remote")
+        self.driver_job.tags.add(remote)
+        self.assertEqual(self.search("remote"), [self.driver_job])
+
+        self.driver_job.tags.remove(remote)
+        self.assertEqual(self.search("remote"), [])
+
+        self.driver_job.title = "Remote Driver"
+        self.driver_job.save()
+        self.assertEqual(self.search("remote"), [self.driver_job])
+
+        self.python.name = "golang"
+        self.python.save()
+        self.assertEqual(self.search("golang"), [self.django_job])
+
+        self.driver_job.delete()
+        self.assertEqual(self.search("remote"), [])
+
+    def test_rebuild_command(self):
+        with search.connection.cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % search.FTS_TABLE)
+        self.assertEqual(self.search("python"), [])
+
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=2, stdout=out)
+        self.assertIn("rebuilt with 3 jobs", out.getvalue())
+        self.assertEqual(self.search("python"), [self.django_job, self.nurse_job])
+
+    def test_search_view_paginates_ranked_results(self):
+        for i in range(12):
+            self.create_job(self.employer, title="Python Engineer %d" % i)
+        response = self.client.get(reverse("job:search"), {"q": "python"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["paginator"].count, 14)
+        self.assertEqual(len(response.context["jobs"]), 10)
+
+    def test_search_view_like_mode(self):
+        response = self.client.get(reverse("job:search"), {"title": "driv", "mode": "like"})
+        self.assertEqual(list(response.context["jobs"]), [self.driver_job])
+
+
+class TestFacets(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="python")
+        self.remote = Tag.objects.create(name="remote")
+        self.create_job(self.employer, title="Python Developer", tags=[self.python, self.remote], salary=4000000)
+        self.create_job(self.employer, title="Python Tester", type="2", tags=[self.python], salary=12000000)
+        self.create_job(self.employer, title="Designer", location="Bandung", category="Design", salary=None)
+
+    def counts(self, facet_list):
+        return {item["label"]: item["count"] for item in facet_list}
+
+    def test_facets_in_two_queries(self):
+        with self.assertNumQueries(2):
+            result = Job.objects.facets()
+        self.assertEqual(self.counts(result["type"]), {"Full Time": 2, "Part Time": 1})
+        self.assertEqual(self.counts(result["location"]), {"Jakarta": 2, "Bandung": 1})
+        self.assertEqual(self.counts(result["category"]), {"Engineering": 2, "Design": 1})
+        self.assertEqual(self.counts(result["salary"]), {"Below 5M": 1, "10M - 20M": 1})
+        self.assertEqual(self.counts(result["tags"]), {"python": 2, "remote": 1})
+
+    def test_cached_per_key_and_invalidated_on_job_change(self):
+        Job.objects.facets(key=("all",))
+        with self.assertNumQueries(0):
+            Job.objects.facets(key=("all",))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_job(self.employer, title="Another")
+        with self.assertNumQueries(2):
+            result = Job.objects.facets(key=("all",))
+        self.assertEqual(self.counts(result["location"])["Jakarta"], 3)
+
+    def test_job_list_view_facets(self):
+        url = reverse("job:jobs")
+        # version check, one keyset page query and two facet queries
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {"tag": str(self.python.pk)})
+        self.assertEqual(len(response.context["jobs"]), 2)
+        self.assertEqual(self.counts(response.context["facets"]["type"]), {"Full Time": 1, "Part Time": 1})
+
+        # Same filters, different spelling: facets come from the cache
+        with self.assertNumQueries(2):
+            self.client.get(url, {"tag": " %s " % self.python.pk})
+
+    def test_search_view_facets(self):
+        url = reverse("job:search")
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {"q": "python", "salary": "lt5m"})
+        self.assertEqual([job.title for job in response.context["jobs"]], ["Python Developer"])
+        self.assertEqual(self.counts(response.context["facets"]["tags"]), {"python": 1, "remote": 1})
+
+        response = self.client.get(url, {"title": "python", "mode": "like"})
+        self.assertEqual(self.counts(response.context["facets"]["salary"]), {"Below 5M": 1, "10M - 20M": 1})
+
+    def test_production_requires_a_shared_cache(self):
+        # A per-process cache would keep the generation bumps of each worker to itself
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ["job.E001"])
+        with override_settings(DEBUG=True, CACHES=locmem):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        # Two processes bumping at once must not lose a bump
+        filebased = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp"}}
+        with override_settings(DEBUG=False, CACHES=filebased):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ["job.E002"])
+        filebased["default"]["BACKEND"] = "job.filecache.FileBasedCache"
+        with override_settings(DEBUG=False, CACHES=filebased):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    def test_file_cache_bumps_are_atomic(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # One cache object per thread, as each process has its own
+            caches = [FileBasedCache(directory, {}) for i in range(4)]
+            caches[0].set("generation", 1, None)
+            bumps = []
+
+            def bump(cache):
+                for i in range(25):
+                    bumps.append(cache.incr("generation"))
+
+            threads = [threading.Thread(target=bump, args=(cache,)) for cache in caches]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sorted(bumps), list(range(2, 102)))
+            self.assertEqual(caches[0].get("generation"), 101)
+            # The generation never expires
+            with open(caches[0]._key_to_file("generation"), "rb") as file:
+                self.assertIsNone(pickle.load(file))
+            with self.assertRaises(ValueError):
+                caches[0].incr("missing")
+
+
+class TestAutocomplete(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="Python")
+        self.create_job(self.employer, title="Python Developer", tags=[self.python])
+        self.create_job(self.employer, title="Python Developer", location="Pekanbaru")
+        self.create_job(self.employer, title="Product Manager", category="Product")
+        suggester.build()
+
+    def tearDown(self) -> None:
+        suggester.reset()
+
+    def values(self, prefix, kind):
+        return [(item["value"], item["count"]) for item in suggester.suggest(prefix, [kind])[kind]]
+
+    def test_prefix_index_top_k(self):
+        index = PrefixIndex()
+        index.load([("Java", 1), ("JavaScript", 5), ("java", 2), ("Jakarta", 3), ("Go", 9)])
+        self.assertEqual(index.top("ja"), [("JavaScript", 5), ("Jakarta", 3), ("Java", 3)])
+        self.assertEqual(index.top("JA", limit=1), [("JavaScript", 5)])
+        index.discard("javascript", 5)
+        index.add("Jayapura")
+        self.assertEqual(index.top("ja"), [("Jakarta", 3), ("Java", 3), ("Jayapura", 1)])
+        self.assertEqual(index.top(""), [])
+
+    def test_endpoint_does_not_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("job:autocomplete"), {"q": "p"})
+        suggestions = response.json()["suggestions"]
+        self.assertEqual(suggestions["title"], [
+            {"value": "Python Developer", "count": 2}, {"value": "Product Manager", "count": 1}])
+        self.assertEqual(suggestions["location"], [{"value": "Pekanbaru", "count": 1}])
+        self.assertEqual(suggestions["category"], [{"value": "Product", "count": 1}])
+        self.assertEqual(suggestions["tag"], [{"value": "Python", "count": 2}])
+
+        response = self.client.get(reverse("job:autocomplete"), {"q": "p", "kind": "tag", "limit": "50"})
+        self.assertEqual(list(response.json()["suggestions"]), ["tag"])
+
+    def test_incremental_updates_from_signals(self):
+        job = Job.objects.get(location="Pekanbaru")
+        with self.captureOnCommitCallbacks(execute=True):
+            job.title = "Data Engineer"
+            job.save()
+        self.assertEqual(self.values("py", "title"), [("Python Developer", 1)])
+        self.assertEqual(self.values("data", "title"), [("Data Engineer", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.tags.add(self.python)
+        self.assertEqual(self.values("py", "tag"), [("Python", 3)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python.job_set.clear()
+        self.assertEqual(self.values("py", "tag"), [("Python", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.python.name = "Golang"
+            self.python.save()
+        self.assertEqual(self.values("py", "tag"), [])
+        self.assertEqual(self.values("go", "tag"), [("Golang", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertEqual(self.values("data", "title"), [])
+        self.assertEqual(self.values("pe", "location"), [])
+
+    def test_rolled_back_changes_are_not_applied(self):
+        job = Job.objects.get(location="Pekanbaru")
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                job.title = "Data Engineer"
+                job.save()
+                transaction.set_rollback(True)
+        self.assertEqual(self.values("py", "title"), [("Python Developer", 2)])
+        self.assertEqual(self.values("data", "title"), [])
+
+    def test_changes_of_other_processes_are_picked_up(self):
+        # A bulk insert sends no signals; the generation bump it comes with
+        # is noticed at the next check
+        Job.objects.bulk_create([Job(user=self.employer, title="Data Engineer", description="Data", location="Jakarta",
+                                     type="1", category="Engineering", name_company="Banyu",
+                                     last_date=timezone.localdate() + timedelta(days=30))])
+        facets.invalidate()
+        self.assertEqual(self.values("data", "title"), [])
+        suggester.checked_at -= autocomplete.REFRESH_SECONDS
+        self.assertEqual(self.values("data", "title"), [("Data Engineer", 1)])
+
+
+class TestTagIndex(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="python")
+        self.remote = Tag.objects.create(name="remote")
+        self.internship = Tag.objects.create(name="internship")
+        self.senior = self.create_job(self.employer, title="Senior Python", tags=[self.python, self.remote])
+        self.intern = self.create_job(
+            self.employer, title="Python Intern", tags=[self.python, self.remote, self.internship])
+        self.office = self.create_job(self.employer, title="Office Python", location="Bandung", tags=[self.python])
+        self.designer = self.create_job(self.employer, title="Designer", tags=[self.remote])
+        tag_index.build()
+
+    def tearDown(self) -> None:
+        tag_index.reset()
+
+    def ids(self, query):
+        return list(tag_index.query(query))
+
+    def test_bitmap_operations(self):
+        a = Bitmap.from_ids([1, 5, 4096, 70000])
+        b = Bitmap.from_ids([5, 70000, 9])
+        self.assertEqual(list(a & b), [5, 70000])
+        self.assertEqual(list(a | b), [1, 5, 9, 4096, 70000])
+        self.assertEqual(list(a - b), [1, 4096])
+        self.assertEqual(len(a), 4)
+        a.discard(4096)
+        self.assertNotIn(4096, a)
+        self.assertEqual(list(a.chunks), [0, 70000 >> 12])
+
+    def test_parse(self):
+        self.assertEqual(parse("python AND remote AND NOT internship"), (
+            "and", [("tag", "python"), ("tag", "remote"), ("not", ("tag", "internship"))]))
+        self.assertEqual(parse('(python or "machine learning") remote'), (
+            "and", [("or", [("tag", "python"), ("tag", "machine learning")]), ("tag", "remote")]))
+        self.assertIsNone(parse("  "))
+        for query in ("python AND", "(python", "python )", '"python'):
+            with self.assertRaises(TagQueryError):
+                parse(query)
+
+    def test_evaluate_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids("python AND remote AND NOT internship"), [self.senior.id])
+            self.assertEqual(self.ids("Internship OR (remote NOT python)"), [self.intern.id, self.designer.id])
+            self.assertEqual(self.ids("NOT python"), [self.designer.id])
+            self.assertEqual(self.ids("python AND unknown"), [])
+
+    def test_incremental_updates_from_signals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.office.tags.add(self.remote)
+            self.internship.job_set.clear()
+            extra = self.create_job(self.employer, title="Extra", tags=[self.internship])
+            self.designer.delete()
+            self.python.name = "Py"
+            self.python.save()
+        # Every change was applied locally, nothing is rebuilt
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids("py remote"), [self.senior.id, self.intern.id, self.office.id])
+            self.assertEqual(self.ids("internship"), [extra.id])
+            self.assertEqual(self.ids("NOT py"), [extra.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.remote.delete()
+        self.assertEqual(self.ids("remote"), [])
+
+    def test_rolled_back_changes_are_not_applied(self):
+        generation = facets.generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.designer.tags.add(self.python)
+                transaction.set_rollback(True)
+        # Neither applied nor announced to other processes
+        self.assertEqual(facets.generation(), generation)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids("python"), [self.senior.id, self.intern.id, self.office.id])
+
+    def test_bumps_of_other_processes_are_not_followed(self):
+        generation = facets.generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.designer.tags.add(self.python)
+            # Another process commits its own change meanwhile
+            Job.tags.through.objects.create(job=self.designer, tag=self.internship)
+            facets.invalidate()
+        self.assertGreater(facets.generation(), generation + 1)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.ids("internship"), [self.intern.id, self.designer.id])
+
+    def test_changes_without_signals_rebuild(self):
+        Job.tags.through.objects.create(job=self.designer, tag=self.python)
+        facets.invalidate()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.ids("python NOT internship"), [self.senior.id, self.office.id, self.designer.id])
+
+    def test_views_filter_by_tag_query(self):
+        response = self.client.get(reverse("job:jobs"), {"tags": "python AND"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("job:jobs"), {"tags": "python remote NOT internship"})
+        self.assertEqual(list(response.context["jobs"]), [self.senior])
+        response = self.client.get(reverse("job:jobs"), {"tags": "remote", "location": "jakarta"})
+        self.assertEqual(list(response.context["jobs"]), [self.senior, self.intern, self.designer])
+        response = self.client.get(reverse("job:search"), {"q": "python", "tags": "NOT remote"})
+        self.assertEqual(list(response.context["jobs"]), [self.office])
+        response = self.client.get(reverse("job:search"), {"tags": "(remote"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestKeysetPagination(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.jobs = [self.create_job(self.employer, title="Job %d" % i) for i in range(25)]
+
+    def test_job_list_walks_cursors_without_count(self):
+        url = reverse("job:jobs")
+        seen = []
+        cursor = None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            response = self.client.get(url, params)
+            page = response.context["page_obj"]
+            self.assertIsNone(response.context["paginator"])
+            seen.extend(job.pk for job in page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, [job.pk for job in self.jobs])
+
+        previous = self.client.get(url, {"cursor": page.previous_cursor}).context["page_obj"]
+        self.assertEqual([job.pk for job in previous], [job.pk for job in self.jobs[10:20]])
+        self.assertFalse(self.client.get(url, {"cursor": previous.previous_cursor}).context["page_obj"].has_previous())
+
+    def test_page_number_fallback(self):
+        response = self.client.get(reverse("job:jobs"), {"page": 3})
+        self.assertEqual(response.context["paginator"].count, 25)
+        self.assertEqual([job.pk for job in response.context["page_obj"]], [job.pk for job in self.jobs[20:]])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse("job:jobs"), {"cursor": "nope"}).status_code, 404)
+
+    def test_applicants_of_a_job_are_only_shown_to_its_employer(self):
+        Applicant.objects.create(user=self.create_employee(), job=self.jobs[0])
+        url = reverse("job:employer-dashboard-applicant", args=[self.jobs[0].id])
+        self.client.login(email="employer@test.com", password="Abcdefgh.1")
+        self.assertEqual(len(self.client.get(url).context["applicants"]), 1)
+
+        self.create_employer("other@test.com")
+        self.client.login(email="other@test.com", password="Abcdefgh.1")
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(
+            reverse("job:employer-dashboard-applicant", args=[99999])).status_code, 404)
+
+    def test_descending_created_at_keyset(self):
+        employee = self.create_employee()
+        now = timezone.now()
+        for i, job in enumerate(self.jobs[:7]):
+            # ties on created_at are broken by id
+            Applicant.objects.create(user=employee, job=job, created_at=now - timedelta(days=i // 2))
+        queryset = Applicant.objects.filter(user=employee)
+        fields = ("-created_at", "-id")
+        expected = list(queryset.order_by(*fields))
+
+        first = keyset_page(queryset, fields, 3)
+        second = keyset_page(queryset, fields, 3, first.next_cursor)
+        third = keyset_page(queryset, fields, 3, second.next_cursor)
+        self.assertEqual(first.object_list + second.object_list + third.object_list, expected)
+        self.assertFalse(third.has_next())
+        self.assertEqual(keyset_page(queryset, fields, 3, third.previous_cursor).object_list, expected[3:6])
+
+
+class TestJobCounters(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        self.job = self.create_job(self.employer)
+
+    def test_status_changes_move_counts(self):
+        counters.applicant_added(self.job.id)
+        counters.applicant_added(self.job.id)
+        counters.applicant_status_changed(self.job.id, Applicant.PENDING, Applicant.ACCEPTED)
+        counters.applicant_status_changed(self.job.id, Applicant.PENDING, 5)
+        self.job.refresh_from_db()
+        self.assertEqual(
+            (self.job.applicant_pending_count, self.job.applicant_accepted_count, self.job.applicant_rejected_count),
+            (0, 1, 1))
+        self.assertEqual(self.job.applicant_count, 2)
+
+    def test_saving_a_stale_job_keeps_counters(self):
+        stale = Job.objects.get(pk=self.job.pk)
+        counters.favorite_added(self.job.id)
+        stale.title = "Renamed"
+        stale.save()
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.title, self.job.favorite_count), ("Renamed", 1))
+
+    def test_favorite_toggle_maintains_count(self):
+        self.client.login(email="employee@test.com", password="Abcdefgh.1")
+        url = reverse("job:favorite")
+        self.assertEqual(self.client.post(url, {"job_id": self.job.id}).json()["status"], "added")
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.favorite_count, 1)
+
+        self.assertEqual(self.client.post(url, {"job_id": self.job.id}).json()["status"], "removed")
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.favorite_count, 0)
+
+        self.assertEqual(self.client.post(url, {"job_id": 999}).status_code, 404)
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_reconcile_repairs_drift(self):
+        other = self.create_job(self.employer)
+        Applicant.objects.create(user=self.employee, job=self.job, status=Applicant.ACCEPTED)
+        Applicant.objects.create(user=self.employer, job=self.job, status=Applicant.REJECTED)
+        Favorite.objects.create(user=self.employee, job=other)
+        Job.objects.filter(pk=other.pk).update(applicant_pending_count=4)
+
+        out = StringIO()
+        call_command("reconcile_job_counters", dry_run=True, stdout=out)
+        self.assertIn("found 2", out.getvalue())
+        call_command("reconcile_job_counters", batch_size=1, stdout=out)
+        self.assertIn("repaired 2", out.getvalue())
+
+        self.job.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.job.applicant_accepted_count, self.job.applicant_rejected_count), (1, 1))
+        self.assertEqual((other.applicant_pending_count, other.favorite_count), (0, 1))
+        self.assertEqual(counters.reconcile(), (2, 0))
+
+
+class TestTrending(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.employees = [self.create_employee("employee%d@test.com" % i) for i in range(3)]
+        self.old, self.fresh, self.viewed, self.filled = [
+            self.create_job(self.employer, title=title) for title in ("Old", "Fresh", "Viewed", "Filled")]
+        now = timezone.now()
+        for employee in self.employees:
+            # Three applications a week ago are worth less than two today
+            Applicant.objects.create(user=employee, job=self.old, created_at=now - timedelta(days=7))
+            Applicant.objects.create(user=employee, job=self.filled, created_at=now)
+        for employee in self.employees[:2]:
+            Applicant.objects.create(user=employee, job=self.fresh, created_at=now)
+        Favorite.objects.create(user=self.employees[0], job=self.viewed, created_at=now)
+        JobViewDay.objects.create(job=self.viewed, day=now.date(), views=4)
+        Job.objects.filter(pk=self.filled.pk).update(filled=True)
+
+    def test_recompute_ranks_decayed_scores(self):
+        scores = trending.compute_scores()
+        self.assertAlmostEqual(scores[self.fresh.id], 10.0)
+        self.assertAlmostEqual(scores[self.viewed.id], 7.0)
+        self.assertAlmostEqual(scores[self.old.id], 15.0 / 2 ** 7)
+
+        out = StringIO()
+        call_command("compute_trending", stdout=out)
+        self.assertIn("Ranked 3 trending jobs", out.getvalue())
+        self.assertEqual(
+            list(TrendingJob.objects.values_list("job_id", "rank")),
+            [(self.fresh.id, 1), (self.viewed.id, 2), (self.old.id, 3)])
+
+    def test_home_reads_trending_in_one_query(self):
+        trending.recompute()
+        with self.assertNumQueries(1):
+            self.assertEqual(trending.top(2), [self.fresh, self.viewed])
+        response = self.client.get(reverse("job:home"))
+        self.assertEqual(response.context["trendings"], [self.fresh, self.viewed, self.old])
+
+    def test_newest_jobs_before_first_batch(self):
+        self.assertEqual(trending.top(2), [self.viewed, self.fresh])
+
+
+class TestSimilarJobs(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        python = Tag.objects.create(name="python")
+        self.backend = self.create_job(
+            self.employer, title="Python Backend Developer", description="Django APIs and PostgreSQL", tags=[python])
+        self.django = self.create_job(
+            self.employer, title="Django Developer", description="Python web APIs with Django", tags=[python])
+        self.data = self.create_job(
+            self.employer, title="Python Data Engineer", description="Pipelines in Python", category="Data")
+        self.designer = self.create_job(
+            self.employer, title="Graphic Designer", description="Brand and print design", category="Design")
+
+    def neighbors(self, job):
+        return list(SimilarJob.objects.filter(job=job).values_list("neighbor__title", flat=True))
+
+    def test_full_recompute_ranks_by_cosine(self):
+        self.assertEqual(similar.recompute(full=True), 4)
+        self.assertEqual(self.neighbors(self.backend), ["Django Developer", "Python Data Engineer"])
+        self.assertEqual(self.neighbors(self.designer), [])
+        scores = list(SimilarJob.objects.filter(job=self.backend).values_list("score", flat=True))
+        self.assertTrue(1 >= scores[0] >= scores[1] > 0)
+
+    def test_incremental_recompute(self):
+        similar.recompute(full=True)
+        SimilarJob.objects.update(computed_at=timezone.now() - timedelta(hours=1))
+
+        new = self.create_job(self.employer, title="Senior Graphic Designer", description="Print design",
+                              category="Design")
+        self.data.filled = True
+        self.data.save()
+        # The new job, the designer it joins and the lists that showed the
+        # filled job; the filled job's own list is dropped
+        self.assertEqual(similar.recompute(), 4)
+        self.assertEqual(self.neighbors(self.designer), ["Senior Graphic Designer"])
+        self.assertEqual(self.neighbors(new), ["Graphic Designer"])
+        self.assertEqual(self.neighbors(self.backend), ["Django Developer"])
+        self.assertEqual(self.neighbors(self.data), [])
+
+        self.assertEqual(similar.recompute(), 0)
+
+    def test_detail_view_reads_neighbors_in_one_query(self):
+        similar.recompute(full=True)
+        url = reverse("job:jobs-detail", args=[self.backend.id])
+        # version, job, similar jobs
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context["similar_jobs"], [self.django, self.data])
+
+        etag = response["ETag"]
+        self.django.filled = True
+        self.django.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["similar_jobs"], [self.data])
+
+
+class TestRecommendedFeed(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        python = Tag.objects.create(name="python")
+        design = Tag.objects.create(name="design")
+        self.applied = self.create_job(self.employer, title="Python Backend Developer", tags=[python])
+        self.favorited = self.create_job(self.employer, title="Django Developer", tags=[python])
+        self.match = self.create_job(self.employer, title="Senior Python Developer", tags=[python])
+        self.filled = self.create_job(self.employer, title="Python Developer", tags=[python], filled=True)
+        self.designer = self.create_job(self.employer, title="Graphic Designer", category="Design",
+                                        location="Bandung", tags=[design])
+        Applicant.objects.create(user=self.employee, job=self.applied)
+        Favorite.objects.create(user=self.employee, job=self.favorited)
+
+    def test_feed_ranks_open_jobs_like_the_history(self):
+        ids = feed.FeedModel().feeds([self.employee.id])[self.employee.id]
+        self.assertEqual(ids[0], self.match.id)
+        self.assertNotIn(self.applied.id, ids)
+        self.assertNotIn(self.favorited.id, ids)
+        self.assertNotIn(self.filled.id, ids)
+        self.assertEqual(feed.feed_for(self.create_employee("new@test.com").id), [])
+
+    def test_precomputed_feeds_are_served_from_the_table(self):
+        other = self.create_job(self.employer, title="Python Engineer", tags=[Tag.objects.get(name="python")])
+        self.assertEqual(feed.compute_feeds(), 1)
+        with self.assertNumQueries(1):
+            ids = feed.feed_for(self.employee.id)
+        self.assertEqual(ids[0], self.match.id)
+        self.assertIn(other.id, ids)
+
+        # Jobs applied to or favorited since then are left out
+        Applicant.objects.create(user=self.employee, job=self.match)
+        with self.assertNumQueries(2):
+            self.assertEqual([job.id for job in feed.recommended_jobs(self.employee.id)], ids[1:])
+        favorites.toggle(self.employee.id, other.id)
+        self.assertNotIn(other.id, [job.id for job in feed.recommended_jobs(self.employee.id)])
+        self.assertEqual(JobFeed.objects.get(user=self.employee).job_ids, ids)
+
+        # Users without a stored feed are never computed inside a request
+        new = self.create_employee("new@test.com")
+        Favorite.objects.create(user=new, job=self.match)
+        with self.assertNumQueries(1):
+            self.assertEqual(feed.feed_for(new.id), [])
+
+    def test_history_changes_mark_the_feed_stale(self):
+        other = self.create_employee("other@test.com")
+        Applicant.objects.create(user=other, job=self.designer)
+        self.assertEqual(feed.compute_feeds(), 2)
+        self.assertFalse(JobFeed.objects.filter(stale=True).exists())
+        untouched = JobFeed.objects.get(user=other).computed_at
+        version = JobFeed.objects.get(user=self.employee).version
+
+        Applicant.objects.create(user=self.employee, job=self.match)
+        favorites.toggle(self.employee.id, self.designer.id)
+        row = JobFeed.objects.get(user=self.employee)
+        self.assertEqual((row.stale, row.version), (True, version + 2))
+        # Answering an application leaves the feed alone
+        Applicant.objects.filter(user=self.employee, job=self.match).get().save()
+        self.assertEqual(JobFeed.objects.get(user=self.employee).version, version + 2)
+        # A new user gets an empty stale row
+        new = self.create_employee("new@test.com")
+        favorites.toggle(new.id, self.match.id)
+        self.assertEqual(JobFeed.objects.get(user=new).job_ids, [])
+
+        self.assertEqual(feed.stale_users(), {self.employee.id, new.id})
+        self.assertEqual(feed.compute_feeds(stale_only=True), 2)
+        self.assertEqual(feed.stale_users(), set())
+        self.assertNotIn(self.match.id, feed.feed_for(self.employee.id))
+        self.assertIn(self.favorited.id, feed.feed_for(new.id))
+        self.assertEqual(JobFeed.objects.get(user=other).computed_at, untouched)
+
+    def test_changes_during_a_run_stay_stale(self):
+        feeds = feed.FeedModel.feeds
+
+        def apply_meanwhile(model, user_ids):
+            result = feeds(model, user_ids)
+            Applicant.objects.create(user=self.employee, job=self.match)
+            return result
+
+        with patch.object(feed.FeedModel, "feeds", apply_meanwhile):
+            self.assertEqual(feed.compute_feeds(), 0)
+        self.assertTrue(JobFeed.objects.get(user=self.employee).stale)
+        self.assertEqual(feed.compute_feeds(stale_only=True), 1)
+        self.assertNotIn(self.match.id, feed.feed_for(self.employee.id))
+
+
+class TestJobExpiry(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        today = timezone.localdate()
+        self.past = [self.create_job(self.employer, title="Past %d" % i, last_date=today - timedelta(days=i + 1))
+                     for i in range(3)]
+        self.filled = self.create_job(self.employer, last_date=today - timedelta(days=1), filled=True)
+        self.today = self.create_job(self.employer, title="Today", last_date=today)
+
+    def test_sweep_expires_in_batches(self):
+        generation = facets.generation()
+        before = Job.objects.get(pk=self.past[0].pk).updated_at
+        out = StringIO()
+        call_command("expire_jobs", batch_size=2, stdout=out)
+        self.assertIn("Expired 2 jobs\nExpired 3 jobs\n", out.getvalue())
+
+        self.assertEqual(set(Job.objects.expired()), set(self.past))
+        # Filled is a separate state, and today is still open
+        self.assertFalse(Job.objects.get(pk=self.filled.pk).expired)
+        self.assertEqual(list(Job.objects.unfilled()), [self.today])
+        self.assertNotEqual(facets.generation(), generation)
+        self.assertGreater(Job.objects.get(pk=self.past[0].pk).updated_at, before)
+        self.assertEqual(expiry.sweep(), 0)
+
+    def test_listings_exclude_expired_jobs(self):
+        expiry.sweep()
+        response = self.client.get(reverse("job:jobs"))
+        self.assertEqual([job.title for job in response.context["jobs"]], ["Backend Engineer", "Today"])
+        self.assertEqual(list(self.client.get(reverse("job:home")).context["jobs"]), [self.today])
+
+        # Moving the deadline forward reopens the job
+        job = self.past[0]
+        job.refresh_from_db()
+        job.last_date = timezone.localdate() + timedelta(days=7)
+        job.save()
+        self.assertIn(job, Job.objects.unfilled())
+
+    def test_open_jobs_are_read_through_the_index(self):
+        plan = expiry.due().order_by("last_date", "id").values("id")[:500].explain()
+        self.assertIn("job_open_idx", plan)
+        self.assertIn("job_open_recent_idx", Job.objects.unfilled().order_by("-created_at")[:5].explain())
+
+
+class TestRoleAccess(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        self.create_job(self.employer)
+        self.url = reverse("job:dashboard")
+
+    def test_views_check_the_role(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.login(email="employee@test.com", password="Abcdefgh.1")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(reverse("job:employee-recommended")).status_code, 200)
+
+        self.client.login(email="employer@test.com", password="Abcdefgh.1")
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(reverse("job:employee-recommended")).status_code, 403)
+
+    def test_warm_dashboard_hit_reads_no_session_or_user(self):
+        self.client.login(email="employer@test.com", password="Abcdefgh.1")
+        self.client.get(self.url)
+        # Only the page of jobs and their tags: the session, the user and
+        # the summary come from caches
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        # A role change is seen on the next request after it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employer.role = "employee"
+            self.employer.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class TestViewCounter(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.jobs = [self.create_job(self.employer) for i in range(3)]
+
+    def test_views_are_written_in_one_batch(self):
+        counter = ViewCounter(interval=3600, threshold=1000)
+        for i in range(5):
+            counter.increment(self.jobs[0].id)
+        counter.increment(self.jobs[1].id)
+        self.assertEqual(Job.objects.get(pk=self.jobs[0].pk).view_count, 0)
+        self.assertEqual(counter.pending_for(self.jobs[0].id), 5)
+
+        # UPDATE jobs, id check, INSERT and UPDATE day buckets, inside a savepoint
+        with self.assertNumQueries(4 + 2):
+            self.assertEqual(counter.flush(), 6)
+        self.assertEqual(
+            list(Job.objects.values_list("view_count", flat=True)), [5, 1, 0])
+        self.assertEqual(
+            list(JobViewDay.objects.order_by("job_id").values_list("views", flat=True)), [5, 1])
+        self.assertEqual(counter.flush(), 0)
+
+    def test_threshold_triggers_flush(self):
+        counter = ViewCounter(interval=3600, threshold=3)
+        for job in self.jobs:
+            counter.increment(job.id)
+        counter.increment(self.jobs[0].id)
+        self.assertEqual(list(Job.objects.values_list("view_count", flat=True)), [1, 1, 1])
+        self.assertEqual(counter.pending_for(self.jobs[0].id), 1)
+
+    def test_detail_view_counts(self):
+        view_counter.flush()
+        for i in range(3):
+            self.client.get(reverse("job:jobs-detail", args=[self.jobs[2].id]))
+        view_counter.flush()
+        self.assertEqual(Job.objects.get(pk=self.jobs[2].pk).view_count, 3)
+
+
+class TestConditionalGet(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.job = self.create_job(self.employer)
+        self.detail_url = reverse("job:jobs-detail", args=[self.job.id])
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        # The ETag also covers the user and their favorites, no date does
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=http_date()).status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.job.tags.add(Tag.objects.create(name="remote"))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        self.assertEqual(self.client.get(reverse("job:jobs-detail", args=[999])).status_code, 404)
+
+    def test_list_pages_not_modified(self):
+        # versions: the newest updated_at, plus the trending batch time on the home page
+        for url, queries in ((reverse("job:jobs"), 1), (reverse("job:home"), 2)):
+            etag = self.client.get(url)["ETag"]
+            with self.assertNumQueries(queries):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            other = self.create_job(self.employer, title="New")
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            etag = self.client.get(url)["ETag"]
+            other.delete()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class TestFavorites(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        self.job = self.create_job(self.employer)
+        self.url = reverse("job:favorite")
+        self.client.login(email="employee@test.com", password="Abcdefgh.1")
+
+    def test_explicit_state_is_idempotent(self):
+        for i in range(2):
+            response = self.client.post(self.url, {"job_id": self.job.id, "state": "1"})
+            self.assertEqual(response.json()["status"], "added")
+        self.job.refresh_from_db()
+        self.assertEqual((Favorite.objects.count(), self.job.favorite_count), (1, 1))
+
+        for i in range(2):
+            response = self.client.post(self.url, {"job_id": self.job.id, "state": "0"})
+            self.assertEqual(response.json()["status"], "removed")
+        self.job.refresh_from_db()
+        self.assertEqual((Favorite.objects.count(), self.job.favorite_count), (0, 0))
+        self.assertEqual(self.client.post(self.url, {"job_id": 999, "state": "1"}).status_code, 404)
+
+    def test_add_is_one_upsert(self):
+        # INSERT ... ON CONFLICT, the counter UPDATE and the feed's stale
+        # mark, inside a savepoint
+        with self.assertNumQueries(3 + 2):
+            self.assertEqual(favorites.toggle(self.employee.id, self.job.id, True), favorites.ADDED)
+        # A request losing the race writes nothing
+        with self.assertNumQueries(1 + 2):
+            self.assertEqual(favorites.toggle(self.employee.id, self.job.id, True), favorites.ADDED)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.favorite_count, 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Favorite.objects.create(user=self.employee, job=self.job)
+
+        # The raw INSERT stores created_at like the ORM does
+        Favorite.objects.create(user=self.create_employee("other@test.com"), job=self.job)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT created_at FROM job_favorite ORDER BY id")
+            raw, orm = [row[0] for row in cursor.fetchall()]
+        self.assertEqual(type(raw), type(orm))
+        self.assertEqual(getattr(raw, "tzinfo", None), getattr(orm, "tzinfo", None))
+
+    def test_favorite_ids_are_cached_and_invalidated(self):
+        other = self.create_job(self.employer)
+        with self.captureOnCommitCallbacks(execute=True):
+            favorites.toggle(self.employee.id, self.job.id, True)
+        self.assertEqual(favorites.ids_for(self.employee), {self.job.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.ids_for(self.employee), {self.job.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            favorites.toggle(self.employee.id, other.id)
+            # Until the change commits, other requests may still cache the
+            # old set, so it is not dropped yet
+            self.assertEqual(cache.get(favorites.cache_key(self.employee.id)), {self.job.id})
+        self.assertEqual(favorites.ids_for(self.employee), {self.job.id, other.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            favorites.toggle(self.employee.id, self.job.id)
+        self.assertEqual(favorites.ids_for(self.employee), {other.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                favorites.toggle(self.employee.id, other.id)
+                transaction.set_rollback(True)
+        with self.assertNumQueries(0):
+            self.assertEqual(favorites.ids_for(self.employee), {other.id})
+
+    def test_listing_pages_mark_favorites(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            favorites.toggle(self.employee.id, self.job.id, True)
+        for url in (reverse("job:jobs"), reverse("job:home"), reverse("job:search")):
+            self.assertEqual(self.client.get(url).context["favorite_ids"], {self.job.id})
+
+        # Unfavoriting changes the list page's ETag
+        url = reverse("job:jobs")
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {"job_id": self.job.id})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["favorite_ids"], frozenset())
+
+
+class TestJobApi(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="python")
+        self.remote = Tag.objects.create(name="remote")
+        self.jobs = [
+            self.create_job(self.employer, title="Python Developer %d" % i, tags=[self.python, self.remote])
+            for i in range(5)
+        ]
+        self.other = self.create_job(self.employer, title="Designer", location="Bandung")
+
+    def get_list(self, params, queries=None):
+        if queries is None:
+            response = self.client.get(reverse("job:api-job-list"), params)
+            return json.loads(b"".join(response.streaming_content))
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse("job:api-job-list"), params)
+            return json.loads(b"".join(response.streaming_content))
+
+    def test_sparse_fields_and_constant_queries(self):
+        # one query for jobs, one for the tags of the chunk
+        data = self.get_list({"fields": "tags,title"}, queries=2)
+        self.assertEqual(len(data["results"]), 6)
+        self.assertEqual(data["results"][0], {"title": "Python Developer 0", "tags": ["python", "remote"]})
+        self.assertIsNone(data["next"])
+
+        data = self.get_list({"fields": "id,location"}, queries=1)
+        self.assertEqual(data["results"][-1], {"id": self.other.id, "location": "Bandung"})
+        self.assertEqual(self.client.get(reverse("job:api-job-list"), {"fields": "password"}).status_code, 400)
+
+    def test_cursor_pages(self):
+        seen = []
+        params = {"fields": "id", "limit": 4}
+        while True:
+            data = self.get_list(params)
+            seen.extend(item["id"] for item in data["results"])
+            if not data["next"]:
+                break
+            params["cursor"] = data["next"]
+        self.assertEqual(seen, [job.id for job in self.jobs + [self.other]])
+
+        for params in ({"cursor": "not-a-cursor"}, {"tags": "python AND ("}):
+            response = self.client.get(reverse("job:api-job-list"), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertIn("error", response.json())
+
+    def test_filters_match_search_view(self):
+        data = self.get_list({"fields": "id", "q": "python", "location": "jakarta"})
+        self.assertEqual([item["id"] for item in data["results"]], [job.id for job in self.jobs])
+        data = self.get_list({"fields": "id", "title": "design", "mode": "like"})
+        self.assertEqual(data["results"], [{"id": self.other.id}])
+        data = self.get_list({"fields": "id", "tag": self.python.id, "limit": 2})
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNotNone(data["next"])
+
+    def test_detail(self):
+        response = self.client.get(reverse("job:api-job-detail", args=[self.other.id]), {"fields": "title,url"})
+        self.assertEqual(response.json(), {
+            "title": "Designer", "url": reverse("job:api-job-detail", args=[self.other.id])})
+        self.assertEqual(self.client.get(reverse("job:api-job-detail", args=[999])).status_code, 404)
+
+
+class TestEmployerDashboard(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        python = Tag.objects.create(name="python")
+        self.jobs = [self.create_job(self.employer, title="Job %d" % i, tags=[python]) for i in range(12)]
+        self.create_job(self.create_employer("other@test.com"))
+        for job in self.jobs[:3]:
+            Applicant.objects.create(user=self.employee, job=job)
+            counters.applicant_added(job.id)
+        old = Applicant.objects.create(user=self.create_employee("old@test.com"), job=self.jobs[0],
+                                       created_at=timezone.now() - timedelta(days=30))
+        counters.applicant_added(old.job_id)
+        counters.applicant_status_changed(old.job_id, Applicant.PENDING, Applicant.ACCEPTED)
+        Applicant.objects.filter(pk=old.pk).update(status=Applicant.ACCEPTED)
+
+    def get(self, **params):
+        request = RequestFactory().get("/", params)
+        request.user = self.employer
+        view = DashboardView()
+        view.setup(request)
+        return view.get(request)
+
+    def test_page_needs_no_query_per_job(self):
+        # page of jobs, their tags, and the summary's aggregate and recent count
+        with self.assertNumQueries(4):
+            response = self.get()
+            jobs = response.context_data["jobs"]
+            self.assertEqual([job.title for job in jobs], ["Job %d" % i for i in range(11, 1, -1)])
+            self.assertEqual({tag.name for job in jobs for tag in job.tags.all()}, {"python"})
+            self.assertEqual(sum(job.applicant_count for job in jobs), 1)
+        page = response.context_data["page_obj"]
+        self.assertEqual(len(self.get(cursor=page.next_cursor).context_data["jobs"]), 2)
+        # The summary comes from the cache now
+        with self.assertNumQueries(2):
+            self.get()
+
+    def test_summary_is_invalidated_by_new_applications(self):
+        summary = dashboard.summary(self.employer.id)
+        self.assertEqual(
+            {key: summary[key] for key in ("jobs", "open_jobs", "applicants", "pending", "accepted")},
+            {"jobs": 12, "open_jobs": 12, "applicants": 4, "pending": 3, "accepted": 1})
+        self.assertEqual(summary["recent_applicants"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Applicant.objects.create(user=self.employee, job=self.jobs[5])
+            # Not before the new counts commit
+            self.assertIsNotNone(cache.get(dashboard.cache_key(self.employer.id)))
+        self.assertIsNone(cache.get(dashboard.cache_key(self.employer.id)))
+        self.assertEqual(dashboard.summary(self.employer.id)["recent_applicants"], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.jobs[0].save()
+                transaction.set_rollback(True)
+        self.assertIsNotNone(cache.get(dashboard.cache_key(self.employer.id)))
+
+
+class TestBulkResponse(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.jobs = [self.create_job(self.employer), self.create_job(self.employer)]
+        other_job = self.create_job(self.create_employer("other@test.com"))
+        User.objects.bulk_create([User(email="applicant%d@test.com" % i, role="employee") for i in range(600)])
+        users = list(User.objects.filter(role="employee").order_by("id"))
+        # 600 applicants per job, a third in each status
+        Applicant.objects.bulk_create(
+            Applicant(user=user, job=job, status=i % 3) for job in self.jobs for i, user in enumerate(users))
+        self.other = Applicant.objects.create(user=users[0], job=other_job)
+        counters.reconcile()
+
+    def test_one_update_for_many_applicants(self):
+        ids = list(Applicant.objects.filter(job__in=self.jobs).values_list("id", flat=True))
+        # SELECT, UPDATE, counter recount, inside a savepoint, plus the
+        # batched outbox INSERTs
+        with CaptureQueriesContext(connection) as queries:
+            result = responses.respond(self.employer.id, ids + [self.other.id, 99999], Applicant.ACCEPTED)
+        table = OutboxMessage._meta.db_table
+        self.assertEqual(len([query for query in queries if table not in query["sql"]]), 3 + 2)
+        self.assertEqual(OutboxMessage.objects.filter(key__startswith="response:").count(), 800 * 2)
+        self.assertEqual(result, {
+            "status": "accepted", "updated": 800, "unchanged": 400, "not_found": 2,
+            "previous": {"pending": 400, "rejected": 400},
+        })
+        self.assertEqual(Applicant.objects.filter(job__in=self.jobs, status=Applicant.ACCEPTED).count(), 1200)
+        self.assertEqual(Applicant.objects.get(pk=self.other.pk).status, Applicant.PENDING)
+        job = Job.objects.get(pk=self.jobs[0].pk)
+        self.assertEqual(
+            (job.applicant_pending_count, job.applicant_accepted_count, job.applicant_rejected_count), (0, 600, 0))
+        self.assertEqual(counters.reconcile(), (3, 0))
+
+    def test_endpoint(self):
+        self.client.login(email="employer@test.com", password="Abcdefgh.1")
+        url = reverse("job:applicant-send-response-bulk")
+        ids = ",".join(map(str, Applicant.objects.filter(job=self.jobs[0]).values_list("id", flat=True)[:3]))
+        response = self.client.post(url, {"applicant_ids": ids, "status": Applicant.REJECTED})
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(self.client.post(url, {"applicant_ids": ids, "status": 7}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"applicant_ids": "1,x", "status": 1}).status_code, 400)
+
+    def test_comment_is_written_to_every_selected_applicant(self):
+        ids = list(Applicant.objects.filter(job=self.jobs[1]).values_list("id", flat=True)[:3])
+        result = responses.respond(self.employer.id, ids, Applicant.REJECTED, comment="Position closed")
+        self.assertEqual((result["updated"], result["unchanged"]), (2, 1))
+        self.assertEqual(
+            set(Applicant.objects.filter(pk__in=ids).values_list("status", "comment")),
+            {(Applicant.REJECTED, "Position closed")})
+        self.assertEqual(counters.reconcile(), (3, 0))
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP server unavailable")
+
+
+class TestOutbox(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        self.job = self.create_job(self.employer, title="Backend Engineer")
+        self.applicant = Applicant.objects.create(user=self.employee, job=self.job)
+
+    def notify(self):
+        outbox.notify_application(self.applicant.id, self.employer.id, self.job.title, self.employee.email)
+
+    def test_messages_are_written_with_the_change(self):
+        try:
+            with transaction.atomic():
+                self.notify()
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        self.notify()
+        self.notify()
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list("key", flat=True)),
+            ["application:%d:email" % self.applicant.id, "application:%d:inbox" % self.applicant.id])
+
+    def test_worker_delivers_once(self):
+        self.notify()
+        responses.respond(self.employer.id, [self.applicant.id], Applicant.ACCEPTED, comment="Welcome aboard")
+        out = StringIO()
+        call_command("send_notifications", once=True, workers=2, stdout=out)
+        self.assertIn("Sent 4 notifications, 0 failed", out.getvalue())
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ["employee@test.com", "employer@test.com"])
+        accepted = next(message for message in mail.outbox if message.to == ["employee@test.com"])
+        self.assertEqual(accepted.subject, "Your application for Backend Engineer was accepted")
+        self.assertIn("Welcome aboard", accepted.body)
+        key = OutboxMessage.objects.get(key__startswith="response:", channel=OutboxMessage.EMAIL).key
+        self.assertTrue(key.startswith("response:%d:%d:" % (self.applicant.id, Applicant.ACCEPTED)))
+        self.assertEqual(accepted.extra_headers["Message-ID"], outbox.message_id(key))
+        self.assertEqual(InboxMessage.objects.filter(user=self.employer).count(), 1)
+        self.assertFalse(OutboxMessage.objects.filter(sent_at__isnull=True).exists())
+
+        self.assertEqual(outbox.drain(), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_emails_back_off(self):
+        self.notify()
+        with override_settings(EMAIL_BACKEND="job.tests.FailingEmailBackend"):
+            self.assertEqual(outbox.drain(), (1, 1))
+        message = OutboxMessage.objects.get(channel=OutboxMessage.EMAIL)
+        self.assertEqual((message.attempts, message.sent_at, message.claim), (1, None, ""))
+        self.assertIn("SMTP server unavailable", message.last_error)
+        self.assertGreaterEqual(message.available_at, timezone.now() + timedelta(seconds=outbox.BACKOFF_BASE - 1))
+        # Not due yet
+        self.assertEqual(outbox.drain(), (0, 0))
+
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claims_are_exclusive(self):
+        self.notify()
+        self.assertEqual(len(outbox.claim()), 2)
+        self.assertEqual(outbox.claim(), [])
+        OutboxMessage.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(outbox.claim()), 2)
+
+        # A message sent by another worker between the id read and the
+        # UPDATE (when the claim token is made) is not claimed again
+        OutboxMessage.objects.update(claimed_until=None)
+        uuid4 = outbox.uuid.uuid4
+
+        def sent_meanwhile():
+            OutboxMessage.objects.filter(channel=OutboxMessage.EMAIL).update(sent_at=timezone.now())
+            return uuid4()
+
+        with patch.object(outbox.uuid, "uuid4", sent_meanwhile):
+            claimed = outbox.claim()
+        self.assertEqual([message.channel for message in claimed], [OutboxMessage.INBOX])
+
+    def test_every_response_change_is_notified(self):
+        for status in (Applicant.ACCEPTED, Applicant.REJECTED, Applicant.ACCEPTED):
+            responses.respond(self.employer.id, [self.applicant.id], status)
+        subjects = OutboxMessage.objects.filter(channel=OutboxMessage.EMAIL).order_by("id").values_list(
+            "subject", flat=True)
+        self.assertEqual([subject.rpartition(" ")[2] for subject in subjects],
+                         ["accepted", "rejected", "accepted"])
+
+
+class TestApplicantExport(JobTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.employer = User.objects.create_user(email="employer@test.com", password="Abcdefgh.1", role="employer")
+        fields = dict(user=cls.employer, description="Build things", location="Jakarta", type="1",
+                      category="Engineering", last_date=timezone.now().date() + timedelta(days=30),
+                      name_company="Banyu", salary=10000000)
+        Job.objects.bulk_create([Job(title="Job %d" % i, **fields) for i in range(1000)])
+        cls.jobs = list(Job.objects.order_by("id"))
+        User.objects.bulk_create([User(email="applicant%d@test.com" % i, first_name="Applicant", last_name=str(i),
+                                       role="employee") for i in range(100)])
+        users = list(User.objects.filter(role="employee").order_by("id"))
+        Applicant.objects.bulk_create(
+            (Applicant(user=user, job=job, status=(i + j) % 3)
+             for i, job in enumerate(cls.jobs) for j, user in enumerate(users)),
+            batch_size=5000)
+
+    def consume(self, chunks):
+        # Returns (rows, peak bytes allocated while streaming)
+        tracemalloc.start()
+        try:
+            lines = 0
+            for chunk in chunks:
+                lines += chunk.count("\n")
+            return lines, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_100k_applicants_stream_in_constant_memory(self):
+        queryset = Applicant.objects.filter(job__user_id=self.employer.id)
+        with self.assertNumQueries(1):
+            lines, peak = self.consume(exports.stream(queryset, "csv"))
+        self.assertEqual(lines, 100001)
+        # The whole CSV is ~8 MB; streaming holds about one chunk of it
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+        lines = sum(chunk.count("\n") for chunk in exports.stream(queryset, "ndjson"))
+        self.assertEqual(lines, 100000)
+
+    def test_rows_and_status_filter(self):
+        job = self.jobs[0]
+        queryset = exports.filter_by_status(Applicant.objects.filter(job=job), {"status": "1"})
+        chunks = "".join(exports.stream(queryset, "csv"))
+        rows = list(csv.reader(chunks.splitlines()))
+        self.assertEqual(rows[0], list(exports.COLUMNS))
+        self.assertEqual(len(rows), 1 + 33)
+        self.assertEqual(rows[1][1:7], [str(job.id), job.title, "applicant1@test.com", "Applicant", "1", "accepted"])
+
+        items = [json.loads(line) for line in "".join(exports.stream(queryset, "ndjson")).splitlines()]
+        self.assertEqual([item["id"] for item in items], [int(row[0]) for row in rows[1:]])
+        self.assertEqual({item["status"] for item in items}, {"accepted"})
+        with self.assertRaises(Http404):
+            exports.filter_by_status(queryset, {"status": "9"})
+
+    def test_csv_cells_are_not_formulas(self):
+        User.objects.filter(email="applicant1@test.com").update(first_name="=HYPERLINK(\"http://x\")", last_name="-2")
+        queryset = Applicant.objects.filter(job=self.jobs[0], user__email="applicant1@test.com")
+        row = list(csv.reader("".join(exports.stream(queryset, "csv")).splitlines()))[1]
+        self.assertEqual(row[4:6], ["'=HYPERLINK(\"http://x\")", "'-2"])
+        self.assertEqual(row[3], "applicant1@test.com")
+        # NDJSON is read by programs, not spreadsheets
+        item = json.loads("".join(exports.stream(queryset, "ndjson")))
+        self.assertEqual(item["first_name"], "=HYPERLINK(\"http://x\")")
+
+
+class TestImportJobs(JobTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.python = Tag.objects.create(name="python")
+        self.last_date = (timezone.now().date() + timedelta(days=30)).isoformat()
+
+    def row(self, i, **fields):
+        row = {
+            "title": "Imported Engineer %d" % i, "description": "Imported posting", "location": "Jakarta",
+            "type": "1", "category": "Engineering", "last_date": self.last_date, "name_company": "Banyu",
+            "salary": 10000000, "tags": ["python", "tag%d" % (i % 3)],
+        }
+        row.update(fields)
+        return row
+
+    def write(self, suffix, rows):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False, newline="", encoding="utf-8")
+        self.addCleanup(os.unlink, file.name)
+        with file:
+            if suffix == ".csv":
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(dict(row, tags=",".join(row["tags"])) for row in rows)
+            else:
+                file.writelines(json.dumps(row) + "\n" for row in rows)
+        return file.name
+
+    def import_file(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command("import_jobs", path, employer=self.employer.email, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_rows_are_validated_like_create_job_form(self):
+        rows = [self.row(i) for i in range(3)] + [
+            self.row(3, last_date="2000-01-01"),
+            self.row(4, tags=["t%d" % n for n in range(8)]),
+        ]
+        out, err = self.import_file(self.write(".csv", rows))
+        self.assertIn("Imported 3 jobs, skipped 2 invalid rows", out)
+        self.assertIn("Row 4 skipped: last_date", err)
+        self.assertIn("Row 5 skipped: tags", err)
+
+        jobs = list(Job.objects.filter(user=self.employer).prefetch_related("tags"))
+        self.assertEqual([job.title for job in jobs], ["Imported Engineer %d" % i for i in range(3)])
+        self.assertEqual(sorted(tag.name for tag in jobs[1].tags.all()), ["python", "tag1"])
+        # The existing tag is reused, new ones are created once
+        self.assertEqual(Tag.objects.filter(name="python").count(), 1)
+        self.assertEqual(Tag.objects.count(), 4)
+        self.assertEqual(self.python.job_set.count(), 3)
+        self.assertEqual(search.apply_search(Job.objects.all(), {"q": "imported tag2"}).count(), 1)
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        def queries(count):
+            path = self.write(".ndjson", [self.row(i) for i in range(count)])
+            with CaptureQueriesContext(connection) as context:
+                self.import_file(path, batch_size=1000)
+            return len(context.captured_queries)
+
+        Tag.objects.bulk_create([Tag(name="tag%d" % i) for i in range(3)])
+        # Both sizes fit in one INSERT under SQLite's 999 parameters
+        self.assertEqual(queries(10), queries(50))
+        self.assertEqual(Job.objects.count(), 60)
+        self.assertEqual(Job.tags.through.objects.count(), 120)
+
+    def test_imports_reach_the_tag_index_and_autocomplete(self):
+        self.addCleanup(tag_index.reset)
+        self.addCleanup(suggester.reset)
+        tag_index.build()
+        suggester.build()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.import_file(self.write(".ndjson", [self.row(i) for i in range(3)]), batch_size=2)
+        # One generation bump per committed batch
+        self.assertEqual(len(callbacks), 2)
+
+        imported = set(Job.objects.values_list("id", flat=True))
+        self.assertEqual(set(tag_index.query("python")), imported)
+        suggester.checked_at -= autocomplete.REFRESH_SECONDS
+        self.assertEqual(suggester.suggest("imported", kinds=("title",))["title"][0]["value"], "Imported Engineer 0")
+
+    def test_dry_run(self):
+        out, err = self.import_file(self.write(".ndjson", [self.row(0)]), dry_run=True)
+        self.assertIn("Validated 1 jobs", out)
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], DATABASE_ROUTERS=["job.routers.PrimaryReplicaRouter"])
+class TestReplicaRouting(SimpleTestCase):
+    def setUp(self) -> None:
+        self.router = routers.PrimaryReplicaRouter()
+
+    def respond(self, request, write=False):
+        def get_response(request):
+            read_before = self.router.db_for_read(Job)
+            if write:
+                self.router.db_for_write(Job)
+            response = HttpResponse()
+            response.reads = read_before, self.router.db_for_read(Job)
+            return response
+        return ReplicaMiddleware(get_response)(request)
+
+    def test_reads_use_the_primary_outside_requests(self):
+        self.assertEqual(self.router.db_for_read(Job), "default")
+        self.assertEqual(self.router.db_for_write(Job), "default")
+        self.assertFalse(self.router.allow_migrate("replica", "job"))
+        self.assertIsNone(self.router.allow_migrate("default", "job"))
+
+    def test_safe_requests_read_the_replica_until_they_write(self):
+        factory = RequestFactory()
+        response = self.respond(factory.get("/jobs/"))
+        self.assertEqual(response.reads, ("replica", "replica"))
+        self.assertNotIn(COOKIE_NAME, response.cookies)
+
+        response = self.respond(factory.get("/jobs/"), write=True)
+        self.assertEqual(response.reads, ("replica", "default"))
+        self.assertIn(COOKIE_NAME, response.cookies)
+        self.assertEqual(self.router.db_for_read(Job), "default")
+
+        self.assertEqual(self.respond(factory.post("/favorite/")).reads, ("default", "default"))
+
+    def test_writers_stick_to_the_primary(self):
+        factory = RequestFactory()
+        cookie = self.respond(factory.post("/favorite/"), write=True).cookies[COOKIE_NAME]
+        self.assertEqual(int(cookie["max-age"]), routers.STICKY_SECONDS)
+
+        request = factory.get("/jobs/")
+        request.COOKIES[COOKIE_NAME] = cookie.value
+        self.assertEqual(self.respond(request).reads, ("default", "default"))
+        request.COOKIES[COOKIE_NAME] = str(int(cookie.value) - routers.STICKY_SECONDS - 1)
+        self.assertEqual(self.respond(request).reads, ("replica", "replica"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"], DATABASE_ROUTERS=["job.routers.PrimaryReplicaRouter"])
+class TestReplicaCacheFills(JobTestMixin, TransactionTestCase):
+    # No "replica" connection exists here, so any read routed to it fails
+    def test_cache_fills_read_the_primary(self):
+        employer = self.create_employer()
+        employee = self.create_employee()
+        job = self.create_job(employer, tags=[Tag.objects.create(name="python")])
+        favorites.toggle(employee.id, job.id)
+        cache.clear()
+
+        with routers.use_replicas(True):
+            self.assertEqual(routers.PrimaryReplicaRouter().db_for_read(Job), "replica")
+            self.assertEqual(facets.get_facets(Job.objects.all(), key=())["category"][0]["count"], 1)
+            self.assertEqual(list(TagIndex().query("python")), [job.id])
+            self.assertEqual(autocomplete.Autocomplete().suggest("back")["title"][0]["value"], "Backend Engineer")
+            self.assertEqual(favorites.ids_for(employee), {job.id})
+            self.assertEqual(dashboard.summary(employer.id)["jobs"], 1)
+            self.assertTrue(routers.reading_replicas())
+
+
+class TestSyncReplica(JobTestMixin, TransactionTestCase):
+    # Committed rows: a backup waits for the source's write transaction to end
+    def test_copies_the_primary(self):
+        self.create_job(self.create_employer())
+        self.assertEqual(database_path({"NAME": "file:/tmp/replica.sqlite3?mode=ro"}), "/tmp/replica.sqlite3")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "replica.sqlite3")
+            connection.ensure_connection()
+            copy_database(connection.connection, path)
+            replica = sqlite3.connect("file:%s?mode=ro" % path, uri=True)
+            try:
+                self.assertEqual(replica.execute("SELECT title FROM job_job").fetchall(), [("Backend Engineer",)])
+            finally:
+                replica.close()
+
+
+class TestSqliteProfile(JobTestMixin, TestCase):
+    def test_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "db.sqlite3"))
+            try:
+                sqlite.apply_pragmas(db, {"journal_mode": "wal", "synchronous": "normal", "busy_timeout": 1234})
+                self.assertEqual(db.execute("PRAGMA journal_mode").fetchone(), ("wal",))
+                self.assertEqual(db.execute("PRAGMA synchronous").fetchone(), (1,))
+                self.assertEqual(db.execute("PRAGMA busy_timeout").fetchone(), (1234,))
+            finally:
+                db.close()
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": -1234})
+    def test_pragmas_are_applied_to_new_connections(self):
+        new_connection = connections.create_connection("default")
+        try:
+            with new_connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size")
+                self.assertEqual(cursor.fetchone(), (-1234,))
+        finally:
+            new_connection.close()
+
+    def test_write_queue_runs_writers_in_arrival_order(self):
+        queue = sqlite.WriteQueue()
+        order = []
+        queue.acquire()
+        with queue:
+            pass  # Reentrant
+        threads = []
+        for i in range(3):
+            threads.append(threading.Thread(target=lambda i=i: (queue.acquire(), order.append(i), queue.release())))
+            threads[-1].start()
+            while len(queue) < i + 1:
+                time.sleep(0.001)
+        self.assertEqual(order, [])
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2])
+
+    @override_settings(SQLITE_WRITE_QUEUE=True)
+    def test_write_transactions_through_the_queue(self):
+        employee = self.create_employee()
+        job = self.create_job(self.create_employer())
+        self.assertEqual(favorites.toggle(employee.id, job.id), favorites.ADDED)
+        self.assertIsNone(favorites.toggle(employee.id, job.id + 1))
+        self.assertEqual(favorites.toggle(employee.id, job.id), favorites.REMOVED)
+        job.refresh_from_db()
+        self.assertEqual(job.favorite_count, 0)
+        self.assertEqual(len(sqlite.write_queue), 0)
+        with self.assertRaises(ZeroDivisionError), sqlite.write_transaction():
+            1 / 0
+        with sqlite.write_queue:
+            pass
+
+
+class TestImmediateWrites(JobTestMixin, TransactionTestCase):
+    # Outside a test transaction, so the outermost block is really opened
+    def test_write_transactions_begin_immediate(self):
+        employee = self.create_employee()
+        job = self.create_job(self.create_employer())
+        with CaptureQueriesContext(connection) as queries:
+            with sqlite.write_transaction():
+                with sqlite.write_transaction():
+                    Favorite.objects.get_or_create(user=employee, job=job)
+        statements = [query["sql"] for query in queries.captured_queries]
+        self.assertEqual(statements[0], "BEGIN IMMEDIATE")
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 1)
+        self.assertNotIn("_start_transaction_under_autocommit", vars(connection))
+
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            Favorite.objects.filter(user=employee).exists()
+        self.assertEqual(queries.captured_queries[0]["sql"], "BEGIN")
+
+
+class TestQueryPlans(JobTestMixin, TestCase):
+    # EXPLAIN QUERY PLAN of the main query of each view: every table must be
+    # read through an index (SEARCH, or an ordered SCAN ... USING INDEX),
+    # never by a full "SCAN <table>". Pages marked ordered must also come in
+    # index order, without sorting the matching rows in a temp b-tree.
+    FULL_SCAN = re.compile(r"\bSCAN \w+$")
+
+    def setUp(self) -> None:
+        self.employer = self.create_employer()
+        self.employee = self.create_employee()
+        self.job = self.create_job(self.employer, title="Python Engineer")
+        self.applicant = Applicant.objects.create(user=self.employee, job=self.job)
+        favorites.toggle(self.employee.id, self.job.id)
+
+    def view_queryset(self, view_class, user, params=None, **kwargs):
+        # The view's queryset, ordered and sliced as its first page is
+        request = RequestFactory().get("/", params or {})
+        request.user = user
+        view = view_class()
+        view.setup(request, **kwargs)
+        queryset = view.get_queryset()
+        if hasattr(view, "keyset_fields"):
+            queryset = queryset.order_by(*view.keyset_fields)
+        if view.paginate_by:
+            queryset = queryset[:view.paginate_by + 1]
+        return queryset
+
+    def assertIndexed(self, name, queryset, ordered=False):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if self.FULL_SCAN.search(line)]
+        self.assertEqual(scans, [], "%s:\n%s" % (name, plan))
+        if ordered:
+            self.assertNotIn("TEMP B-TREE", plan, "%s:\n%s" % (name, plan))
+
+    def test_job_views(self):
+        employee, job = self.employee, self.job
+        self.assertIndexed("home", self.view_queryset(HomeView, employee), ordered=True)
+        self.assertIndexed("job list", self.view_queryset(JobListView, employee), ordered=True)
+        self.assertIndexed("job list by category", self.view_queryset(
+            JobListView, employee, {"category": "Engineering"}))
+        self.assertIndexed("search", search.apply_search(Job.objects.listed(), {"q": "python"}, ranked=False))
+        self.assertIndexed("job details", Job.objects.filter(pk=job.pk))
+        self.assertIndexed("recommended", Job.objects.unfilled().filter(id__in=[job.id]).exclude(
+            applicants__user_id=employee.id).exclude(favorites__user_id=employee.id))
+        self.assertIndexed("trending fallback", Job.objects.unfilled().order_by("-created_at")[:5], ordered=True)
+        self.assertIndexed("api list", api.filtered_jobs({}).order_by("id")[:api.DEFAULT_LIMIT])
+        self.assertIndexed("list page versions", Job.objects.order_by("-updated_at").values("updated_at")[:1],
+                           ordered=True)
+
+    def test_employee_views(self):
+        employee = self.employee
+        self.assertIndexed("my applications", self.view_queryset(EmployeeMyJobListView, employee), ordered=True)
+        self.assertIndexed("my applications by status", self.view_queryset(
+            EmployeeMyJobListView, employee, {"status": "1"}), ordered=True)
+        self.assertIndexed("favorites", self.view_queryset(FavoriteListView, employee))
+        self.assertIndexed("favorite ids", Favorite.objects.filter(user_id=employee.id).values_list("job_id"))
+
+    def test_employer_views(self):
+        employer, job = self.employer, self.job
+        self.assertIndexed("dashboard", self.view_queryset(DashboardView, employer), ordered=True)
+        self.assertIndexed("applicants of a job", self.view_queryset(
+            AppliciantPerJobView, employer, job_id=job.id), ordered=True)
+        self.assertIndexed("all applicants", self.view_queryset(ApplicantListView, employer))
+        self.assertIndexed("all applicants by status", self.view_queryset(
+            ApplicantListView, employer, {"status": str(Applicant.ACCEPTED)}))
+        self.assertIndexed("pending applicants of a job", Applicant.objects.filter(
+            job_id=job.id, status=Applicant.PENDING), ordered=True)
+        self.assertIndexed("send response", Applicant.objects.filter(pk=self.applicant.pk, job__user_id=employer.id))
+        self.assertIndexed("bulk response", Applicant.objects.filter(
+            id__in=[self.applicant.pk], job__user_id=employer.id))
+        self.assertIndexed("edit job", Job.objects.filter(user_id=employer.id, pk=job.pk))
+        self.assertIndexed("recent applicants", Applicant.objects.filter(
+            job__user_id=employer.id, created_at__gte=timezone.now() - timedelta(days=7)))
+
+    def test_account_views(self):
+        self.assertIndexed("login", User.objects.filter(email=self.employee.email))
+        self.assertIndexed("session user", User.objects.filter(pk=self.employee.pk))
+
+
+class TestQueryBudgets(JobTestMixin, TestCase):
+    # Every view of job.urls and account.urls declares max_queries and
+    # stays within it, requested cold (empty caches) over a few rows each.
+    # Rows are rendered with str() the way a template would, so an N+1 in
+    # a __str__ counts against the view.
+
+    def setUp(self) -> None:
+        cache.clear()
+        # Restarts the flush interval, so no request here flushes views
+        view_counter.flush()
+        self.employer = self.create_employer()
+        self.employees = [self.create_employee("employee%d@test.com" % i) for i in range(3)]
+        self.employee = self.employees[0]
+        tags = [Tag.objects.create(name=name) for name in ("python", "django")]
+        self.jobs = [self.create_job(self.employer, title="Engineer %d" % i, tags=tags) for i in range(4)]
+        for job in self.jobs[:3]:
+            for employee in self.employees:
+                Applicant.objects.create(user=employee, job=job)
+            counters.recount_applicants([job.id])
+            favorites.toggle(self.employee.id, job.id)
+        self.applicant = Applicant.objects.filter(job=self.jobs[0]).first()
+
+    def cases(self):
+        # URL name: (user, method, URL kwargs, data)
+        employer, employee, job = self.employer, self.employee, self.jobs[0]
+        registration = {
+            "first_name": "New", "last_name": "User", "password1": "Xyzzy.12345", "password2": "Xyzzy.12345",
+        }
+        posting = {
+            "title": "Data Engineer", "description": "Pipelines", "location": "Bandung", "type": "1",
+            "category": "Engineering", "last_date": timezone.now().date() + timedelta(days=30),
+            "name_company": "Banyu", "salary": 9000000, "tags": [tag.id for tag in Tag.objects.all()],
+        }
+        return {
+            "job:home": (employee, "get", {}, {}),
+            "job:favorite": (employee, "post", {}, {"job_id": self.jobs[3].id}),
+            "job:search": (employee, "get", {}, {"q": "engineer"}),
+            "job:autocomplete": (None, "get", {}, {"q": "eng"}),
+            "job:dashboard": (employer, "get", {}, {}),
+            "job:employer-applicant-list": (employer, "get", {}, {}),
+            "job:employer-applicant-export": (employer, "get", {}, {}),
+            "job:employer-dashboard-applicant": (employer, "get", {"job_id": job.id}, {}),
+            "job:employer-dashboard-applicant-export": (employer, "get", {"job_id": job.id}, {}),
+            "job:applied-applicant-view": (
+                employer, "get", {"job_id": job.id, "applicant_id": self.applicant.id}, {}),
+            "job:job-mark-filled": (employer, "get", {"job_id": job.id}, {}),
+            "job:applicant-send-response": (
+                employer, "post", {"applicant_id": self.applicant.id}, {"status": Applicant.ACCEPTED}),
+            "job:applicant-send-response-bulk": (employer, "post", {}, {
+                "applicant_ids": ",".join(str(a.id) for a in Applicant.objects.filter(job=job)),
+                "status": Applicant.REJECTED}),
+            "job:employer-jobs-create": (employer, "post", {}, posting),
+            "job:employer-jobs-edit": (employer, "post", {"id": job.id}, dict(posting, title="Staff Engineer")),
+            "job:employee-my-applications": (employee, "get", {}, {}),
+            "job:employee-favorites": (employee, "get", {}, {}),
+            "job:employee-recommended": (employee, "get", {}, {}),
+            "job:apply-job": (employee, "post", {"job_id": self.jobs[3].id}, {}),
+            "job:jobs": (employee, "get", {}, {}),
+            "job:jobs-detail": (employee, "get", {"id": job.id}, {}),
+            "job:api-job-list": (None, "get", {}, {}),
+            "job:api-job-detail": (None, "get", {"id": job.id}, {}),
+            "account:employee-register": (None, "post", {}, dict(registration, email="new1@test.com", gender="male")),
+            "account:employer-register": (None, "post", {}, dict(registration, email="new2@test.com")),
+            "account:employee-profile-update": (employee, "get", {}, {}),
+            "account:employer-profile-update": (employer, "get", {}, {}),
+            "account:logout": (employee, "get", {}, {}),
+            "account:login": (None, "post", {}, {"email": employee.email, "password": "Abcdefgh.1"}),
+        }
+
+    def url_views(self):
+        # {URL name: view} of every named pattern of job.urls and account.urls
+        views = {}
+
+        def collect(patterns, namespace):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    collect(pattern.url_patterns, namespace)
+                elif pattern.name:
+                    views["%s:%s" % (namespace, pattern.name)] = pattern.callback
+
+        collect(job_urls.urlpatterns, "job")
+        collect(account_urls.urlpatterns, "account")
+        return views
+
+    def request(self, name, user, method, kwargs, data):
+        if user is not None:
+            self.client.force_login(user)
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(reverse(name, kwargs=kwargs), data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            context = response.context or {}
+            for key in ("object_list", "object"):
+                if key in context and context[key] is not None:
+                    rows = context[key] if key == "object_list" else [context[key]]
+                    [str(row) for row in rows]
+        self.assertLess(response.status_code, 400, name)
+        return response, len(queries)
+
+    def test_every_view_declares_a_budget(self):
+        views = self.url_views()
+        self.assertEqual(set(views), set(self.cases()))
+        for name, view in views.items():
+            with self.subTest(name):
+                self.assertIsInstance(budget_for(resolve(reverse(name, kwargs=self.cases()[name][2]))), int)
+
+    def test_views_stay_within_budget(self):
+        for name, case in self.cases().items():
+            # Each case on the fixture as set up, not as earlier cases left it
+            with self.subTest(name), transaction.atomic():
+                self.client = self.client_class()
+                response, count = self.request(name, *case)
+                budget = budget_for(resolve(reverse(name, kwargs=case[2])))
+                self.assertLessEqual(count, budget, "%s ran %d queries, budget %s" % (name, count, budget))
+                transaction.set_rollback(True)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_headers_in_debug(self):
+        response = self.client.get(reverse("job:jobs-detail", kwargs={"id": self.jobs[0].id}))
+        self.assertEqual(response["X-Query-View"], "job:jobs-detail")
+        self.assertEqual(response["X-Query-Budget"], str(JobDetailsView.max_queries))
+        self.assertLessEqual(int(response["X-Query-Count"]), JobDetailsView.max_queries)
+        self.assertGreaterEqual(float(response["X-Query-Time-Ms"]), 0)
+        self.assertIn("SELECT", response["X-Query-Slowest-1"])
+
+    def test_middleware_logs_in_production(self):
+        url = reverse("job:jobs-detail", kwargs={"id": self.jobs[0].id})
+        with self.assertLogs("job.middleware", "INFO") as logs:
+            self.client.get(url)
+        report = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(logs.records[-1].levelname, "INFO")
+        self.assertEqual((report["view"], report["status"], report["max_queries"]), ("job:jobs-detail", 200, 6))
+        self.assertEqual(len(report["slowest"]), SLOWEST)
+
+        with self.assertLogs("job.middleware", "WARNING") as logs, patch.object(JobDetailsView, "max_queries", 0):
+            self.client.get(url)
+        self.assertGreater(json.loads(logs.records[-1].getMessage())["queries"], 0)
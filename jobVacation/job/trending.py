@@ -0,0 +1,83 @@
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from job.models import Applicant, Favorite, Job, JobViewDay, TrendingJob
+
+# Trending score of a job: every application, favorite and detail view adds
+# its weight, decayed exponentially with the event's age so that yesterday's
+# activity counts half of today's. Events are grouped per (job, day) in SQL,
+# so the batch reads one row per job and active day rather than per event.
+WEIGHTS = {"application": 5.0, "favorite": 3.0, "view": 1.0}
+HALF_LIFE_DAYS = 1.0
+WINDOW_DAYS = 14
+TOP_SIZE = 100
+
+
+def _daily(queryset, field):
+    return (
+        queryset.filter(**{"%s__gte" % field: timezone.now() - timedelta(days=WINDOW_DAYS)})
+        # Cast is a native date() on SQLite, TruncDate a Python function per row
+        .annotate(day=Cast(field, DateField()))
+        .order_by()
+        .values_list("job_id", "day")
+        .annotate(n=Count("id"))
+    )
+
+
+def event_sources():
+    since = timezone.now().date() - timedelta(days=WINDOW_DAYS)
+    return {
+        "application": _daily(Applicant.objects.all(), "created_at"),
+        "favorite": _daily(Favorite.objects.all(), "created_at"),
+        "view": JobViewDay.objects.filter(day__gte=since).values_list("job_id", "day").annotate(n=Sum("views")),
+    }
+
+
+def compute_scores(today=None):
+    today = today or timezone.now().date()
+    decay = math.log(2) / HALF_LIFE_DAYS
+    factors = {}
+    scores = {}
+    for kind, rows in event_sources().items():
+        weight = WEIGHTS[kind]
+        for job_id, day, count in rows:
+            age = (today - day).days
+            if age not in factors:
+                factors[age] = math.exp(-decay * max(age, 0))
+            scores[job_id] = scores.get(job_id, 0.0) + weight * count * factors[age]
+    return scores
+
+
+def recompute(size=TOP_SIZE, chunk_size=500):
+    candidates = sorted(compute_scores().items(), key=lambda item: (-item[1], item[0]))
+    # Walk down the ranking, keeping unfilled jobs, until the table is full
+    ranked = []
+    for start in range(0, len(candidates), chunk_size):
+        chunk = candidates[start:start + chunk_size]
+        open_ids = set(Job.objects.unfilled(id__in=[job_id for job_id, score in chunk]).values_list("id", flat=True))
+        ranked.extend(item for item in chunk if item[0] in open_ids)
+        if len(ranked) >= size:
+            break
+    now = timezone.now()
+    with transaction.atomic():
+        TrendingJob.objects.all().delete()
+        TrendingJob.objects.bulk_create([
+            TrendingJob(job_id=job_id, score=score, rank=rank, computed_at=now)
+            for rank, (job_id, score) in enumerate(ranked[:size], start=1)
+        ])
+    return min(len(ranked), size)
+
+
+def top(count=3):
+    # One query on the rank index; falls back to the newest jobs until the
+    # first batch has run
+    rows = TrendingJob.objects.select_related("job").filter(job__filled=False, job__expired=False)[:count]
+    jobs = [row.job for row in rows]
+    if not jobs:
+        jobs = list(Job.objects.unfilled().order_by("-created_at")[:count])
+    return jobs
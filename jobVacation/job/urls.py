@@ -1,5 +1,6 @@
 from django.urls import path, include
 
+from job.api import job_detail_api, job_list_api
 from job.views import *
 
 app_name = 'job'
@@ -8,20 +9,27 @@ urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     path("favorite/", favorite, name="favorite"),
     path("search/", SearchView.as_view(), name="search"),
+    path("search/autocomplete/", autocomplete, name="autocomplete"),
     path("employer/dashboard/",
          include(
              [
                  path("", DashboardView.as_view(), name="dashboard"),
                  path("all-applicants/", ApplicantListView.as_view(),
                       name="employer-applicant-list"),
+                 path("all-applicants/export/", ApplicantExportView.as_view(),
+                      name="employer-applicant-export"),
                  path("applicant/<int:job_id>/", AppliciantPerJobView.as_view(),
                       name="employer-dashboard-applicant"),
+                 path("applicant/<int:job_id>/export/", ApplicantExportView.as_view(),
+                      name="employer-dashboard-applicant-export"),
                  path("applied-applicant/<int:job_id>/view/<int:applicant_id>",
                       AppliedApplicantView.as_view(),  name="applied-applicant-view"),
                  path("mark-filled/<int:job_id>/",
                       filled, name="job-mark-filled"),
                  path("send-response/<int:applicant_id>",
                       SendResponseView.as_view(), name="applicant-send-response"),
+                 path("send-response/bulk/",
+                      BulkResponseView.as_view(), name="applicant-send-response-bulk"),
                  path("jobs/create/", JobCreateView.as_view(),
                       name="employer-jobs-create"),
                  path("jobs/<int:id>/edit/", JobUpdateView.as_view(),
@@ -37,10 +45,14 @@ urlpatterns = [
                      name="employee-my-applications"),
                 path("favorites", FavoriteListView.as_view(),
                      name="employee-favorites"),
+                path("recommended", RecommendedJobListView.as_view(),
+                     name="employee-recommended"),
             ]
         ),
     ),
     path("apply-job/<int:job_id>/", ApplyJobView.as_view(), name="apply-job"),
     path("jobs/", JobListView.as_view(), name="jobs"),
     path("jobs/<int:id>/", JobDetailsView.as_view(), name="jobs-detail"),
+    path("api/jobs/", job_list_api, name="api-job-list"),
+    path("api/jobs/<int:id>/", job_detail_api, name="api-job-detail"),
 ]
@@ -0,0 +1,92 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from job.models import Job, JobViewDay
+from job.sqlite import write_transaction
+
+logger = logging.getLogger(__name__)
+
+# Write-behind counter of job detail views. Increments are summed per job in
+# process memory and written out by flush() as one UPDATE ... CASE per batch
+# of jobs, instead of one UPDATE per page view. A flush happens when
+# FLUSH_THRESHOLD views are pending or FLUSH_INTERVAL seconds have passed
+# since the last one (checked on increment), at interpreter exit, and
+# whenever flush() is called, so a crash loses at most that many views.
+FLUSH_INTERVAL = getattr(settings, "JOB_VIEW_COUNTER_FLUSH_INTERVAL", 30)
+FLUSH_THRESHOLD = getattr(settings, "JOB_VIEW_COUNTER_FLUSH_THRESHOLD", 1000)
+BATCH_SIZE = 200
+
+
+def _case(field, counts):
+    return Case(
+        *[When(**{field: job_id, "then": Value(count)}) for job_id, count in counts],
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def write_counts(counts, day=None):
+    # Add {job_id: views} to Job.view_count and to the day's JobViewDay rows
+    day = day or timezone.now().date()
+    items = sorted(counts.items())
+    with write_transaction():
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            ids = [job_id for job_id, count in batch]
+            Job.objects.filter(id__in=ids).update(view_count=F("view_count") + _case("id", batch))
+            existing = set(Job.objects.filter(id__in=ids).values_list("id", flat=True))
+            JobViewDay.objects.bulk_create(
+                [JobViewDay(job_id=job_id, day=day, views=0) for job_id in ids if job_id in existing],
+                ignore_conflicts=True)
+            JobViewDay.objects.filter(day=day, job_id__in=ids).update(views=F("views") + _case("job_id", batch))
+
+
+class ViewCounter:
+    def __init__(self, interval=FLUSH_INTERVAL, threshold=FLUSH_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.pending_total = 0
+        self.last_flush = time.monotonic()
+
+    def increment(self, job_id, count=1):
+        with self.lock:
+            self.pending[job_id] = self.pending.get(job_id, 0) + count
+            self.pending_total += count
+            due = (self.pending_total >= self.threshold
+                   or time.monotonic() - self.last_flush >= self.interval)
+        if due:
+            self.flush()
+
+    def pending_for(self, job_id):
+        with self.lock:
+            return self.pending.get(job_id, 0)
+
+    def flush(self):
+        with self.lock:
+            counts, self.pending, self.pending_total = self.pending, {}, 0
+            self.last_flush = time.monotonic()
+        if not counts:
+            return 0
+        try:
+            write_counts(counts)
+        except DatabaseError:
+            # Keep the views for the next flush rather than dropping them
+            logger.exception("Could not flush %d job views", sum(counts.values()))
+            with self.lock:
+                for job_id, count in counts.items():
+                    self.pending[job_id] = self.pending.get(job_id, 0) + count
+                    self.pending_total += count
+            return 0
+        return sum(counts.values())
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
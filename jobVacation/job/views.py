@@ -2,60 +2,128 @@ from audioop import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
+from django.db.models import Max
 from django.http import Http404, HttpResponseRedirect, JsonResponse, HttpResponseNotAllowed
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
-from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.views.generic import ListView, DetailView, CreateView, UpdateView
-
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, View
+
+from job import (
+    autocomplete as typeahead, counters, dashboard, exports, facets, favorites, feed, outbox, responses, search,
+    similar, tag_index, trending,
+)
+from job.conditional import ConditionalGetMixin, latest_job_change
+from job.pagination import KeysetPaginationMixin
+from job.sqlite import write_transaction
+from job.view_counter import view_counter
 from job.models import Job
-from job.decorators import user_is_employee, user_is_employer
+from job.decorators import query_budget, user_is_employee, user_is_employer
 from job.forms import ApplyJobForm, CreateJobForm
-from job.models import Applicant, Favorite
+from job.models import Applicant, Favorite, TrendingJob
 from account.models import User
 from account.forms import EmployeeUpdateProfileForm, EmployerUpdateProfileForm
 from tags.models import Tag
 
 
-class HomeView(ListView):
+class FacetMixin:
+    # Adds facet counts of the unpaginated result set to the context. The
+    # cache key is built from every request param that shapes the results.
+    facet_filters = facets.FACET_FILTERS
+    facet_key_params = ()
+
+    def get_facet_queryset(self):
+        return self.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        key = (self.__class__.__name__,) + facets.normalize_filters(
+            self.request.GET, self.facet_key_params + tuple(self.facet_filters))
+        context["facets"] = Job.objects.facets(self.get_facet_queryset(), key=key)
+        return context
+
+
+class FavoriteIdsMixin:
+    # Job ids the user has favorited, for marking a whole page of jobs
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["favorite_ids"] = favorites.ids_for(self.request.user)
+        return context
+
+
+class HomeView(ConditionalGetMixin, FavoriteIdsMixin, ListView):
     model = Job
     template_name = "home.html"
     context_object_name = 'jobs'
+    max_queries = 8
+
+    def get_version(self):
+        computed_at = TrendingJob.objects.values_list("computed_at", flat=True).first()
+        return latest_job_change() + (computed_at,)
 
     def get_queryset(self):
         return self.model.objects.unfilled()[:5]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["trendings"] = self.model.objects.unfilled(
-            created_at__month=timezone.now().month)[:3]
+        context["trendings"] = trending.top(3)
         return context
 
 
-class SearchView(ListView):
+class SearchView(FavoriteIdsMixin, FacetMixin, ListView):
     model = Job
     template_name = "job/search.html"
     context_object_name = 'jobs'
+    paginate_by = 10
+    # location is matched as text here, not as a facet value
+    facet_filters = ("type", "category", "tag", "salary")
+    facet_key_params = ("q", "title", "location", "mode", "tags")
+    max_queries = 8
 
     def get_queryset(self):
-        return self.model.objects.filter(
-            location__contain=self.request.GET("location", ""),
-            title__contain=self.request.GET("title", ""),
-        )
+        queryset = facets.apply_filters(self.model.objects.listed(), self.request.GET, self.facet_filters)
+        queryset = tag_index.apply_filter(queryset, self.request.GET)
+        return search.apply_search(queryset, self.request.GET)
+
+    def get_facet_queryset(self):
+        if isinstance(self.object_list, search.RankedJobSearch):
+            return self.object_list.as_queryset()
+        return self.object_list
 
 
-class JobListView(ListView):
+class JobListView(ConditionalGetMixin, FavoriteIdsMixin, FacetMixin, KeysetPaginationMixin, ListView):
     model = Job
     template_name = "job/jobs.html"
     context_object_name = 'jobs'
     paginate_by = 10
+    facet_key_params = ("tags",)
+    max_queries = 7
+
+    def get_version(self):
+        # The page and its facets depend on every job matching the filters;
+        # any job change moves the version, without counting the matches
+        return latest_job_change()
+
+    def get_queryset(self):
+        queryset = facets.apply_filters(self.model.objects.listed(), self.request.GET, self.facet_filters)
+        return tag_index.apply_filter(queryset, self.request.GET)
 
 
-class JobDetailsView(DetailView):
+class JobDetailsView(ConditionalGetMixin, DetailView):
     model = Job
     template_name = "job/job_details.html"
     context_object_name = 'job'
     pk_url_kwarg = 'id'
+    max_queries = 6
+
+    def get_version(self):
+        # The similar jobs panel changes with a new batch or with its jobs
+        version = self.model.objects.filter(pk=self.kwargs[self.pk_url_kwarg]).annotate(
+            similar_at=Max("similar__computed_at"), neighbors_at=Max("similar__neighbor__updated_at"),
+        ).values_list("updated_at", "similar_at", "neighbors_at").first()
+        if version is None:
+            raise Http404("Job not found")
+        return version
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset=queryset)
@@ -63,13 +131,16 @@ class JobDetailsView(DetailView):
             raise Http404("Job not found")
         return obj
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["similar_jobs"] = similar.similar_jobs(self.object.pk)
+        return context
+
     def get(self, request, *args, **kwargs):
-        try:
-            self.object = self.get_object()
-        except Http404:
-            raise Http404("Job not found")
-        context = self.get_context_data(object=self.object)
-        return self.render_to_response(context)
+        # Counted for full renders and 304s alike
+        response = super().get(request, *args, **kwargs)
+        view_counter.increment(self.kwargs[self.pk_url_kwarg])
+        return response
 
 
 class ApplyJobView(CreateView):
@@ -77,6 +148,7 @@ class ApplyJobView(CreateView):
     form_class = ApplyJobForm
     slug_field = 'job_id'
     slug_url_kwarg = 'job_id'
+    max_queries = 12
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employee)
@@ -89,55 +161,74 @@ class ApplyJobView(CreateView):
     def post(self, request, *args, **kwargs):
         form = self.get_form()
         if form.is_valid():
-            messages.info(self.request, "Success for apply job")
             return self.form_valid(form)
         return HttpResponseRedirect(reverse_lazy('job:home'))
 
     def get_success_url(self):
-        return reverse_lazy('job:job-detail', kwargs={'id': self.kwargs['job_id']})
+        return reverse_lazy('job:jobs-detail', kwargs={'id': self.kwargs['job_id']})
 
     def form_valid(self, form):
-        applicant = Applicant.objects.filter(
-            user_id=self.request.user.id, job_id=self.kwargs["job_id"])
-        if applicant:
+        job = get_object_or_404(Job, id=self.kwargs["job_id"])
+        with write_transaction():
+            applicant, created = Applicant.objects.get_or_create(
+                user_id=self.request.user.id, job=job)
+            if created:
+                counters.applicant_added(job.id)
+                outbox.notify_application(applicant.id, job.user_id, job.title, self.request.user.email)
+        if not created:
             messages.info(
                 self.request, "You have already applied for this job")
             return HttpResponseRedirect(self.get_success_url())
-        form.instance.user = self.request.user
-        form.save()
-        return super().form_valid(form)
+        messages.info(self.request, "Success for apply job")
+        return HttpResponseRedirect(self.get_success_url())
+
+
+@query_budget(4)
+def autocomplete(request):
+    kinds = [kind for kind in request.GET.getlist("kind") if kind in typeahead.KINDS] or typeahead.KINDS
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), typeahead.MAX_LIMIT))
+    except ValueError:
+        limit = 10
+    prefix = request.GET.get("q", "")
+    return JsonResponse(data={"q": prefix, "suggestions": typeahead.suggester.suggest(prefix, kinds, limit)})
+
 
+FAVORITE_STATES = {"1": True, "true": True, "0": False, "false": False}
 
+
+@query_budget(12)
 def favorite(request):
     if not request.user.is_authenticated:
         return JsonResponse(data={"auth": False, "status": "You need to login first"}, status=401)
 
-    job_id = request.POST.get("job_id")
-    user_id = request.user.id
+    job_id = request.POST.get("job_id", "")
+    if not job_id.isdigit():
+        return JsonResponse(data={"auth": True, "status": "Job not found"}, status=404)
+    # An explicit state makes retries idempotent; without one it flips
+    state = FAVORITE_STATES.get(request.POST.get("state", ""))
 
-    try:
-        fav = Favorite.objects.get(
-            user_id=user_id, job_id=job_id, soft_deleted=False)
-        if fav:
-            fav.soft_deleted = True
-            fav.save()
-            return JsonResponse(data={"auth": True, "status": "removed", "message": "Job has been removed from your favorite list"}, status=200)
-    except Favorite.DoesNotExist:
-        Favorite.objects.create(job_id=job_id, user_id=user_id)
-        return JsonResponse(data={"auth": True, "status": "added", "message": "Job has been added to your favorite list"}, status=200)
+    status = favorites.toggle(request.user.id, int(job_id), state)
+    if status is None:
+        return JsonResponse(data={"auth": True, "status": "Job not found"}, status=404)
+    if status == favorites.REMOVED:
+        return JsonResponse(data={"auth": True, "status": "removed", "message": "Job has been removed from your favorite list"}, status=200)
+    return JsonResponse(data={"auth": True, "status": "added", "message": "Job has been added to your favorite list"}, status=200)
 
 
 # EMPLOYEE VIEWS
 @method_decorator(login_required(login_url=reverse_lazy('account:login')), name='dispatch')
 @method_decorator(user_is_employee, name='dispatch')
-class EmployeeMyJobListView(ListView):
+class EmployeeMyJobListView(KeysetPaginationMixin, ListView):
     model = Applicant
     template_name = "job/employee_my_jobs.html"
     context_object_name = 'applicants'
     paginate_by: int = 10
+    keyset_fields = ("-created_at", "-id")
+    max_queries = 3
 
     def get_queryset(self):
-        self.queryset = self.model.objects.select_related("job").filter(
+        self.queryset = self.model.objects.select_related("job", "user").filter(
             user_id=self.request.user.id).order_by('-created_at')
 
         if (
@@ -156,7 +247,8 @@ class EditProfileView(UpdateView):
     form_class = EmployeeUpdateProfileForm
     context_object_name = 'employee'
     template_name = "job/employee_edit_profile.html"
-    success_url = reverse_lazy('job:employee-profile-update')
+    success_url = reverse_lazy('account:employee-profile-update')
+    max_queries = 2
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employee)
@@ -172,28 +264,48 @@ class EditProfileView(UpdateView):
         return self.render_to_response(self.get_context_data())
 
     def get_object(self, queryset=None):
-        obj = super().get_object(queryset=queryset)
+        obj = self.request.user
         if obj == None:
             raise Http404("User not found")
         return obj
 
 
+class RecommendedJobListView(ListView):
+    model = Job
+    template_name = "job/employee_recommended.html"
+    context_object_name = 'jobs'
+    max_queries = 10
+
+    @method_decorator(login_required(login_url=reverse_lazy('account:login')))
+    @method_decorator(user_is_employee)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # Stored feed order; jobs filled since the feed was built drop out
+        return feed.recommended_jobs(self.request.user.id) or trending.top(feed.FEED_SIZE)
+
+
 @method_decorator(login_required(login_url=reverse_lazy('account:login')), name='dispatch')
 @method_decorator(user_is_employee, name='dispatch')
 class FavoriteListView(ListView):
     model = Favorite
     template_name = 'job/employee_favorite_list.html'
     context_object_name = 'favorites'
+    max_queries = 3
 
     def get_queryset(self):
-        return self.model.objects.select_related("job__user").filter(soft_deleted=False, user=self.request.user)
+        return self.model.objects.select_related("job__user").filter(user=self.request.user)
 
 
 # EMPLOYER VIEWS
-class DashboardView(ListView):
+class DashboardView(KeysetPaginationMixin, ListView):
     model = Job
     template_name = "job/employer_dashboard.html"
     context_object_name = 'jobs'
+    paginate_by = 10
+    keyset_fields = ("-created_at", "-id")
+    max_queries = 6
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employer)
@@ -201,26 +313,38 @@ class DashboardView(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return self.model.objects.filter(user_id=self.request.user.id)
+        # Per-status applicant and favorite counts are columns of the job
+        # rows (see job.counters), so a page needs no join or per-row query
+        return self.model.objects.filter(user_id=self.request.user.id).prefetch_related("tags")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["summary"] = dashboard.summary(self.request.user.id)
+        context["total_views"] = context["summary"]["views"]
+        return context
 
 
-class AppliciantPerJobView(ListView):
+class AppliciantPerJobView(KeysetPaginationMixin, ListView):
     model = Applicant
     template_name = "job/employer_applicant_per_job.html"
     context_object_name = 'applicants'
     paginate_by = 5
+    max_queries = 4
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employer)
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
 
-    def get_query_set(self):
-        return Applicant.objects.filter(job_id=self.kwargs['job_id']).order_by('id')
+    def get_queryset(self):
+        # Only the requester's own jobs; anything else is a 404
+        self.job = get_object_or_404(Job, id=self.kwargs['job_id'], user_id=self.request.user.id)
+        return Applicant.objects.select_related("user").filter(
+            job_id=self.job.id, job__user_id=self.request.user.id).order_by('id')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["job"] = Job.objects.get(id=self.kwargs['job_id'])
+        context["job"] = self.job
         return context
 
 
@@ -228,7 +352,8 @@ class JobCreateView(CreateView):
     extra_context = {"title": "Create Job"}
     form_class = CreateJobForm
     template_name = "job/employer_create_job.html"
-    success_url = reverse_lazy('job:employer-dashboard')
+    success_url = reverse_lazy('job:dashboard')
+    max_queries = 15
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employer)
@@ -265,8 +390,9 @@ class JobUpdateView(UpdateView):
     extra_context = {"title": "Edit Job"}
     slug_field = "id"
     slug_url_kwarg = "id"
-    success_url = reverse_lazy('job:employer-dashboard')
+    success_url = reverse_lazy('job:dashboard')
     context_object_name = 'job'
+    max_queries = 15
 
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
@@ -296,6 +422,7 @@ class ApplicantListView(ListView):
     model = Applicant
     template_name = "job/employer_applicant_list.html"
     context_object_name = 'applicants'
+    max_queries = 3
 
     @method_decorator(login_required(login_url=reverse_lazy('account:login')))
     @method_decorator(user_is_employer)
@@ -303,24 +430,70 @@ class ApplicantListView(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        self.queryset = self.model.object.filter(
-            job__user_id=self.request.user.id).order_by('id')
-        if "status" in self.request.GET and len(self.request.GET.get("status")) > 0:
-            self.queryset = self.queryset.filter(
-                status=self.request.GET.get("status"))
-        return self.queryset
+        self.queryset = self.model.objects.filter(
+            job__user_id=self.request.user.id).select_related('user', 'job').order_by('id')
+        return exports.filter_by_status(self.queryset, self.request.GET)
+
+
+class ApplicantExportView(View):
+    # ?format=csv|ndjson of all the employer's applicants, or of one job's
+    max_queries = 4
 
+    @method_decorator(login_required(login_url=reverse_lazy('account:login')))
+    @method_decorator(user_is_employer)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, job_id=None):
+        queryset = Applicant.objects.filter(job__user_id=request.user.id)
+        filename = "applicants"
+        if job_id is not None:
+            get_object_or_404(Job, id=job_id, user_id=request.user.id)
+            queryset = queryset.filter(job_id=job_id)
+            filename = "applicants-job-%d" % job_id
+        queryset = exports.filter_by_status(queryset, request.GET)
+        return exports.export_response(queryset, request.GET.get("format", "csv"), filename)
+
+
+class BulkResponseView(View):
+    # POST applicant_ids (repeated or comma separated), status and an
+    # optional comment; answers with the counts from job.responses.respond
+    http_method_names = ['post']
+    max_queries = 8
+
+    @method_decorator(login_required(login_url=reverse_lazy('account:login')))
+    @method_decorator(user_is_employer)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
 
-@method_decorator(login_required(login_url=reverse_lazy('account:login')))
-@method_decorator(user_is_employer)
+    def post(self, request, *args, **kwargs):
+        ids = [value.strip() for values in request.POST.getlist("applicant_ids") for value in values.split(",")]
+        ids = [value for value in ids if value]
+        if not ids or not all(value.isdigit() for value in ids):
+            return JsonResponse(data={"status": "Invalid applicant ids"}, status=400)
+        if len(ids) > responses.MAX_IDS:
+            return JsonResponse(data={"status": "At most %d applicants at once" % responses.MAX_IDS}, status=400)
+        try:
+            status = int(request.POST.get("status"))
+        except (TypeError, ValueError):
+            status = None
+        if status not in responses.STATUS_NAMES:
+            return JsonResponse(data={"status": "Invalid status"}, status=400)
+        comment = request.POST.get("comment")
+        return JsonResponse(data=responses.respond(request.user.id, map(int, ids), status, comment))
+
+
+@login_required(login_url=reverse_lazy('account:login'))
+@user_is_employer
+@query_budget(8)
 def filled(request, job_id=None):
+    job = get_object_or_404(Job, user_id=request.user.id, id=job_id)
     try:
-        job = Job.objects.get(user_id=request.user.id, id=job_id)
         job.filled = True
         job.save()
     except IntegrityError:
-        return HttpResponseRedirect(reverse_lazy('job:employer-dashboard'))
-    return HttpResponseRedirect(reverse_lazy('job:employer-dashboard'))
+        return HttpResponseRedirect(reverse_lazy('job:dashboard'))
+    return HttpResponseRedirect(reverse_lazy('job:dashboard'))
 
 
 @method_decorator(login_required(login_url=reverse_lazy('account:login')), name='dispatch')
@@ -331,12 +504,14 @@ class AppliedApplicantView(DetailView):
     context_object_name = 'applicant'
     slug_field = "id"
     slug_url_kwarg = "applicant_id"
+    max_queries = 3
 
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Applicant.objects.select_related('job').get(job_id=self.kwargs['job_id'])
+        return Applicant.objects.select_related('job', 'user').filter(
+            job_id=self.kwargs['job_id'], job__user_id=self.request.user.id)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -349,30 +524,46 @@ class SendResponseView(UpdateView):
     model = Applicant
     http_method_names = ['post']
     pk_url_kwarg = 'applicant_id'
-    fields = ('status', 'comment')
+    max_queries = 8
 
     def get_success_url(self):
         return reverse_lazy(
-            'job:employer-applied-applicant',
-            kwargs={'job_id': self.kwargs['job_id'],
-                    'applicant_id': self.kwargs['applicant_id']}
+            'job:applied-applicant-view',
+            kwargs={'job_id': self.object.job_id,
+                    'applicant_id': self.object.id}
         )
 
+    def get_queryset(self):
+        return Applicant.objects.select_related("job").filter(job__user_id=self.request.user.id)
+
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        if self.object.status != request.POST.get("status"):
-            if request.POST.get("status") == "0":
-                status = "Pending"
-            elif request.POST.get("status") == "1":
-                status = "Accepted"
-            else:
-                status = "Rejected"
+        try:
+            status = int(request.POST.get("status"))
+        except (TypeError, ValueError):
+            status = None
+        if status not in (Applicant.PENDING, Applicant.ACCEPTED, Applicant.REJECTED):
+            messages.warning(self.request, "Response was not sent to applicant, invalid status")
+            return HttpResponseRedirect(self.get_success_url())
+
+        changed = False
+        if status != self.object.status:
+            with write_transaction():
+                # Conditional on the status we read, so a concurrent response is counted once
+                changed = Applicant.objects.filter(
+                    pk=self.object.pk, status=self.object.status).update(status=status) == 1
+                if changed:
+                    counters.applicant_status_changed(self.object.job_id, self.object.status, status)
+                    outbox.notify_responses([(self.object.id, self.object.user_id, self.object.job.title)], status)
+        if changed:
+            self.object.status = status
+            dashboard.invalidate(self.request.user.id)
             messages.success(
                 self.request, "Response was successfully sent to applicant")
         else:
             messages.warning(
                 self.request, "Response was not sent to applicant, maybe already sent")
-        return super().post(request, *args, **kwargs)
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_object(self, queryset=None):
         if queryset is None:
@@ -392,9 +583,10 @@ class EmployerProfileUpdateView(UpdateView):
     form_class = EmployerUpdateProfileForm
     context_object_name = "employer"
     template_name = "job/employer_profile_update.html"
-    success_url = reverse_lazy('job:employer-update-profile')
+    success_url = reverse_lazy('account:employer-profile-update')
+    max_queries = 2
 
-    @method_decorator(login_required(login_url=reverse_lazy("accounts:login")))
+    @method_decorator(login_required(login_url=reverse_lazy("account:login")))
     @method_decorator(user_is_employer)
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(self.request, *args, **kwargs)
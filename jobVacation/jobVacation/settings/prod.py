@@ -1,3 +1,32 @@
+import os
+import tempfile
+
 from .base import *
 
-DEBUG = False
\ No newline at end of file
+DEBUG = False
+
+# SQLite under concurrent requests, see job.sqlite. Applied to every new
+# connection; journal_mode=wal is also recorded in the database file.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+# Serialize the short write transactions of each process
+SQLITE_WRITE_QUEUE = config('SQLITE_WRITE_QUEUE', default=True, cast=bool)
+
+# The facet generation, favorite ids, sessions and cached users are shared by
+# every worker and management command, so the cache must be too (job.checks
+# refuses a per-process one, or one whose incr() is not atomic). The default
+# is a directory on this host, outside the checkout (CACHE_LOCATION); point
+# CACHE_BACKEND at memcached (PyMemcacheCache) to run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='job.filecache.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'jobvacation-cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int)},
+    }
+}
@@ -0,0 +1,25 @@
+from .dev import *
+
+# Development profile with a read replica (DJANGO_SETTINGS_MODULE=
+# jobVacation.settings.replica): reads of safe requests go to
+# db-replica.sqlite3, a copy of the primary refreshed by
+#
+#     python manage.py sync_replica --interval 5
+#
+# Run it (with --once at least) before serving. Replicas are opened
+# read-only, so a write routed to them by mistake fails loudly.
+
+REPLICA_PATH = BASE_DIR / 'db-replica.sqlite3'
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': 'file:%s?mode=ro' % REPLICA_PATH,
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['job.routers.PrimaryReplicaRouter']
+# Longer than the sync interval, so a client sees its own writes
+DATABASE_REPLICA_STICKY_SECONDS = 10
+
+MIDDLEWARE = MIDDLEWARE + ['job.middleware.ReplicaMiddleware']
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jobVacation.settings')
 
 application = get_wsgi_application()
+
+from job import autocomplete, tag_index  # noqa: E402
+
+autocomplete.warm()
+tag_index.warm()